@@ -0,0 +1,1135 @@
+#!/usr/bin/env python3
+"""
+Battery Analytics - NASA Dataset
+Vectorized analysis engines shared by the dashboard plots
+"""
+
+import numpy as np
+import pandas as pd
+
+ENERGY_EFFICIENCY_COLUMNS = ['Voltage_measured', 'Current_measured', 'Voltage_load', 'Current_load', 'Time']
+THERMAL_COLUMNS = ['Temperature_measured', 'Voltage_measured', 'Current_measured', 'Time']
+# Default smoothing of the per-cycle degradation rate (trailing window, EWMA span in cycles)
+DEGRADATION_WINDOW = 5
+DEGRADATION_SPAN = 10
+
+
+def compute_energy_efficiency(detailed_data, min_efficiency=0, max_efficiency=200):
+    """Compute supplied/received energy and efficiency for every cycle in one pass
+
+    Mirrors the original per-uid loop: rows are ordered by Time within each
+    cycle (stable sort, so duplicate timestamps keep their file order), dt is
+    the time step to the previous sample and only rows with dt > 0
+    contribute. Efficiency = supplied / received * 100 and is NaN when either
+    energy is not positive or the result falls outside
+    [min_efficiency, max_efficiency].
+
+    Returns one row per uid (sorted) with columns uid, test_id, samples,
+    energy_supplied, energy_received and efficiency.
+    """
+    sums, _ = _energy_sums(detailed_data)
+    return _finish_energy_efficiency(sums, min_efficiency, max_efficiency)
+
+
+def _energy_sums(detailed_data, previous_time=None):
+    """Per-uid sample count and energy sums for one frame of detail rows
+
+    previous_time maps uid -> last Time seen in earlier chunks, so the first
+    row of a cycle continued from a previous chunk gets its real time step.
+    Returns (sums, last_time) with last_time a Series indexed by uid.
+    """
+    df = detailed_data[['uid', 'test_id'] + ENERGY_EFFICIENCY_COLUMNS]
+    df = df.sort_values(['uid', 'Time'], kind='mergesort')
+
+    uid = df['uid'].to_numpy()
+    time = df['Time'].to_numpy(dtype=float)
+
+    # Time step within each cycle; the first sample of every cycle gets 0
+    dt = np.empty_like(time)
+    if len(time) > 0:
+        dt[0] = 0.0
+        dt[1:] = time[1:] - time[:-1]
+        first = np.r_[True, uid[1:] != uid[:-1]]
+        dt[first] = 0.0
+        if previous_time:
+            carried = pd.Series(uid[first]).map(previous_time).to_numpy(dtype=float)
+            dt[first] = np.where(np.isnan(carried), 0.0, time[first] - carried)
+    dt = np.nan_to_num(dt, nan=0.0)
+    valid = dt > 0
+
+    supplied = df['Voltage_load'].to_numpy(dtype=float) * df['Current_load'].to_numpy(dtype=float) * dt
+    received = df['Voltage_measured'].to_numpy(dtype=float) * np.abs(df['Current_measured'].to_numpy(dtype=float)) * dt
+
+    per_row = pd.DataFrame({
+        'uid': uid,
+        'test_id': df['test_id'].to_numpy(),
+        'samples': valid,
+        'energy_supplied': np.where(valid, supplied, np.nan),
+        'energy_received': np.where(valid, received, np.nan),
+    })
+    sums = per_row.groupby('uid', sort=True).agg(
+        test_id=('test_id', 'first'),
+        samples=('samples', 'sum'),
+        energy_supplied=('energy_supplied', 'sum'),
+        energy_received=('energy_received', 'sum'),
+    ).reset_index()
+    last_time = pd.Series(time, index=uid).groupby(level=0).last()
+    return sums, last_time
+
+
+def _finish_energy_efficiency(sums, min_efficiency=0, max_efficiency=200):
+    """Turn per-uid energy sums into the efficiency table"""
+    result = sums
+    energy_ok = (result['energy_supplied'] > 0) & (result['energy_received'] > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        efficiency = result['energy_supplied'] / result['energy_received'] * 100
+    in_range = (efficiency >= min_efficiency) & (efficiency <= max_efficiency)
+    result['efficiency'] = efficiency.where(energy_ok & in_range)
+
+    return result
+
+
+class StreamingEnergyEfficiency:
+    """compute_energy_efficiency over a stream of detail chunks
+
+    Only per-uid partial sums and each cycle's last Time are kept, so memory
+    does not depend on how many samples are fed in. A cycle may be split
+    across chunks as long as its chunks arrive in time order (true for logged
+    files read front to back); then the result matches compute_energy_efficiency.
+    """
+
+    def __init__(self):
+        self.partials = []
+        self.last_time = {}
+
+    def update(self, chunk):
+        """Add one chunk of detail rows"""
+        sums, last_time = _energy_sums(chunk, self.last_time)
+        self.partials.append(sums)
+        self.last_time.update(last_time.to_dict())
+
+    def result(self, min_efficiency=0, max_efficiency=200):
+        """Return the efficiency table for everything fed so far"""
+        if not self.partials:
+            sums = pd.DataFrame(columns=['uid', 'test_id', 'samples', 'energy_supplied', 'energy_received'])
+        else:
+            sums = pd.concat(self.partials, ignore_index=True).groupby('uid', sort=True).agg(
+                test_id=('test_id', 'first'),
+                samples=('samples', 'sum'),
+                energy_supplied=('energy_supplied', 'sum'),
+                energy_received=('energy_received', 'sum'),
+            ).reset_index()
+            # Keep the partial list short for long streams
+            self.partials = [sums[['uid', 'test_id', 'samples', 'energy_supplied', 'energy_received']].copy()]
+        return _finish_energy_efficiency(sums, min_efficiency, max_efficiency)
+
+
+class StreamingThermalStats:
+    """Single-pass thermal statistics per cycle and per battery
+
+    Each chunk is reduced to per-uid count/mean/M2/min/max, which are merged
+    into the running per-cycle table with the parallel Welford (Chan et al.)
+    update, so a cycle split across chunks gives the same result as one read
+    in full. Battery-wide mean/std come from merging the cycle rows, and
+    quantiles from a fixed-bin histogram (HISTOGRAM_RANGE at
+    HISTOGRAM_RESOLUTION degrees; values outside the range are clipped).
+
+    Rows missing temperature, voltage or current are skipped, as in the
+    in-memory thermal analysis, without copying the chunk. Each chunk also
+    contributes at most max_points shape-preserving points to a sample for
+    the thermal plots (all valid rows when max_points is None).
+    """
+
+    SAMPLE_COLUMNS = ['Time', 'Temperature_measured', 'Voltage_measured']
+    HISTOGRAM_RANGE = (-40.0, 120.0)
+    HISTOGRAM_RESOLUTION = 0.05
+
+    def __init__(self, max_points=2000):
+        self.max_points = max_points
+        self.cycles = pd.DataFrame(columns=['test_id', 'samples', 'mean', 'm2', 'min', 'max'])
+        low, high = self.HISTOGRAM_RANGE
+        self.bin_edges = np.linspace(low, high, int(round((high - low) / self.HISTOGRAM_RESOLUTION)) + 1)
+        self.histogram = np.zeros(len(self.bin_edges) - 1, dtype=np.int64)
+        self.samples = []
+        self.sample_rows = 0
+
+    def update(self, chunk):
+        """Add one chunk of detail rows"""
+        temperature = chunk['Temperature_measured'].to_numpy(dtype=float)
+        valid = (~np.isnan(temperature)
+                 & chunk['Voltage_measured'].notna().to_numpy()
+                 & chunk['Current_measured'].notna().to_numpy())
+        if not valid.any():
+            return
+        temperature = temperature[valid]
+        uid = chunk['uid'].to_numpy()[valid]
+
+        low, high = self.HISTOGRAM_RANGE
+        self.histogram += np.histogram(np.clip(temperature, low, high), bins=self.bin_edges)[0]
+
+        by_cycle = pd.Series(temperature).groupby(uid, sort=False)
+        partial = pd.DataFrame({
+            'test_id': pd.Series(chunk['test_id'].to_numpy()[valid]).groupby(uid, sort=False).first(),
+            'samples': by_cycle.count(),
+            'mean': by_cycle.mean(),
+            'm2': by_cycle.var(ddof=0) * by_cycle.count(),
+            'min': by_cycle.min(),
+            'max': by_cycle.max(),
+        })
+        self.cycles = self._merge(self.cycles, partial)
+        self._add_sample(chunk, valid)
+
+    @staticmethod
+    def _merge(current, partial):
+        """Combine two per-uid stats tables (parallel Welford)"""
+        if len(current) == 0:
+            return partial
+        overlap = partial.index.intersection(current.index)
+        if len(overlap) == 0:
+            return pd.concat([current, partial])
+
+        a = current.loc[overlap]
+        b = partial.loc[overlap]
+        n = a['samples'] + b['samples']
+        delta = b['mean'] - a['mean']
+        merged = pd.DataFrame({
+            'test_id': a['test_id'],
+            'samples': n,
+            'mean': a['mean'] + delta * b['samples'] / n,
+            'm2': a['m2'] + b['m2'] + delta ** 2 * a['samples'] * b['samples'] / n,
+            'min': np.fmin(a['min'], b['min']),
+            'max': np.fmax(a['max'], b['max']),
+        })
+        current = current.copy()
+        current.loc[overlap] = merged
+        return pd.concat([current, partial.drop(overlap)])
+
+    def _add_sample(self, chunk, valid):
+        rows = np.flatnonzero(valid)
+        if self.max_points:
+            temperature = chunk['Temperature_measured'].to_numpy(dtype=float)[rows]
+            time_values = chunk['Time'].to_numpy(dtype=float)[rows]
+            picks = np.union1d(lttb_indices(time_values, temperature, self.max_points),
+                               minmax_indices(temperature, self.max_points))
+            rows = rows[picks]
+        sample = chunk[self.SAMPLE_COLUMNS].iloc[rows].reset_index(drop=True)
+        self.samples.append(sample)
+        self.sample_rows += len(sample)
+        if self.max_points and self.sample_rows > 4 * self.max_points:
+            # Thin the collected sample again so it stays bounded
+            sample = pd.concat(self.samples, ignore_index=True)
+            self.samples = []
+            self.sample_rows = 0
+            self._add_sample(sample, np.ones(len(sample), dtype=bool))
+
+    def quantile(self, q):
+        """Approximate temperature quantile(s) from the histogram"""
+        cumulative = np.cumsum(self.histogram)
+        total = cumulative[-1] if len(cumulative) else 0
+        if total == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        # Interpolate linearly inside the bin holding the q-th observation
+        targets = np.asarray(q, dtype=float) * total
+        bins = np.searchsorted(cumulative, targets, side='left').clip(0, len(self.histogram) - 1)
+        before = np.where(bins > 0, cumulative[bins - 1], 0)
+        counts = np.maximum(self.histogram[bins], 1)
+        fraction = np.clip((targets - before) / counts, 0, 1)
+        values = self.bin_edges[bins] + fraction * (self.bin_edges[bins + 1] - self.bin_edges[bins])
+        return values if np.ndim(q) else float(values)
+
+    def cycle_table(self):
+        """Per-cycle thermal trend: uid, test_id, samples, mean, std, min and max temperature"""
+        cycles = self.cycles.sort_index()
+        table = pd.DataFrame({
+            'uid': cycles.index.to_numpy(),
+            'test_id': cycles['test_id'].to_numpy(),
+            'samples': cycles['samples'].to_numpy(dtype=np.int64),
+            'mean_temperature': cycles['mean'].to_numpy(dtype=float),
+            'std_temperature': np.sqrt(cycles['m2'].to_numpy(dtype=float)
+                                       / cycles['samples'].to_numpy(dtype=float)),
+            'min_temperature': cycles['min'].to_numpy(dtype=float),
+            'max_temperature': cycles['max'].to_numpy(dtype=float),
+        })
+        return table
+
+    def result(self):
+        """Return battery-wide statistics, the per-cycle table and the plot sample"""
+        cycles = self.cycles
+        count = int(cycles['samples'].sum()) if len(cycles) else 0
+        if count:
+            n = cycles['samples'].to_numpy(dtype=float)
+            means = cycles['mean'].to_numpy(dtype=float)
+            mean = float((n * means).sum() / count)
+            m2 = float((cycles['m2'].to_numpy(dtype=float) + n * (means - mean) ** 2).sum())
+            p05, p50, p95 = self.quantile([0.05, 0.5, 0.95])
+        else:
+            mean = m2 = p05 = p50 = p95 = np.nan
+        if self.samples:
+            sample = pd.concat(self.samples, ignore_index=True)
+        else:
+            sample = pd.DataFrame(columns=self.SAMPLE_COLUMNS, dtype=float)
+        return {
+            'count': count,
+            'avg_temperature': mean,
+            'std_temperature': np.sqrt(m2 / count) if count else np.nan,
+            'min_temperature': float(cycles['min'].min()) if count else np.nan,
+            'max_temperature': float(cycles['max'].max()) if count else np.nan,
+            'p05_temperature': p05,
+            'median_temperature': p50,
+            'p95_temperature': p95,
+            'cycles': self.cycle_table(),
+            'sample': sample,
+        }
+
+
+def compute_fleet_metrics(metadata, peak_window=30):
+    """Compute discharge and impedance metrics for every battery at once
+
+    Produces the same columns calculate_battery_metrics derives per battery
+    (EFC, SOC, DOD, Capacity_Fade, Throughput for discharge; Total_Resistance
+    and Resistance_Increase for impedance) using grouped cumulative
+    operations. Both tables are indexed by a sorted battery_id so a single
+    battery can be fetched with lookup_battery.
+    """
+    # Discharge: peak capacity comes from the first peak_window valid cycles
+    discharge = metadata[metadata['type'] == 'discharge']
+    discharge = discharge[discharge['Capacity'].notna()]
+    discharge = discharge.sort_values(['battery_id', 'test_id'], kind='mergesort').reset_index(drop=True)
+    by_battery = discharge.groupby('battery_id', sort=False, observed=True)
+
+    in_window = by_battery.cumcount() < peak_window
+    peak_capacity = discharge['Capacity'].where(in_window).groupby(
+        discharge['battery_id'], sort=False, observed=True).transform('max')
+
+    discharge['EFC'] = by_battery.cumcount()
+    discharge['SOC'] = (discharge['Capacity'] / peak_capacity) * 100
+    discharge['DOD'] = 100 - discharge['SOC']
+    discharge['Capacity_Fade'] = ((peak_capacity - discharge['Capacity']) / peak_capacity) * 100
+    discharge['Throughput'] = by_battery['Capacity'].cumsum()
+
+    # Impedance: increase is relative to each battery's first valid measurement
+    impedance = metadata[metadata['type'] == 'impedance']
+    impedance = impedance[impedance['Re'].notna() & impedance['Rct'].notna()]
+    impedance = impedance.sort_values(['battery_id', 'test_id'], kind='mergesort').reset_index(drop=True)
+    impedance['Total_Resistance'] = impedance['Re'] + impedance['Rct']
+    initial_resistance = impedance.groupby('battery_id', sort=False, observed=True)['Total_Resistance'].transform('first')
+    impedance['Resistance_Increase'] = ((impedance['Total_Resistance'] - initial_resistance) / initial_resistance) * 100
+
+    return {
+        'discharge': _index_by_battery(discharge),
+        'impedance': _index_by_battery(impedance),
+    }
+
+
+def _index_by_battery(table):
+    """Index a metrics table by battery_id, keeping a categorical index to the batteries present"""
+    table = table.set_index('battery_id')
+    if isinstance(table.index, pd.CategoricalIndex):
+        table.index = table.index.remove_unused_categories()
+    return table
+
+
+def update_fleet_metrics(fleet_metrics, metadata, battery_ids, peak_window=30):
+    """Recompute the fleet metrics of battery_ids only and merge them in
+
+    Every metric depends only on its own battery's rows, so batteries that
+    received new cycles are recomputed from their full metadata while the
+    rest of the table is reused as is.
+    """
+    battery_ids = list(battery_ids)
+    if not battery_ids:
+        return fleet_metrics
+    changed = compute_fleet_metrics(metadata[metadata['battery_id'].isin(battery_ids)], peak_window)
+
+    updated = {}
+    for name, table in fleet_metrics.items():
+        kept = table[~table.index.isin(battery_ids)]
+        merged = pd.concat([kept, changed[name]]).sort_index(kind='mergesort')
+        if isinstance(table.index, pd.CategoricalIndex):
+            # Concatenating indexes with different categories falls back to strings
+            merged.index = merged.index.astype('category')
+        updated[name] = merged
+    return updated
+
+
+class LiveBatteryMetrics:
+    """Discharge/impedance metrics kept current while batteries are cycling
+
+    A battery's tables are seeded from the fleet metrics the first time it is
+    touched. New rows are then appended onto the running state (EFC counter,
+    Throughput cumulative sum, first-measurement resistance) instead of
+    recomputing the battery. Only while a battery has fewer than peak_window
+    discharge cycles can its peak capacity still move, and then SOC, DOD and
+    Capacity_Fade of those few rows are rescaled. Rows already seen (same uid)
+    are ignored; rows older than the last test_id recompute that battery.
+    """
+
+    DERIVED_COLUMNS = {
+        'discharge': ['EFC', 'SOC', 'DOD', 'Capacity_Fade', 'Throughput'],
+        'impedance': ['Total_Resistance', 'Resistance_Increase'],
+    }
+
+    def __init__(self, fleet_metrics=None, peak_window=30):
+        self.fleet_metrics = fleet_metrics
+        self.peak_window = peak_window
+        self.tables = {}
+
+    def has_battery(self, battery_id):
+        return battery_id in self.tables
+
+    def battery(self, battery_id):
+        """Return {'discharge': df, 'impedance': df} for one battery"""
+        if battery_id not in self.tables:
+            tables = {}
+            for name in ['discharge', 'impedance']:
+                if self.fleet_metrics is not None:
+                    tables[name] = lookup_battery(self.fleet_metrics[name], battery_id)
+                else:
+                    tables[name] = pd.DataFrame()
+            self.tables[battery_id] = tables
+        return self.tables[battery_id]
+
+    def append(self, rows):
+        """Fold cleaned metadata rows into the live tables; returns the touched battery ids"""
+        touched = set()
+        if rows is None or len(rows) == 0:
+            return touched
+        for battery_id, group in rows.groupby('battery_id', sort=False, observed=True):
+            discharge = group[(group['type'] == 'discharge') & group['Capacity'].notna()]
+            impedance = group[(group['type'] == 'impedance') & group['Re'].notna() & group['Rct'].notna()]
+            if len(discharge) > 0 and self._append(battery_id, 'discharge', discharge):
+                touched.add(battery_id)
+            if len(impedance) > 0 and self._append(battery_id, 'impedance', impedance):
+                touched.add(battery_id)
+        return touched
+
+    def _append(self, battery_id, name, new):
+        tables = self.battery(battery_id)
+        current = tables[name]
+        if len(current) > 0:
+            new = new[~new['uid'].isin(current['uid'])]
+        if len(new) == 0:
+            return False
+        new = new.sort_values('test_id', kind='mergesort').reset_index(drop=True)
+
+        if len(current) > 0 and new['test_id'].iloc[0] <= current['test_id'].iloc[-1]:
+            # Late rows change every cumulative value after them
+            raw = pd.concat([current.drop(columns=self.DERIVED_COLUMNS[name]), new], ignore_index=True)
+            tables[name] = compute_fleet_metrics(raw, self.peak_window)[name].reset_index()
+            return True
+
+        if name == 'discharge':
+            tables[name] = self._append_discharge(current, new)
+        else:
+            tables[name] = self._append_impedance(current, new)
+        return True
+
+    def _append_discharge(self, current, new):
+        n0 = len(current)
+        last_throughput = current['Throughput'].iloc[-1] if n0 else 0.0
+        new['EFC'] = np.arange(n0, n0 + len(new))
+        new['Throughput'] = last_throughput + new['Capacity'].cumsum()
+
+        if n0 >= self.peak_window:
+            peak_capacity = current['Capacity'].iloc[:self.peak_window].max()
+            table = pd.concat([current, self._capacity_columns(new, peak_capacity)], ignore_index=True)
+        else:
+            # The peak window is still filling up, so earlier rows may rescale
+            table = pd.concat([current, new], ignore_index=True)
+            peak_capacity = table['Capacity'].iloc[:self.peak_window].max()
+            table = self._capacity_columns(table, peak_capacity)
+        return table[list(current.columns)] if n0 else table
+
+    @staticmethod
+    def _capacity_columns(table, peak_capacity):
+        table['SOC'] = (table['Capacity'] / peak_capacity) * 100
+        table['DOD'] = 100 - table['SOC']
+        table['Capacity_Fade'] = ((peak_capacity - table['Capacity']) / peak_capacity) * 100
+        return table
+
+    @staticmethod
+    def _append_impedance(current, new):
+        new['Total_Resistance'] = new['Re'] + new['Rct']
+        initial_resistance = current['Total_Resistance'].iloc[0] if len(current) else new['Total_Resistance'].iloc[0]
+        new['Resistance_Increase'] = ((new['Total_Resistance'] - initial_resistance) / initial_resistance) * 100
+        table = pd.concat([current, new], ignore_index=True)
+        return table[list(current.columns)] if len(current) else table
+
+
+def lookup_battery(table, battery_id):
+    """Return one battery's rows from a table indexed by sorted battery_id (no rows if it is absent)"""
+    if battery_id not in table.index:
+        # Slicing a categorical index by an unknown label raises instead of returning nothing
+        return table.iloc[:0].reset_index()
+    # Label slicing on a sorted index is a binary search, not a full scan
+    return table.loc[battery_id:battery_id].reset_index()
+
+
+def compute_fleet_curves(fleet_metrics, battery_ids=None):
+    """Long-form aging curves for many batteries from the fleet metrics table
+
+    Returns a dict of tidy frames keyed 'capacity_fade' (battery_id, EFC,
+    Capacity_Fade), 'resistance_increase' (battery_id, Measurement,
+    Resistance_Increase) and 'degradation_rate' (battery_id, EFC,
+    Degradation_Rate). Every curve is derived with grouped shifts/counters,
+    so the cost does not grow with one pass per battery.
+    """
+    discharge = fleet_metrics['discharge']
+    impedance = fleet_metrics['impedance']
+    if battery_ids is not None:
+        discharge = discharge[discharge.index.isin(battery_ids)]
+        impedance = impedance[impedance.index.isin(battery_ids)]
+    discharge = discharge.reset_index()
+    impedance = impedance.reset_index()
+
+    # Per-cycle capacity loss relative to the previous cycle of the same battery
+    by_battery = discharge.groupby('battery_id', sort=False, observed=True)
+    previous = by_battery['Capacity'].shift()
+    has_previous = by_battery.cumcount() > 0
+    degradation_rate = pd.DataFrame({
+        'battery_id': discharge['battery_id'],
+        'EFC': discharge['EFC'],
+        'Degradation_Rate': (previous - discharge['Capacity']) / previous * 100,
+    })[has_previous.to_numpy()]
+
+    resistance_increase = impedance[['battery_id', 'Resistance_Increase']].copy()
+    resistance_increase.insert(1, 'Measurement', impedance.groupby('battery_id', sort=False, observed=True).cumcount())
+
+    return {
+        'capacity_fade': discharge[['battery_id', 'EFC', 'Capacity_Fade']],
+        'resistance_increase': resistance_increase,
+        'degradation_rate': degradation_rate.reset_index(drop=True),
+    }
+
+
+def compute_fleet_ranking(fleet_metrics, battery_ids=None):
+    """One summary row per battery for ranking the fleet
+
+    fade_per_cycle is the least-squares slope of Capacity_Fade over EFC,
+    computed for all batteries at once from grouped sums.
+    """
+    curves = compute_fleet_curves(fleet_metrics, battery_ids)
+    discharge = curves['capacity_fade']
+    x = discharge['EFC'].astype(float)
+    y = discharge['Capacity_Fade']
+
+    sums = pd.DataFrame({
+        'battery_id': discharge['battery_id'],
+        'n': 1.0,
+        'x': x,
+        'y': y,
+        'xx': x * x,
+        'xy': x * y,
+    }).groupby('battery_id', observed=True).sum()
+    denominator = sums['n'] * sums['xx'] - sums['x'] ** 2
+    slope = (sums['n'] * sums['xy'] - sums['x'] * sums['y']) / denominator.where(denominator != 0)
+
+    by_battery = discharge.groupby('battery_id', observed=True)
+    ranking = pd.DataFrame({
+        'cycles': by_battery.size(),
+        'capacity_fade': by_battery['Capacity_Fade'].last(),
+        'fade_per_cycle': slope,
+        'avg_degradation_rate': curves['degradation_rate'].groupby('battery_id', observed=True)['Degradation_Rate'].mean(),
+    })
+
+    resistance = curves['resistance_increase'].groupby('battery_id', observed=True)['Resistance_Increase']
+    ranking = ranking.join(pd.DataFrame({
+        'final_resistance_increase': resistance.last(),
+        'max_resistance_increase': resistance.max(),
+    }), how='outer')
+    ranking.index.name = 'battery_id'
+    return ranking
+
+
+RUL_MODELS = ['linear', 'exponential', 'piecewise']
+# Part of the persisted RUL table's fingerprint; bump it whenever the fits change
+RUL_FIT_VERSION = 2
+# Upper bounds (cycles of RUL) of the risk bands in the fleet risk table
+RUL_RISK_BANDS = [(0, 'EOL reached'), (25, 'High'), (100, 'Medium'), (np.inf, 'Low')]
+
+
+def _grouped_line_fit(codes, x, y, n_groups, weights=None):
+    """Least-squares line per group from bincount sums; returns (intercept, slope, n)"""
+    if weights is None:
+        weights = np.ones_like(x)
+    n = np.bincount(codes, weights, n_groups)
+    sx = np.bincount(codes, weights * x, n_groups)
+    sy = np.bincount(codes, weights * y, n_groups)
+    sxx = np.bincount(codes, weights * x * x, n_groups)
+    sxy = np.bincount(codes, weights * x * y, n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = n * sxx - sx ** 2
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = (sy - slope * sx) / n
+    return intercept, slope, n
+
+
+def _cycles_to_threshold(x_last, x_threshold):
+    """RUL in cycles from the model's threshold crossing; 0 once it has passed"""
+    return np.where(np.isfinite(x_threshold), np.maximum(x_threshold - x_last, 0), np.nan)
+
+
+def compute_fleet_rul(discharge, eol_fade=30, min_cycles=5, window=DEGRADATION_WINDOW, min_segment=10):
+    """Remaining useful life of every battery from batched degradation-model fits
+
+    discharge is the fleet discharge table (indexed by battery_id, with EFC
+    and Capacity_Fade). Three models of Capacity_Fade over EFC are fitted for
+    all batteries at once with grouped least squares:
+
+    - linear: fade = a + b * EFC
+    - exponential: retention = 100 - fade = A * exp(k * EFC), fitted on log(retention)
+    - piecewise: the linear model fitted only after each battery's knee
+      (Kneedle on the fade curve after a centred rolling mean over window
+      cycles), i.e. the current aging regime. With fewer than min_segment
+      cycles on either side of the knee there is no knee to speak of and the
+      piecewise model is the linear one (knee_efc is NaN)
+
+    Each model's RUL is the cycles left until fade reaches eol_fade (NaN when
+    the model shows no fade, 0 once the threshold has been crossed). The
+    model with the lowest AIC on fade residuals is picked as best_model.
+    Batteries with fewer than min_cycles cycles are left out.
+    """
+    table = discharge.reset_index()[['battery_id', 'EFC', 'Capacity_Fade']].dropna()
+    codes, battery_ids = pd.factorize(table['battery_id'])
+    n_groups = len(battery_ids)
+    x = table['EFC'].to_numpy(dtype=float)
+    y = table['Capacity_Fade'].to_numpy(dtype=float)
+    # The fleet table is already grouped by battery in EFC order; only sort when it is not
+    step = np.diff(codes)
+    if not ((step >= 0).all() and (np.diff(x)[step == 0] >= 0).all()):
+        order = np.lexsort((x, codes))
+        codes, x, y = codes[order], x[order], y[order]
+    # Per-row view of a per-battery array
+    def per_row(values):
+        return values[codes]
+
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    # First and last row of every group (codes are sorted and every group has rows)
+    starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    ends = np.r_[starts[1:], len(codes)] - 1
+    x_first, x_last = x[starts], x[ends]
+    fade_last = y[ends]
+
+    def sse(predicted):
+        return np.bincount(codes, (y - predicted) ** 2, n_groups)
+
+    # Linear
+    a, b, _ = _grouped_line_fit(codes, x, y, n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        linear_eol = np.where(b > 0, (eol_fade - a) / b, np.nan)
+    linear_sse = sse(per_row(a) + per_row(b) * x)
+
+    # Exponential on retention
+    retention = 100 - y
+    positive = retention > 0
+    log_a, k, _ = _grouped_line_fit(codes, x, np.log(np.where(positive, retention, 1)), n_groups,
+                                    weights=positive.astype(float))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        exponential_eol = np.where(k < 0, (np.log(100 - eol_fade) - log_a) / k, np.nan)
+        exponential_sse = sse(100 - np.exp(per_row(log_a) + per_row(k) * x))
+
+    # Piecewise: knee per battery from the smoothed fade curve scaled to [0, 1], so
+    # cycle-to-cycle noise does not pass for a change of regime
+    smoothed = pd.Series(y).groupby(codes, sort=False).rolling(window, min_periods=1, center=True).mean()
+    smoothed = smoothed.droplevel(0).sort_index().to_numpy()
+    y_min = np.full(n_groups, np.inf)
+    np.minimum.at(y_min, codes, smoothed)
+    y_max = np.full(n_groups, -np.inf)
+    np.maximum.at(y_max, codes, smoothed)
+    y_first, y_end = smoothed[starts], smoothed[ends]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_norm = (x - per_row(x_first)) / per_row(x_last - x_first)
+        y_span = per_row(y_max - y_min)
+        chord = (per_row(y_first) + (per_row(y_end) - per_row(y_first)) * x_norm - per_row(y_min)) / y_span
+        distance = np.nan_to_num(np.abs((smoothed - per_row(y_min)) / y_span - chord), nan=-1.0)
+    # Row of the largest distance per group: sort by (group, distance) and take each group's last row
+    order = np.lexsort((distance, codes))
+    knee_x = x[order[ends]]
+    after_knee = x >= per_row(knee_x)
+    pa, pb, p_n = _grouped_line_fit(codes, x, y, n_groups, weights=after_knee.astype(float))
+    before_knee = ~after_knee
+    ba, bb, b_n = _grouped_line_fit(codes, x, y, n_groups, weights=before_knee.astype(float))
+    # A short segment always fits closely and would win on AIC; fall back to the linear fit
+    usable = (p_n >= min_segment) & (b_n >= min_segment) & np.isfinite(pb) & np.isfinite(bb)
+    pa, pb = np.where(usable, pa, a), np.where(usable, pb, b)
+    ba, bb = np.where(usable, ba, a), np.where(usable, bb, b)
+    knee_x = np.where(usable, knee_x, np.nan)
+    piecewise_predicted = np.where(after_knee, per_row(pa) + per_row(pb) * x,
+                                   per_row(ba) + per_row(bb) * x)
+    piecewise_sse = sse(np.nan_to_num(piecewise_predicted, nan=np.inf))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        piecewise_eol = np.where(pb > 0, (eol_fade - pa) / pb, np.nan)
+
+    rul = pd.DataFrame({
+        'cycles': n.astype(int),
+        'capacity_fade': fade_last,
+        'knee_efc': knee_x,
+        'linear_rul': _cycles_to_threshold(x_last, linear_eol),
+        'exponential_rul': _cycles_to_threshold(x_last, exponential_eol),
+        'piecewise_rul': _cycles_to_threshold(x_last, piecewise_eol),
+    }, index=pd.Index(battery_ids, name='battery_id'))
+
+    # AIC = n * log(SSE / n) + 2 * parameters; the piecewise knee position counts as a fifth
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aic = np.column_stack([
+            n * np.log(linear_sse / n) + 4,
+            n * np.log(exponential_sse / n) + 4,
+            n * np.log(piecewise_sse / n) + 10,
+        ])
+    model_rul = rul[[f'{model}_rul' for model in RUL_MODELS]].to_numpy()
+    aic = np.where(np.isfinite(aic) & np.isfinite(model_rul), aic, np.inf)
+    best = np.argmin(aic, axis=1)
+    has_best = np.isfinite(aic[np.arange(n_groups), best])
+    rul['best_model'] = np.where(has_best, np.array(RUL_MODELS)[best], None)
+    rul['rul'] = np.where(has_best, model_rul[np.arange(n_groups), best], np.nan)
+    rul.loc[rul['capacity_fade'] >= eol_fade, 'rul'] = 0.0
+    rul['eol_efc'] = x_last + rul['rul'].to_numpy()
+
+    bounds = [-np.inf] + [bound for bound, _ in RUL_RISK_BANDS]
+    rul['risk'] = pd.cut(rul['rul'], bounds, labels=[label for _, label in RUL_RISK_BANDS])
+    return rul[rul['cycles'] >= min_cycles]
+
+
+ALIGNED_RESISTANCE_COLUMNS = ['Total_Resistance', 'Resistance_Increase']
+
+
+def align_impedance_to_discharge(discharge, impedance, on='test_id'):
+    """Resistance at every discharge cycle, from the impedance tests around it
+
+    Both tables may hold any number of batteries (battery_id as a column or
+    as the index). Two merge_asof joins by battery on the sort key (test_id,
+    or start_time) find the last impedance test at or before each discharge
+    cycle and the first one at or after it; Total_Resistance and
+    Resistance_Increase are interpolated linearly between them on that key
+    and held flat outside a battery's first/last test. resistance_gap is the
+    key distance to the nearest test (test_ids, or seconds for start_time).
+
+    Returns a copy of discharge (same index and row order) with those three
+    columns added; they are NaN for batteries without impedance data and for
+    rows whose key is missing.
+    """
+    def keyed(table, columns):
+        frame = table.reset_index() if 'battery_id' not in table.columns else table
+        return pd.DataFrame({'battery_id': frame['battery_id'].array,
+                             '_key': frame[on].to_numpy(),
+                             **{column: frame[column].to_numpy() for column in columns}})
+
+    left = keyed(discharge, [])
+    left['_row'] = np.arange(len(left))
+    right = keyed(impedance, ALIGNED_RESISTANCE_COLUMNS)
+    left = left[left['_key'].notna()]
+    right = right[right['_key'].notna() & right['Total_Resistance'].notna()]
+
+    aligned = discharge.copy()
+    for column in ALIGNED_RESISTANCE_COLUMNS + ['resistance_gap']:
+        aligned[column] = np.nan
+    if len(left) == 0 or len(right) == 0:
+        return aligned
+
+    # Integer battery codes keep the by-join cheap whatever the id dtype (-1: no discharge rows)
+    left['battery_id'], battery_ids = pd.factorize(left['battery_id'])
+    right['battery_id'] = pd.Categorical(right['battery_id'], categories=battery_ids).codes.astype(np.int64)
+    if on == 'start_time':
+        # Seconds since the epoch, whatever the datetime resolution
+        for frame in (left, right):
+            frame['_key'] = (pd.to_datetime(frame['_key']) - pd.Timestamp(0)).dt.total_seconds()
+    left = left.astype({'_key': float}).sort_values('_key', kind='mergesort')
+    right = right.astype({'_key': float}).sort_values('_key', kind='mergesort')
+    right['_test_key'] = right['_key']
+
+    joins = {direction: pd.merge_asof(left, right, on='_key', by='battery_id', direction=direction)
+             for direction in ('backward', 'forward')}
+    key = left['_key'].to_numpy()
+    before, after = joins['backward'], joins['forward']
+    key_before, key_after = before['_test_key'].to_numpy(), after['_test_key'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(key_after > key_before, (key - key_before) / (key_after - key_before), 0.0)
+    # Only one side exists before a battery's first or after its last impedance test
+    weight = np.where(np.isnan(key_before), 1.0, np.where(np.isnan(key_after), 0.0, weight))
+
+    rows = left['_row'].to_numpy()
+    for column in ALIGNED_RESISTANCE_COLUMNS:
+        low = before[column].to_numpy(dtype=float)
+        high = after[column].to_numpy(dtype=float)
+        values = np.where(weight == 0, low, np.where(weight == 1, high, low + weight * (high - low)))
+        column_values = np.full(len(aligned), np.nan)
+        column_values[rows] = values
+        aligned[column] = column_values
+    gap = np.fmin(np.abs(key - key_before), np.abs(key_after - key))
+    gap_values = np.full(len(aligned), np.nan)
+    gap_values[rows] = gap
+    aligned['resistance_gap'] = gap_values
+    return aligned
+
+
+def compute_resistance_correlation(aligned):
+    """Per-battery linear fit of Capacity on aligned Total_Resistance
+
+    aligned comes from align_impedance_to_discharge (any number of
+    batteries). Returns intercept, slope, r_squared and the number of cycles
+    used, indexed by battery_id; r_squared is NaN below three cycles or
+    without resistance spread.
+    """
+    table = aligned.reset_index() if 'battery_id' not in aligned.columns else aligned
+    table = table[['battery_id', 'Total_Resistance', 'Capacity']].dropna()
+    codes, battery_ids = pd.factorize(table['battery_id'])
+    n_groups = len(battery_ids)
+    x = table['Total_Resistance'].to_numpy(dtype=float)
+    y = table['Capacity'].to_numpy(dtype=float)
+    intercept, slope, n = _grouped_line_fit(codes, x, y, n_groups)
+    # r = cov / (sd_x * sd_y) from the same bincount sums
+    sx, sy = np.bincount(codes, x, n_groups), np.bincount(codes, y, n_groups)
+    sxx, syy = np.bincount(codes, x * x, n_groups), np.bincount(codes, y * y, n_groups)
+    sxy = np.bincount(codes, x * y, n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    r_squared = np.where(n >= 3, r ** 2, np.nan)
+    return pd.DataFrame({'intercept': intercept, 'slope': slope, 'r_squared': r_squared, 'n': n.astype(int)},
+                        index=pd.Index(battery_ids, name='battery_id'))
+
+
+# Higher is worse for every screening feature, so only the upper tail is flagged
+SCREENING_FEATURES = ['fade_rate', 'fade_scatter', 'resistance_slope']
+# Modified z-score above which the fleet screen flags a battery (Iglewicz & Hoaglin)
+SCREENING_THRESHOLD = 3.5
+# Smallest spread the screen divides by, as a fraction of the fleet's median |feature|
+SCREENING_MIN_SPREAD = 0.01
+
+
+def compute_efficiency_drift(efficiency_table):
+    """Change of real energy efficiency per cycle (%/cycle) from a compute_energy_efficiency table"""
+    efficiency = efficiency_table['efficiency'].dropna().to_numpy(dtype=float)
+    if len(efficiency) < 2:
+        return np.nan
+    return float(np.polyfit(np.arange(len(efficiency)), efficiency, 1)[0])
+
+
+def compute_fleet_features(aligned, metadata=None):
+    """Per-battery screening features for the whole fleet in one grouped pass
+
+    aligned is the fleet discharge table with the resistance aligned to
+    every cycle (align_impedance_to_discharge). Features per battery:
+
+    - fade_rate: slope of Capacity_Fade over EFC (%/cycle)
+    - fade_scatter: RMS residual around that line (%), i.e. erratic capacity readings
+    - resistance_slope: slope of Resistance_Increase over EFC (%/cycle)
+
+    Efficiency drift and measured temperature are left out: they need every
+    battery's per-cycle files, which a screen over the whole fleet cannot
+    afford to read. ambient_temperature in metadata is the chamber setpoint,
+    not a property of the battery.
+
+    Batteries in metadata without a single valid discharge cycle get a row
+    with cycles = 0.
+    """
+    table = aligned.reset_index() if 'battery_id' not in aligned.columns else aligned
+    battery_ids = set(table['battery_id'].unique())
+    if metadata is not None:
+        battery_ids |= set(metadata['battery_id'].unique())
+    battery_ids = pd.Index(sorted(battery_ids), name='battery_id')
+    n_groups = len(battery_ids)
+    codes = pd.Categorical(table['battery_id'].array, categories=battery_ids).codes.astype(np.int64)
+    x = table['EFC'].to_numpy(dtype=float)
+
+    def line_fit(column):
+        """Slope, RMS residual and point count of column over EFC, per battery"""
+        if column not in table.columns:
+            return np.full(n_groups, np.nan), np.full(n_groups, np.nan), np.zeros(n_groups)
+        y = table[column].to_numpy(dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        x_valid, y_valid = np.where(valid, x, 0), np.where(valid, y, 0)
+        intercept, slope, n = _grouped_line_fit(codes, x_valid, y_valid, n_groups, weights=valid.astype(float))
+        residual = np.where(valid, y_valid - intercept[codes] - slope[codes] * x_valid, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rms = np.sqrt(np.bincount(codes, residual ** 2, n_groups) / n)
+        return slope, np.where(np.isfinite(slope), rms, np.nan), n
+
+    fade_rate, fade_scatter, cycles = line_fit('Capacity_Fade')
+    resistance_slope, _, _ = line_fit('Resistance_Increase')
+
+    features = pd.DataFrame({
+        'cycles': cycles.astype(int),
+        'fade_rate': fade_rate,
+        'fade_scatter': fade_scatter,
+        'resistance_slope': resistance_slope,
+    }, index=battery_ids)
+    return features
+
+
+def screen_fleet(features, threshold=SCREENING_THRESHOLD, min_cycles=5, min_batteries=5):
+    """Flag batteries whose features are robust outliers against the rest of the fleet
+
+    Each feature is scored with the modified z-score 0.6745 * (x - median) / MAD,
+    falling back to the mean absolute deviation when more than half of the
+    fleet shares the median value. Unlike mean and standard deviation, the
+    median and MAD are not dragged along by the outliers, so one broken
+    battery cannot mask another. The spread is floored at SCREENING_MIN_SPREAD
+    times the median |feature|, so a fleet of near-identical values does not
+    turn rounding noise into huge scores; a feature with no spread at all is
+    not scored. The screen is one-sided: only z above threshold counts, so
+    unusually healthy batteries (slow fade, flat resistance) stay in the
+    analysis. Only batteries with at least min_cycles discharge cycles form
+    the reference and get scored, and features known for fewer than
+    min_batteries of them are not scored. Batteries below min_cycles are
+    marked insufficient_data instead: too short to judge, not outliers.
+
+    Returns features plus a <feature>_z column per feature, score (largest
+    z), flagged, insufficient_data and reason, indexed by battery_id.
+    """
+    screen = features.copy()
+    enough_cycles = screen['cycles'].to_numpy() >= min_cycles
+    for feature in SCREENING_FEATURES:
+        values = screen[feature].to_numpy(dtype=float)
+        reference = values[enough_cycles & np.isfinite(values)]
+        z = np.full(len(values), np.nan)
+        if len(reference) >= min_batteries:
+            median = np.median(reference)
+            mad = np.median(np.abs(reference - median))
+            # MAD / 0.6745 and 1.253314 * mean absolute deviation both estimate sigma
+            spread = mad / 0.6745 if mad > 0 else 1.253314 * np.mean(np.abs(reference - median))
+            spread = max(spread, SCREENING_MIN_SPREAD * np.median(np.abs(reference)))
+            if spread > 0:
+                z = np.where(enough_cycles, (values - median) / spread, np.nan)
+        screen[f'{feature}_z'] = z
+
+    z_columns = [f'{feature}_z' for feature in SCREENING_FEATURES]
+    z = screen[z_columns].to_numpy(dtype=float)
+    scored = np.isfinite(z).any(axis=1)
+    screen['score'] = np.where(scored, np.where(np.isfinite(z), z, -np.inf).max(axis=1), np.nan)
+    outlier = z > threshold
+    screen['flagged'] = outlier.any(axis=1)
+    screen['insufficient_data'] = ~enough_cycles
+
+    reasons = np.full(len(screen), '', dtype=object)
+    for row in np.flatnonzero(~enough_cycles):
+        reasons[row] = f"only {screen['cycles'].iat[row]} discharge cycles"
+    for row in np.flatnonzero(screen['flagged'].to_numpy()):
+        worst = sorted(np.flatnonzero(outlier[row]), key=lambda column: -z[row, column])
+        reasons[row] = ', '.join(f"{SCREENING_FEATURES[column]} z={z[row, column]:+.1f}" for column in worst)
+    screen['reason'] = reasons
+    return screen
+
+
+def lttb_indices(x, y, n_out):
+    """Pick n_out point indices with Largest-Triangle-Three-Buckets
+
+    Keeps the first and last points and, for every bucket in between, the
+    point forming the largest triangle with the previously kept point and the
+    mean of the next bucket. Points are bucketed in their given order, so the
+    drawing order of a line trace is preserved.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the following bucket (or the last point for the final bucket)
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_stop].mean()
+        next_y = y[next_start:next_stop].mean()
+
+        bucket_x = x[start:stop]
+        bucket_y = y[start:stop]
+        areas = np.abs((x[previous] - next_x) * (bucket_y - y[previous])
+                       - (x[previous] - bucket_x) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Pick the min and max point of each bucket, about n_out indices in total"""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    buckets = np.arange(n) * (n_out // 2) // n
+    # Sorting by (bucket, y) puts each bucket's min first and max last
+    order = np.lexsort((y, buckets))
+    sorted_buckets = buckets[order]
+    is_first = np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]]
+    is_last = np.r_[sorted_buckets[1:] != sorted_buckets[:-1], True]
+    return np.unique(np.concatenate([order[is_first], order[is_last]]))
+
+
+def downsample_xy(x, y, max_points, method='lttb'):
+    """Downsample a trace to at most max_points, preserving its visual shape
+
+    method is 'lttb' (best for lines) or 'minmax' (keeps every bucket's
+    extremes, suited to dense scatter clouds). Returns NumPy arrays.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if not max_points or len(y) <= max_points:
+        return x, y
+    if method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        indices = lttb_indices(x, y, max_points)
+    return x[indices], y[indices]
+
+
+def compute_degradation_rates(discharge_data):
+    """Per-cycle capacity change in percent, returned as (efc, rates)"""
+    capacity_values = discharge_data['Capacity'].to_numpy(dtype=float)
+    efc_values = discharge_data['EFC'].to_numpy()
+
+    # Percentage change between consecutive cycles
+    degradation_rates = (capacity_values[:-1] - capacity_values[1:]) / capacity_values[:-1] * 100
+    return efc_values[1:], degradation_rates
+
+
+def find_knee(x, y):
+    """Index of the knee of a curve, or None with fewer than three points
+
+    Both axes are scaled to [0, 1] and the knee is the point furthest from
+    the straight line joining the first and last points (Kneedle). For a
+    capacity curve that is where slow early fade turns into fast fade.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if valid.sum() < 3:
+        return None
+    positions = np.flatnonzero(valid)
+    x, y = x[valid], y[valid]
+    x_span = x[-1] - x[0]
+    y_span = y.max() - y.min()
+    if x_span == 0 or y_span == 0:
+        return None
+    x_norm = (x - x[0]) / x_span
+    y_norm = (y - y.min()) / y_span
+    chord = y_norm[0] + (y_norm[-1] - y_norm[0]) * x_norm
+    distance = np.abs(y_norm - chord)
+    knee = int(np.argmax(distance))
+    if distance[knee] <= 0:
+        return None
+    return int(positions[knee])
+
+
+def compute_degradation_profile(discharge_data, window=DEGRADATION_WINDOW, span=DEGRADATION_SPAN, peak_window=30):
+    """Capacity retention, per-cycle rates, smoothed rates and knee point in one pass
+
+    rates is the raw cycle-to-cycle capacity change (%/cycle) at rate_efc;
+    rolling_rate is its trailing mean over window cycles and ewma_rate its
+    exponentially weighted mean with the given span. The knee is found on the
+    capacity curve after a centred rolling mean over window cycles. The
+    dashboard plots and the executive summary all read this dict instead of
+    recomputing their own series.
+    """
+    capacity = discharge_data['Capacity']
+    efc = discharge_data['EFC'].to_numpy()
+
+    # Use first rows to find peak capacity (avoid calibration issues)
+    peak_capacity = capacity.iloc[:peak_window].max()
+    retention = (capacity / peak_capacity) * 100
+
+    rate_efc, rates = compute_degradation_rates(discharge_data)
+    rate_series = pd.Series(rates)
+    rolling_rate = rate_series.rolling(window, min_periods=1).mean().to_numpy()
+    ewma_rate = rate_series.ewm(span=span, adjust=False).mean().to_numpy()
+
+    # Smooth cycle-to-cycle noise so the knee follows the trend, not one outlier
+    knee = find_knee(efc, capacity.rolling(window, min_periods=1, center=True).mean().to_numpy(dtype=float))
+    return {
+        'efc': efc,
+        'retention': retention,
+        'peak_capacity': peak_capacity,
+        'rate_efc': rate_efc,
+        'rates': rates,
+        'rolling_rate': rolling_rate,
+        'ewma_rate': ewma_rate,
+        'window': window,
+        'span': span,
+        'avg_rate': float(rates.mean()) if len(rates) else np.nan,
+        'recent_rate': float(ewma_rate[-1]) if len(rates) else np.nan,
+        'knee_index': knee,
+        'knee_efc': efc[knee] if knee is not None else np.nan,
+        'knee_capacity': capacity.iloc[knee] if knee is not None else np.nan,
+    }
+
+
+def compute_executive_summary(discharge_data, impedance_data=None, eol_fade=30, profile=None, rul=None,
+                              correlation=None):
+    """Key performance numbers behind the executive summary
+
+    Returns a flat dict; resistance and RUL entries are NaN when impedance
+    data is missing or the battery shows no capacity fade. Degradation rate
+    and knee entries come from profile (compute_degradation_profile), which
+    is computed here when not passed in. rul is this battery's row of
+    compute_fleet_rul; without one, cycles to EOL fall back to a linear
+    extrapolation of the fade so far. correlation is this battery's row of
+    compute_resistance_correlation (capacity_resistance_r2 is NaN without it).
+
+    capacity_fade is the last Capacity_Fade, i.e. relative to the peak of the
+    first cycles, the same fade compute_fleet_rul fits, so the status, the
+    fallback and the fleet RUL all use one definition.
+    """
+    if profile is None:
+        profile = compute_degradation_profile(discharge_data)
+    initial_capacity = discharge_data['Capacity'].iloc[0]
+    final_capacity = discharge_data['Capacity'].iloc[-1]
+    total_cycles = len(discharge_data)
+    capacity_fade = discharge_data['Capacity_Fade'].iloc[-1]
+    total_throughput = discharge_data['Throughput'].iloc[-1]
+
+    summary = {
+        'initial_capacity': initial_capacity,
+        'final_capacity': final_capacity,
+        'total_cycles': total_cycles,
+        'capacity_fade': capacity_fade,
+        'initial_resistance': np.nan,
+        'final_resistance': np.nan,
+        'resistance_increase': np.nan,
+        'total_throughput': total_throughput,
+        'avg_throughput_per_cycle': total_throughput / total_cycles,
+        'cycles_to_eol': np.nan,
+        'remaining_life': np.nan,
+        'avg_degradation_rate': profile['avg_rate'],
+        'recent_degradation_rate': profile['recent_rate'],
+        'knee_efc': profile['knee_efc'],
+        'knee_capacity': profile['knee_capacity'],
+        'capacity_resistance_r2': correlation['r_squared'] if correlation is not None else np.nan,
+    }
+
+    if impedance_data is not None and len(impedance_data) > 0:
+        initial_resistance = impedance_data['Total_Resistance'].iloc[0]
+        final_resistance = impedance_data['Total_Resistance'].iloc[-1]
+        summary['initial_resistance'] = initial_resistance
+        summary['final_resistance'] = final_resistance
+        summary['resistance_increase'] = ((final_resistance - initial_resistance) / initial_resistance) * 100
+
+    summary['rul_model'] = None
+    if rul is not None and np.isfinite(rul['rul']):
+        # Best-fitting degradation model from the fleet RUL table
+        summary['cycles_to_eol'] = rul['rul']
+        summary['remaining_life'] = (rul['rul'] / total_cycles) * 100
+        summary['rul_model'] = rul['best_model']
+    elif capacity_fade > 0:
+        # RUL prediction from a linear extrapolation of the fade so far
+        cycles_to_eol = max(0.0, (eol_fade - capacity_fade) / (capacity_fade / total_cycles))
+        summary['cycles_to_eol'] = cycles_to_eol
+        summary['remaining_life'] = (cycles_to_eol / total_cycles) * 100
+        summary['rul_model'] = 'linear_endpoints'
+
+    if capacity_fade > 30:
+        summary['status'] = 'end_of_life'
+    elif capacity_fade > 20:
+        summary['status'] = 'advanced_degradation'
+    elif capacity_fade > 10:
+        summary['status'] = 'moderate_aging'
+    else:
+        summary['status'] = 'good'
+
+    return summary
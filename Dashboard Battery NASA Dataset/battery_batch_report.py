@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Battery Batch Report - NASA Dataset
+Headless (no Streamlit) analysis of every available battery: writes one
+summary table plus per-battery figure files, spreading batteries across
+worker processes
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from battery_analytics import (ENERGY_EFFICIENCY_COLUMNS, RUL_FIT_VERSION, SCREENING_THRESHOLD, THERMAL_COLUMNS,
+                               StreamingEnergyEfficiency, StreamingThermalStats, align_impedance_to_discharge,
+                               compute_degradation_profile, compute_efficiency_drift, compute_energy_efficiency,
+                               compute_executive_summary, compute_fleet_features, compute_fleet_metrics,
+                               compute_fleet_rul, compute_resistance_correlation, lookup_battery, screen_fleet,
+                               update_fleet_metrics)
+from battery_data_store import (MetadataIndex, TimeSeriesStore, clean_metadata, compact_metadata,
+                                concat_detail_frames, ingest_metadata, iter_detail_chunks, load_cycles,
+                                load_fingerprinted_table, load_tables, save_fingerprinted_table, save_tables,
+                                select_available_batteries, sort_metadata, table_fingerprint)
+from battery_figures import (IV_CURVE_CYCLES, capacity_degradation_figure, capacity_retention_figure,
+                             capacity_vs_resistance_figure, degradation_rate_figure, impedance_parameters_figure,
+                             iv_curves_figure, real_energy_efficiency_figure, resistance_increase_figure,
+                             soc_dod_figure, thermal_figures, thermal_trend_figure, throughput_figure)
+warnings.filterwarnings('ignore')
+
+METADATA_PATH = "cleaned_dataset_battery_NASA/metadata.csv"
+DATA_DIR = "cleaned_dataset_battery_NASA/data"
+COLUMNAR_DIR = "cleaned_dataset_battery_NASA/columnar"
+TIMESERIES_DIR = "cleaned_dataset_battery_NASA/timeseries"
+METRICS_DIR = "cleaned_dataset_battery_NASA/metrics"
+INGEST_DIR = "cleaned_dataset_battery_NASA/ingest"
+OUTPUT_DIR = "battery_reports"
+
+DETAIL_COLUMNS = sorted(set(ENERGY_EFFICIENCY_COLUMNS + THERMAL_COLUMNS))
+
+
+def write_figure(fig, path, fig_format):
+    """Write a figure as html, json or a static image (png/svg needs kaleido)"""
+    if fig_format == 'html':
+        fig.write_html(path, include_plotlyjs='cdn')
+    elif fig_format == 'json':
+        fig.write_json(path)
+    else:
+        fig.write_image(path)
+
+
+def build_battery_report(battery_id, discharge, impedance, output_dir, fig_format,
+                         detail_cycles=None, data_dir=None, store_dir=None, max_points=2000,
+                         timeseries_dir=None, stream_mb=None, rul=None, correlation=None):
+    """Compute every metric and write every figure for one battery
+
+    Runs inside a worker process, so it only receives this battery's slices:
+    discharge carries the resistance aligned to each cycle
+    (align_impedance_to_discharge), rul and correlation are its rows of the
+    fleet RUL and capacity-resistance correlation tables. With stream_mb the detail
+    analyses read the cycles in bounded chunks instead of loading the whole
+    battery. Returns one summary row as a dict.
+    """
+    row = {
+        'battery_id': battery_id,
+        'discharge_cycles': len(discharge),
+        'impedance_tests': len(impedance),
+    }
+    figures = {}
+
+    if len(discharge) > 0:
+        # One degradation profile feeds the summary row and both rate figures
+        profile = compute_degradation_profile(discharge)
+        row.update(compute_executive_summary(discharge, impedance, profile=profile, rul=rul,
+                                             correlation=correlation))
+        figures['capacity_degradation'] = capacity_degradation_figure(discharge, battery_id)
+        figures['soc_dod_evolution'] = soc_dod_figure(discharge, battery_id)
+        figures['throughput'] = throughput_figure(discharge, battery_id)
+
+        retention_fig, retention, peak_capacity = capacity_retention_figure(discharge, battery_id, profile)
+        figures['capacity_retention'] = retention_fig
+        row['peak_capacity'] = peak_capacity
+        row['final_retention'] = retention.iloc[-1]
+
+        rate_fig, _ = degradation_rate_figure(discharge, battery_id, profile)
+        if rate_fig is not None:
+            figures['degradation_rate'] = rate_fig
+
+    if len(impedance) > 0:
+        figures['impedance_parameters'] = impedance_parameters_figure(impedance, battery_id)
+        figures['resistance_increase'] = resistance_increase_figure(impedance, battery_id)
+        row['max_resistance_increase'] = impedance['Resistance_Increase'].max()
+
+    if len(discharge) > 0 and len(impedance) > 0:
+        figures['capacity_vs_resistance'], _ = capacity_vs_resistance_figure(discharge, battery_id, correlation)
+
+    if detail_cycles and stream_mb:
+        figures.update(stream_detail_report(battery_id, row, detail_cycles, data_dir, store_dir, max_points,
+                                            timeseries_dir, stream_mb))
+
+    elif detail_cycles:
+        packed = None
+        if timeseries_dir:
+            packed = TimeSeriesStore(timeseries_dir).read(
+                battery_id, 'discharge', [uid for _, uid, _ in detail_cycles], DETAIL_COLUMNS)
+        if packed is not None:
+            frames = [packed]
+            row['detail_files_failed'] = 0
+        else:
+            results = load_cycles(data_dir, detail_cycles, DETAIL_COLUMNS, store_dir=store_dir,
+                                  battery_id=battery_id, test_type='discharge')
+            frames = [df for _, df, error in results if error is None]
+            row['detail_files_failed'] = sum(error is not None for _, _, error in results)
+
+        if frames:
+            detailed_data = concat_detail_frames(frames)
+            columns = set(detailed_data.columns)
+
+            if {'Voltage_measured', 'Current_measured'} <= columns:
+                figures['iv_curves'] = iv_curves_figure(detailed_data, battery_id, max_points)
+
+            if set(ENERGY_EFFICIENCY_COLUMNS) <= columns:
+                efficiency_table = compute_energy_efficiency(detailed_data).dropna(subset=['efficiency'])
+                if len(efficiency_table) > 0:
+                    figures['real_energy_efficiency'] = real_energy_efficiency_figure(
+                        efficiency_table, battery_id, max_points)
+                    row['avg_real_efficiency'] = efficiency_table['efficiency'].mean()
+                    row['final_real_efficiency'] = efficiency_table['efficiency'].iloc[-1]
+                    row['efficiency_drift'] = compute_efficiency_drift(efficiency_table)
+
+            if set(THERMAL_COLUMNS) <= columns:
+                thermal = StreamingThermalStats(max_points)
+                thermal.update(detailed_data)
+                figures.update(thermal_report(battery_id, row, thermal, max_points))
+
+    battery_dir = Path(output_dir) / battery_id
+    battery_dir.mkdir(parents=True, exist_ok=True)
+    for name, fig in figures.items():
+        write_figure(fig, battery_dir / f"{name}.{fig_format}", fig_format)
+    row['figures'] = len(figures)
+
+    return row
+
+
+def thermal_report(battery_id, row, thermal, max_points):
+    """Thermal figures and row entries from a fed StreamingThermalStats"""
+    thermal_stats = thermal.result()
+    if thermal_stats['count'] == 0:
+        return {}
+    for name in ['avg', 'std', 'min', 'max', 'p05', 'median', 'p95']:
+        row[f'{name}_temperature'] = thermal_stats[f'{name}_temperature']
+    figures = {'thermal_trend': thermal_trend_figure(thermal_stats['cycles'], battery_id)}
+    figures['temperature_vs_time'], figures['temperature_vs_voltage'] = thermal_figures(
+        thermal_stats['sample'], battery_id, max_points)
+    return figures
+
+
+def stream_detail_report(battery_id, row, detail_cycles, data_dir, store_dir, max_points,
+                         timeseries_dir, stream_mb):
+    """Detail figures and row entries computed from bounded-memory chunks"""
+    figures = {}
+    timeseries_store = TimeSeriesStore(timeseries_dir) if timeseries_dir else None
+
+    # I-V curves only ever show the first few cycles (in uid order, like the figure)
+    iv_cycles = sorted(detail_cycles, key=lambda cycle: cycle[1])[:IV_CURVE_CYCLES]
+    results = load_cycles(data_dir, iv_cycles, ['Voltage_measured', 'Current_measured'],
+                          store_dir=store_dir, battery_id=battery_id, test_type='discharge')
+    frames = [df for _, df, error in results if error is None]
+    if frames and {'Voltage_measured', 'Current_measured'} <= set(frames[0].columns):
+        figures['iv_curves'] = iv_curves_figure(concat_detail_frames(frames), battery_id, max_points)
+
+    errors = []
+    efficiency = StreamingEnergyEfficiency()
+    thermal = StreamingThermalStats(max_points)
+    for chunk in iter_detail_chunks(data_dir, detail_cycles, DETAIL_COLUMNS, store_dir=store_dir,
+                                    battery_id=battery_id, test_type='discharge',
+                                    max_bytes=int(stream_mb * 1024 ** 2), errors=errors,
+                                    timeseries_store=timeseries_store):
+        efficiency.update(chunk)
+        thermal.update(chunk)
+    row['detail_files_failed'] = len(errors)
+
+    efficiency_table = efficiency.result().dropna(subset=['efficiency'])
+    if len(efficiency_table) > 0:
+        figures['real_energy_efficiency'] = real_energy_efficiency_figure(efficiency_table, battery_id, max_points)
+        row['avg_real_efficiency'] = efficiency_table['efficiency'].mean()
+        row['final_real_efficiency'] = efficiency_table['efficiency'].iloc[-1]
+        row['efficiency_drift'] = compute_efficiency_drift(efficiency_table)
+
+    figures.update(thermal_report(battery_id, row, thermal, max_points))
+
+    return figures
+
+
+def load_fleet(metadata_path, metrics_dir, ingest_dir=None):
+    """Load and clean metadata and get the fleet metrics (reusing the persisted table)
+
+    With ingest_dir only rows appended since the last run are cleaned and
+    only the batteries they touch get their metrics recomputed.
+    """
+    fleet = None
+    updated = False
+    if ingest_dir:
+        metadata, delta, baseline = ingest_metadata(metadata_path, ingest_dir)
+        metadata = sort_metadata(metadata)
+        if baseline is not None:
+            fleet = load_tables(metrics_dir, ['discharge', 'impedance'], newer_than=baseline)
+            if fleet is not None and len(delta) > 0:
+                fleet = update_fleet_metrics(fleet, metadata, delta['battery_id'].unique())
+                updated = True
+    else:
+        metadata = sort_metadata(compact_metadata(clean_metadata(pd.read_csv(metadata_path))))
+        fleet = load_tables(metrics_dir, ['discharge', 'impedance'], newer_than=metadata_path)
+
+    if fleet is None:
+        fleet = compute_fleet_metrics(metadata)
+        updated = True
+    if updated:
+        try:
+            save_tables(fleet, metrics_dir)
+        except Exception as e:
+            print(f"⚠️ Could not persist fleet metrics: {e}")
+    return metadata, fleet
+
+
+def load_fleet_rul(fleet, metrics_dir):
+    """Fleet RUL table, refitted only when the discharge table it was fitted on changed"""
+    fingerprint = table_fingerprint(fleet['discharge'], ['EFC', 'Capacity_Fade']) + f"-v{RUL_FIT_VERSION}"
+    rul = load_fingerprinted_table(metrics_dir, 'rul', fingerprint)
+    if rul is None:
+        rul = compute_fleet_rul(fleet['discharge'])
+        try:
+            save_fingerprinted_table(rul, metrics_dir, 'rul', fingerprint)
+        except Exception as e:
+            print(f"⚠️ Could not persist RUL table: {e}")
+    return rul
+
+
+def run_batch_report(metadata_path, data_dir, output_dir, workers=None, fig_format='html',
+                     include_detail=False, store_dir=None, metrics_dir=METRICS_DIR,
+                     batteries=None, max_points=2000, timeseries_dir=None, ingest_dir=None, stream_mb=None,
+                     screen_threshold=SCREENING_THRESHOLD):
+    """Analyze every available battery in parallel and write summary.csv
+
+    Batteries the fleet screen flags (fleet_screen.csv) are left out unless
+    screen_threshold is None or batteries are named explicitly. Returns the
+    summary DataFrame (one row per battery).
+    """
+    metadata, fleet = load_fleet(metadata_path, metrics_dir, ingest_dir)
+    index = MetadataIndex(metadata)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Resistance at every discharge cycle, aligned for the whole fleet in one pass
+    aligned = align_impedance_to_discharge(fleet['discharge'], fleet['impedance'])
+    correlation = compute_resistance_correlation(aligned)
+
+    threshold = screen_threshold if screen_threshold is not None else SCREENING_THRESHOLD
+    screen = screen_fleet(compute_fleet_features(aligned, metadata), threshold)
+    screen.to_csv(output_dir / "fleet_screen.csv")
+    excluded = list(screen.index[screen['flagged']]) if screen_threshold is not None else []
+    battery_ids = batteries or select_available_batteries(metadata, excluded)
+
+    fleet_rul = load_fleet_rul(fleet, metrics_dir)
+    fleet_rul = fleet_rul[fleet_rul.index.isin(battery_ids)].sort_values('rul')
+    fleet_rul.to_csv(output_dir / "fleet_risk.csv")
+
+    rows = []
+    failures = []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for battery_id in battery_ids:
+            detail_cycles = None
+            if include_detail:
+                detail_meta = index.battery_type(battery_id, 'discharge')
+                detail_cycles = list(detail_meta[['test_id', 'uid', 'filename']].itertuples(index=False, name=None))
+            future = executor.submit(
+                build_battery_report, battery_id,
+                lookup_battery(aligned, battery_id),
+                lookup_battery(fleet['impedance'], battery_id),
+                output_dir, fig_format, detail_cycles, data_dir, store_dir, max_points, timeseries_dir, stream_mb,
+                fleet_rul.loc[battery_id] if battery_id in fleet_rul.index else None,
+                correlation.loc[battery_id] if battery_id in correlation.index else None)
+            futures[future] = battery_id
+
+        for future in as_completed(futures):
+            battery_id = futures[future]
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                failures.append((battery_id, e))
+
+    summary = pd.DataFrame(rows)
+    if len(summary) > 0:
+        summary = summary.sort_values('battery_id').reset_index(drop=True)
+    summary.to_csv(output_dir / "summary.csv", index=False)
+
+    for battery_id, error in failures:
+        print(f"⚠️ {battery_id}: {error}")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch report for every battery in the NASA dataset")
+    parser.add_argument("--metadata", default=METADATA_PATH, help="path to metadata.csv")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory with the per-cycle CSV files")
+    parser.add_argument("--columnar-dir", default=COLUMNAR_DIR, help="Parquet store from convert_nasa_to_parquet.py")
+    parser.add_argument("--timeseries-dir", default=TIMESERIES_DIR,
+                        help="memory-mapped arrays from convert_nasa_to_parquet.py --timeseries")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR, help="where the fleet metrics table is persisted")
+    parser.add_argument("--ingest-dir", default=INGEST_DIR,
+                        help="cleaned metadata store, so only rows appended to metadata.csv are re-cleaned")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="output directory for summary.csv and figures")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--format", default="html", choices=["html", "json", "png", "svg"],
+                        help="figure file format (png/svg need kaleido)")
+    parser.add_argument("--detail", action="store_true",
+                        help="also load per-cycle files for I-V, real efficiency and thermal figures")
+    parser.add_argument("--batteries", nargs="*", help="only these battery ids")
+    parser.add_argument("--stream-mb", type=float, default=None,
+                        help="with --detail, read per-cycle data in chunks of at most this many MB per worker")
+    parser.add_argument("--max-points", type=int, default=2000, help="max points per detail trace")
+    parser.add_argument("--screen-threshold", type=float, default=SCREENING_THRESHOLD,
+                        help="robust z-score above which a battery is flagged and skipped")
+    parser.add_argument("--no-screen", action="store_true", help="report flagged batteries too")
+    args = parser.parse_args()
+
+    print("🔋 Battery Batch Report")
+    if not Path(args.metadata).exists():
+        print("❌ metadata.csv not found - run download_nasa_data.py first")
+        return
+
+    start = time.perf_counter()
+    summary = run_batch_report(args.metadata, args.data_dir, args.output, workers=args.workers,
+                               fig_format=args.format, include_detail=args.detail,
+                               store_dir=args.columnar_dir, metrics_dir=args.metrics_dir,
+                               batteries=args.batteries, max_points=args.max_points,
+                               timeseries_dir=args.timeseries_dir, ingest_dir=args.ingest_dir,
+                               stream_mb=args.stream_mb,
+                               screen_threshold=None if args.no_screen else args.screen_threshold)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {len(summary)} batteries analyzed in {elapsed:.1f}s")
+    print(f"📁 Summary: {Path(args.output) / 'summary.csv'}")
+    print(f"⚠️ Fleet risk: {Path(args.output) / 'fleet_risk.csv'}")
+    print(f"🔍 Fleet screen: {Path(args.output) / 'fleet_screen.csv'}")
+
+if __name__ == "__main__":
+    main()
@@ -8,75 +8,190 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import json
+import os
+import threading
+import time
 import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 import streamlit as st
 from streamlit_option_menu import option_menu
-import plotly.graph_objects as go
 import plotly.express as px
-from plotly.subplots import make_subplots
+from battery_analytics import (DEGRADATION_SPAN, DEGRADATION_WINDOW, ENERGY_EFFICIENCY_COLUMNS, RUL_FIT_VERSION,
+                               SCREENING_THRESHOLD, THERMAL_COLUMNS, LiveBatteryMetrics, StreamingEnergyEfficiency,
+                               StreamingThermalStats,
+                               align_impedance_to_discharge, compute_degradation_profile, compute_energy_efficiency,
+                               compute_executive_summary, compute_fleet_curves, compute_fleet_features,
+                               compute_fleet_metrics, compute_fleet_ranking, compute_fleet_rul,
+                               compute_resistance_correlation, lookup_battery, screen_fleet, update_fleet_metrics)
+from battery_data_store import (DETAIL_KEY_COLUMNS, DetailDataCache, MetadataIndex, TelemetrySpool,
+                                TimeSeriesStore, clean_metadata, compact_metadata, concat_detail_frames,
+                                cycle_selection, detail_files_fingerprint, detail_source_path, ingest_metadata,
+                                iter_detail_chunks, load_cycles, load_fingerprinted_table, load_tables,
+                                memory_report, save_fingerprinted_table, save_tables, select_available_batteries,
+                                select_cycles, sort_metadata, table_fingerprint)
+from battery_figures import (IV_CURVE_CYCLES, capacity_degradation_figure, capacity_retention_figure,
+                             capacity_vs_resistance_figure, degradation_rate_figure, fleet_overlay_figure,
+                             impedance_parameters_figure, iv_curves_figure, real_energy_efficiency_figure,
+                             resistance_increase_figure, soc_dod_figure, thermal_figures, thermal_trend_figure,
+                             throughput_figure)
+from battery_figure_cache import FigureCache, source_version
+from battery_profiler import DashboardProfiler, profiled
 warnings.filterwarnings('ignore')
 
 # Professional styling
 plt.style.use('default')
 sns.set_palette("husl")
 
+# Fragments rerun on their own when their widgets change (st.fragment in
+# Streamlit >= 1.37, st.experimental_fragment before that)
+_st_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def run_as_fragment(func, *args, run_every=None):
+    """Call func as a Streamlit fragment when supported, else as a plain call
+
+    With run_every (seconds) the fragment also reruns itself on that interval.
+    """
+    if _st_fragment is None:
+        return func(*args)
+    return _st_fragment(func, run_every=run_every)(*args)
+
+# Plots of the first three tabs, grouped per tab and submitted in this order so
+# the first tab's figures are ready first; they are prepared in worker threads
+# while the main thread emits the finished ones
+TAB_PLOTS = {
+    'capacity': ['capacity_degradation', 'soc_dod_evolution', 'throughput_analysis'],
+    'impedance': ['impedance_parameters', 'resistance_increase', 'capacity_vs_resistance'],
+    'performance': ['energy_efficiency', 'degradation_rate'],
+}
+
+# Cached figures are only served to the code that built them: editing any of
+# these files (figure builders, analytics or the prepare_* methods) invalidates them
+FIGURE_CODE_VERSION = source_version(Path(__file__).with_name(name) for name in (
+    'battery_figures.py', 'battery_analytics.py', os.path.basename(__file__)))
+
+def resolve_prepared(future, prepare, battery_id):
+    """Result of a prepare_* call: waited for when submitted earlier, else computed inline"""
+    if future is None:
+        return prepare(battery_id)
+    return future.result()
+
 class InteractiveBatteryDashboard:
-    def __init__(self, metadata_path, data_dir):
+    def __init__(self, metadata_path, data_dir, columnar_dir=None, detail_cache_mb=512,
+                 io_workers=None, io_pool='thread', metrics_dir=None, max_points_per_trace=2000,
+                 timeseries_dir=None, ingest_dir=None, stream_max_mb=None, spool_dir=None,
+                 degradation_window=DEGRADATION_WINDOW, degradation_span=DEGRADATION_SPAN, figure_workers=None,
+                 figure_cache_dir=None, figure_cache_mb=64, figure_cache_disk_mb=512,
+                 screen_threshold=SCREENING_THRESHOLD):
         """Initialize the interactive battery dashboard"""
         self.metadata_path = metadata_path
         self.data_dir = data_dir
+        self.columnar_dir = columnar_dir
+        # Memory-mapped numeric arrays (convert_nasa_to_parquet.py --timeseries), tried before any file
+        self.timeseries_store = TimeSeriesStore(timeseries_dir) if timeseries_dir else None
+        self.detail_cache_mb = detail_cache_mb
+        # Worker pool for detailed file ingestion (1 = serial, 'thread' or 'process')
+        self.io_workers = io_workers if io_workers is not None else min(32, os.cpu_count() or 1)
+        self.io_pool = io_pool
+        # Directory where the fleet-wide metrics table is persisted (None = memory only)
+        self.metrics_dir = metrics_dir
+        # Detail traces are downsampled to this many points before plotting (None = off)
+        self.max_points_per_trace = max_points_per_trace
+        # Stream efficiency/thermal data in chunks of at most this many MB instead of loading whole batteries (None = off)
+        self.stream_max_mb = stream_max_mb
+        # Cleaned metadata store for incremental ingestion (None = re-clean the whole CSV)
+        self.ingest_dir = ingest_dir
+        self.ingest_delta = None
+        self.ingest_baseline = None
+        # Directory a test rig appends metadata-format rows to (None = no live telemetry)
+        self.spool_dir = spool_dir
+        self.live_refresh_seconds = None
+        # Smoothing of the per-cycle degradation rate (rolling window and EWMA span, in cycles)
+        self.degradation_window = degradation_window
+        self.degradation_span = degradation_span
+        self.degradation_profile = None
+        self.degradation_profile_lock = threading.Lock()
+        # Threads preparing tab figures concurrently (1 = prepare each plot just before rendering it)
+        self.figure_workers = figure_workers if figure_workers is not None else min(8, os.cpu_count() or 1)
+        # Prepared tab figures as JSON, in RAM and under figure_cache_dir (None = RAM only)
+        self.figure_cache_dir = figure_cache_dir
+        self.figure_cache_mb = figure_cache_mb
+        self.figure_cache_disk_mb = figure_cache_disk_mb
+        self.figure_fingerprint = None
+        # Batteries whose features score a modified z above this are excluded (None = keep every battery)
+        self.screen_threshold = screen_threshold
+        # Stage timings for the sidebar profiling panel; the toggle takes effect from the next rerun
+        self.profiler = DashboardProfiler(enabled=st.session_state.get('profile_dashboard', False))
         self.metadata = None
+        self.metadata_index = None
+        self.fleet_metrics = None
+        # Whether flagged batteries were left out of available_batteries at load
+        self.screen_applied = False
         self.battery_data = {}
+        # Row of compute_resistance_correlation for the analyzed battery (None without impedance data)
+        self.battery_correlation = None
         self.available_batteries = []
         
-    def load_and_clean_data(self):
-        """Load and clean battery data with robust error handling"""
+    @profiled
+    def load_and_clean_data(self, precompute_metrics=False):
+        """Load and clean battery data with robust error handling
+
+        With precompute_metrics the fleet-wide metrics table is built (or
+        reloaded from metrics_dir) so calculate_battery_metrics becomes a lookup.
+        The fleet screen needs that table, so without it every battery is listed.
+        """
         with st.spinner("📊 Loading and cleaning battery data..."):
             try:
-                # Load metadata
-                self.metadata = pd.read_csv(self.metadata_path)
-                st.success(f"Raw data loaded: {len(self.metadata)} records")
-                
-                # Handle different column formats
-                if len(self.metadata.columns) >= 10:
-                    self.metadata.columns = ['type', 'start_time', 'ambient_temperature', 
-                                           'battery_id', 'test_id', 'uid', 'filename', 
-                                           'Capacity', 'Re', 'Rct']
+                if self.ingest_dir:
+                    # Only rows appended since the last run are parsed and cleaned
+                    self.metadata, self.ingest_delta, self.ingest_baseline = ingest_metadata(
+                        self.metadata_path, self.ingest_dir)
+                    initial_count = len(self.metadata)
+                    self.profiler.add_file_bytes(Path(self.ingest_dir, "metadata").glob("part-*.parquet"))
+                    if self.ingest_delta is None:
+                        st.success(f"Cleaned store rebuilt: {len(self.metadata)} records")
+                    else:
+                        st.success(f"Cleaned store loaded: {len(self.metadata)} records "
+                                   f"({len(self.ingest_delta)} new)")
                 else:
-                    st.warning("Unexpected column format, using first 10 columns")
-                    self.metadata.columns = list(self.metadata.columns[:10]) + ['extra'] * max(0, 10 - len(self.metadata.columns))
+                    # Load metadata
+                    self.metadata = pd.read_csv(self.metadata_path)
+                    self.profiler.add_file_bytes([self.metadata_path])
+                    st.success(f"Raw data loaded: {len(self.metadata)} records")
+                    
+                    # Handle different column formats
+                    if len(self.metadata.columns) < 10:
+                        st.warning("Unexpected column format, using first 10 columns")
                 
                 # Clean data more carefully
                 with st.spinner("Cleaning data types..."):
-                    # Convert Capacity column
-                    self.metadata['Capacity'] = pd.to_numeric(self.metadata['Capacity'], errors='coerce')
+                    if not self.ingest_dir:
+                        # Coerce Capacity/Re/Rct/start_time and drop rows without type or battery_id,
+                        # then switch to the compact schema (the ingest store is already compact)
+                        initial_count = len(self.metadata)
+                        self.metadata = compact_metadata(clean_metadata(self.metadata))
                     
-                    # Convert Re column (handle cases where it's split across columns)
-                    if 'Re' in self.metadata.columns:
-                        self.metadata['Re'] = pd.to_numeric(self.metadata['Re'], errors='coerce')
-                    else:
-                        self.metadata['Re'] = np.nan
-                        
-                    # Convert Rct column
-                    if 'Rct' in self.metadata.columns:
-                        self.metadata['Rct'] = pd.to_numeric(self.metadata['Rct'], errors='coerce')
-                    else:
-                        self.metadata['Rct'] = np.nan
+                    # Group rows by battery/type once so later slices are offset lookups
+                    self.metadata = sort_metadata(self.metadata)
+                    self.metadata_index = MetadataIndex(self.metadata)
+                    self.profiler.add_rows(initial_count)
                     
-                    # Clean start_time - handle multiple formats
-                    self.metadata['start_time'] = pd.to_datetime(self.metadata['start_time'], errors='coerce')
+                    if precompute_metrics:
+                        self.build_fleet_metrics()
                     
-                    # Remove completely invalid rows but keep partial data
-                    initial_count = len(self.metadata)
-                    self.metadata = self.metadata.dropna(subset=['type', 'battery_id'])
-                    
-                    # Get list of available batteries (excluding problematic ones)
-                    all_batteries = sorted(self.metadata['battery_id'].unique())
-                    problematic_batteries = ['B0038', 'B0039', 'B0040', 'B0041', 'B0042', 'B0043', 'B0044', 'B0050', 'B0052']
-                    self.available_batteries = [b for b in all_batteries if b not in problematic_batteries]
+                    # Get list of available batteries (excluding the ones the fleet screen flags)
+                    self.screen_applied = self.screen_threshold is not None and self.fleet_metrics is not None
+                    excluded = self.get_screened_out_batteries() if self.screen_applied else []
+                    self.available_batteries = select_available_batteries(self.metadata, excluded)
                     
                     st.success(f"✅ Data cleaned: {len(self.metadata)} valid records (from {initial_count})")
-                    st.info(f"🔋 Available batteries: {len(self.available_batteries)} (excluded 9 problematic batteries: B0038, B0039, B0040, B0041, B0042, B0043, B0044, B0050, B0052)")
+                    if self.screen_applied:
+                        st.info(f"🔋 Available batteries: {len(self.available_batteries)} (excluded {len(excluded)} "
+                                f"flagged by the fleet screen: {', '.join(excluded) or 'none'})")
+                    else:
+                        reason = "off" if self.screen_threshold is None else "skipped, fleet metrics not precomputed"
+                        st.info(f"🔋 Available batteries: {len(self.available_batteries)} (fleet screen {reason})")
                     
                     # Show data quality summary
                     col1, col2, col3, col4 = st.columns(4)
@@ -94,102 +209,491 @@ class InteractiveBatteryDashboard:
                 return False
                 
             return True
+    
+    def build_fleet_metrics(self):
+        """Build the fleet-wide metrics table, reusing the persisted copy if fresh
+
+        After an incremental ingest the persisted table only has to be newer
+        than the store as it was before the delta; then just the batteries
+        that received new rows are recomputed.
+        """
+        fleet = None
+        updated = False
+        if self.metrics_dir:
+            if self.ingest_baseline is not None:
+                fleet = load_tables(self.metrics_dir, ['discharge', 'impedance'], newer_than=self.ingest_baseline)
+                if fleet is not None and len(self.ingest_delta) > 0:
+                    fleet = update_fleet_metrics(fleet, self.metadata, self.ingest_delta['battery_id'].unique())
+                    updated = True
+            else:
+                fleet = load_tables(self.metrics_dir, ['discharge', 'impedance'], newer_than=self.metadata_path)
+        
+        if fleet is None:
+            fleet = compute_fleet_metrics(self.metadata)
+            updated = True
+        
+        if updated:
+            if self.metrics_dir:
+                try:
+                    save_tables(fleet, self.metrics_dir)
+                except Exception as e:
+                    st.warning(f"⚠️ Could not persist fleet metrics: {e}")
+        
+        self.fleet_metrics = fleet
+    
+    def get_fleet_rul(self):
+        """RUL of every battery, refitted only when the fleet discharge table changes
+
+        The table is kept in session state and in metrics_dir under the
+        fingerprint of the fade curves it was fitted on.
+        """
+        if self.fleet_metrics is None:
+            self.build_fleet_metrics()
+        discharge = self.fleet_metrics['discharge']
+        fingerprint = table_fingerprint(discharge, ['EFC', 'Capacity_Fade']) + f"-v{RUL_FIT_VERSION}"
+        cached = st.session_state.get('fleet_rul')
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        
+        rul = load_fingerprinted_table(self.metrics_dir, 'rul', fingerprint) if self.metrics_dir else None
+        if rul is None:
+            rul = compute_fleet_rul(discharge)
+            if self.metrics_dir:
+                try:
+                    save_fingerprinted_table(rul, self.metrics_dir, 'rul', fingerprint)
+                except Exception as e:
+                    st.warning(f"⚠️ Could not persist RUL table: {e}")
+        st.session_state.fleet_rul = (fingerprint, rul)
+        return rul
+    
+    def get_battery_rul(self, battery_id):
+        """RUL row of one battery, refitted on its live table when the spool extended it
+
+        The fleet RUL table is fitted on the precomputed metrics only, so with
+        live telemetry on, the battery's own discharge table (precomputed plus
+        spooled rows) is fitted instead.
+        """
+        if self.live_refresh_seconds and self.get_live_telemetry()['metrics'].has_battery(battery_id):
+            rul = compute_fleet_rul(self.battery_data['discharge'])
+        else:
+            rul = self.get_fleet_rul()
+        return rul.loc[battery_id] if battery_id in rul.index else None
+    
+    def get_aligned_resistance(self):
+        """Fleet discharge table with the resistance aligned to every cycle, plus per-battery correlations
+
+        Aligned for all batteries at once and redone only when the fleet
+        tables change; kept in session state under their fingerprint so every
+        correlation plot and summary reuses it across reruns.
+        """
+        if self.fleet_metrics is None:
+            self.build_fleet_metrics()
+        discharge = self.fleet_metrics['discharge']
+        impedance = self.fleet_metrics['impedance']
+        fingerprint = (table_fingerprint(discharge, ['test_id', 'Capacity'])
+                       + table_fingerprint(impedance, ['test_id', 'Total_Resistance', 'Resistance_Increase']))
+        cached = st.session_state.get('aligned_resistance')
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1], cached[2]
+        
+        aligned = align_impedance_to_discharge(discharge, impedance)
+        correlation = compute_resistance_correlation(aligned)
+        st.session_state.aligned_resistance = (fingerprint, aligned, correlation)
+        return aligned, correlation
+    
+    def get_fleet_screen(self):
+        """Robust outlier screen of every battery (screen_fleet), redone only when the aligned fleet table changes"""
+        aligned, _ = self.get_aligned_resistance()
+        threshold = self.screen_threshold if self.screen_threshold is not None else SCREENING_THRESHOLD
+        cached = st.session_state.get('fleet_screen')
+        if cached is not None and cached[0] is aligned and cached[1] == threshold:
+            return cached[2]
+        
+        screen = screen_fleet(compute_fleet_features(aligned, self.metadata), threshold)
+        st.session_state.fleet_screen = (aligned, threshold, screen)
+        return screen
+    
+    def get_screened_out_batteries(self):
+        """Battery ids the fleet screen flags, replacing the old hardcoded exclusion list"""
+        if self.screen_threshold is None:
+            return []
+        screen = self.get_fleet_screen()
+        return list(screen.index[screen['flagged']])
+    
+    def get_battery_metadata(self, battery_id, test_type=None):
+        """Return metadata rows for a battery (and optionally one test type)"""
+        if self.metadata_index is None or self.metadata_index.metadata is not self.metadata:
+            # Metadata was replaced after loading; fall back to masking
+            battery_meta = self.metadata[self.metadata['battery_id'] == battery_id]
+            if test_type is None:
+                return battery_meta
+            return battery_meta[battery_meta['type'] == test_type]
+        
+        if test_type is None:
+            return self.metadata_index.battery(battery_id)
+        return self.metadata_index.battery_type(battery_id, test_type)
         
+    @profiled
     def calculate_battery_metrics(self, battery_id):
         """Calculate battery metrics for a specific battery"""
         with st.spinner(f"🧮 Calculating metrics for {battery_id}..."):
             # Clear previous battery data
             self.battery_data = {}
+            self.battery_correlation = None
             
             try:
                 # Get battery data
-                battery_meta = self.metadata[self.metadata['battery_id'] == battery_id]
+                battery_meta = self.get_battery_metadata(battery_id)
                 if len(battery_meta) == 0:
                     st.error(f"❌ No data for {battery_id}")
                     return False
                 
-                # Separate by type
-                discharge = battery_meta[battery_meta['type'] == 'discharge'].copy()
-                charge = battery_meta[battery_meta['type'] == 'charge'].copy()
-                impedance = battery_meta[battery_meta['type'] == 'impedance'].copy()
+                charge = self.get_battery_metadata(battery_id, 'charge').copy()
                 
-                # Process discharge cycles
-                if len(discharge) > 0:
-                    discharge = discharge.sort_values('test_id').reset_index(drop=True)
-                    discharge = discharge[discharge['Capacity'].notna()].copy()
-                    
+                if self.fleet_metrics is not None:
+                    # Metrics were precomputed for the whole fleet at load time; the aligned
+                    # table is the discharge table plus the resistance at each cycle
+                    aligned, correlation = self.get_aligned_resistance()
+                    discharge = lookup_battery(aligned, battery_id)
+                    impedance = lookup_battery(self.fleet_metrics['impedance'], battery_id)
                     if len(discharge) > 0:
-                        # Use first 30 rows to find peak capacity (avoid calibration issues)
-                        first_30_rows = discharge.head(30)
-                        peak_capacity = first_30_rows['Capacity'].max()
-                        
-                        discharge['EFC'] = range(len(discharge))
-                        discharge['SOC'] = (discharge['Capacity'] / peak_capacity) * 100
-                        discharge['DOD'] = 100 - discharge['SOC']
-                        discharge['Capacity_Fade'] = ((peak_capacity - discharge['Capacity']) / peak_capacity) * 100
-                        discharge['Throughput'] = discharge['Capacity'].cumsum()
                         self.battery_data['discharge'] = discharge
-                
-                # Process impedance
-                if len(impedance) > 0:
-                    impedance = impedance[impedance['Re'].notna() & impedance['Rct'].notna()].copy()
                     if len(impedance) > 0:
-                        impedance = impedance.sort_values('test_id').reset_index(drop=True)
-                        impedance['Total_Resistance'] = impedance['Re'] + impedance['Rct']
-                        impedance['Resistance_Increase'] = ((impedance['Total_Resistance'] - impedance['Total_Resistance'].iloc[0]) / impedance['Total_Resistance'].iloc[0]) * 100
                         self.battery_data['impedance'] = impedance
+                    if battery_id in correlation.index:
+                        self.battery_correlation = correlation.loc[battery_id]
+                else:
+                    self._compute_battery_metrics(battery_meta)
+                
+                if self.live_refresh_seconds:
+                    # Live tables already include the precomputed rows plus the spooled ones
+                    live_metrics = self.get_live_telemetry()['metrics']
+                    if live_metrics.has_battery(battery_id):
+                        for name, table in live_metrics.battery(battery_id).items():
+                            if len(table) > 0:
+                                self.battery_data[name] = table
+                
+                self.align_battery_resistance()
                 
                 # Store charge cycles
                 if len(charge) > 0:
                     self.battery_data['charge'] = charge
                 
+                self.profiler.add_rows(sum(len(table) for table in self.battery_data.values()))
                 return True
                 
             except Exception as e:
                 st.error(f"❌ Error: {e}")
                 return False
     
-    def load_individual_csv_files(self, battery_id, test_type='discharge'):
-        """Load individual CSV files for detailed analysis"""
+    def align_battery_resistance(self):
+        """Align the analyzed battery's resistance to its discharge cycles unless the fleet table already did
+
+        Needed when the tables were computed per battery or replaced by live ones.
+        """
+        if ('discharge' not in self.battery_data or 'impedance' not in self.battery_data
+                or 'Total_Resistance' in self.battery_data['discharge'].columns):
+            return
+        self.battery_data['discharge'] = align_impedance_to_discharge(self.battery_data['discharge'],
+                                                                      self.battery_data['impedance'])
+        correlation = compute_resistance_correlation(self.battery_data['discharge'])
+        self.battery_correlation = correlation.iloc[0] if len(correlation) > 0 else None
+    
+    def _compute_battery_metrics(self, battery_meta):
+        """Derive discharge and impedance metrics from one battery's metadata"""
+        # Separate by type
+        discharge = battery_meta[battery_meta['type'] == 'discharge'].copy()
+        impedance = battery_meta[battery_meta['type'] == 'impedance'].copy()
+        
+        # Process discharge cycles
+        if len(discharge) > 0:
+            discharge = discharge.sort_values('test_id').reset_index(drop=True)
+            discharge = discharge[discharge['Capacity'].notna()].copy()
+            
+            if len(discharge) > 0:
+                # Use first 30 rows to find peak capacity (avoid calibration issues)
+                first_30_rows = discharge.head(30)
+                peak_capacity = first_30_rows['Capacity'].max()
+                
+                discharge['EFC'] = range(len(discharge))
+                discharge['SOC'] = (discharge['Capacity'] / peak_capacity) * 100
+                discharge['DOD'] = 100 - discharge['SOC']
+                discharge['Capacity_Fade'] = ((peak_capacity - discharge['Capacity']) / peak_capacity) * 100
+                discharge['Throughput'] = discharge['Capacity'].cumsum()
+                self.battery_data['discharge'] = discharge
+        
+        # Process impedance
+        if len(impedance) > 0:
+            impedance = impedance[impedance['Re'].notna() & impedance['Rct'].notna()].copy()
+            if len(impedance) > 0:
+                impedance = impedance.sort_values('test_id').reset_index(drop=True)
+                impedance['Total_Resistance'] = impedance['Re'] + impedance['Rct']
+                impedance['Resistance_Increase'] = ((impedance['Total_Resistance'] - impedance['Total_Resistance'].iloc[0]) / impedance['Total_Resistance'].iloc[0]) * 100
+                self.battery_data['impedance'] = impedance
+    
+    def get_degradation_profile(self):
+        """Degradation profile of the current discharge table, computed once per table and smoothing"""
+        discharge = self.battery_data['discharge']
+        settings = (self.degradation_window, self.degradation_span)
+        # Two figure workers need it at once; the lock makes the second one wait instead of recomputing
+        with self.degradation_profile_lock:
+            if (self.degradation_profile is None or self.degradation_profile[0] is not discharge
+                    or self.degradation_profile[1] != settings):
+                profile = compute_degradation_profile(discharge, self.degradation_window, self.degradation_span)
+                self.degradation_profile = (discharge, settings, profile)
+            return self.degradation_profile[2]
+    
+    def get_figure_cache(self):
+        """Return the per-session figure cache (its disk tier is shared), creating it on first use"""
+        if 'figure_cache' not in st.session_state:
+            st.session_state.figure_cache = FigureCache(self.figure_cache_dir, self.figure_cache_mb * 1024 ** 2,
+                                                        self.figure_cache_disk_mb * 1024 ** 2,
+                                                        code_version=FIGURE_CODE_VERSION)
+        return st.session_state.figure_cache
+    
+    def get_figure_fingerprint(self):
+        """Content hash of the current battery tables plus the smoothing settings the plots depend on"""
+        tables = tuple(self.battery_data.get(name) for name in ('discharge', 'impedance'))
+        settings = (self.degradation_window, self.degradation_span)
+        if (self.figure_fingerprint is None or self.figure_fingerprint[1] != settings
+                or any(a is not b for a, b in zip(self.figure_fingerprint[0], tables))):
+            hashes = [table_fingerprint(table) if table is not None else '-' for table in tables]
+            fingerprint = '-'.join(hashes + [str(value) for value in settings])
+            self.figure_fingerprint = (tables, settings, fingerprint)
+        return self.figure_fingerprint[2]
+    
+    def prepare_cached(self, cache, name, battery_id, fingerprint):
+        """prepare_<name>(battery_id), served from the figure cache when it was built from the same data"""
+        prepared = cache.get(battery_id, name, fingerprint)
+        if prepared is None:
+            prepared = getattr(self, f'prepare_{name}')(battery_id)
+            if prepared is not None:
+                cache.put(battery_id, name, fingerprint, prepared)
+        return prepared
+    
+    def prepare_figures(self, battery_id, names):
+        """Start preparing the named plots in a worker pool; returns {name: Future}
+
+        Workers only build figures and conclusion numbers from the already
+        loaded battery tables, so no Streamlit call ever leaves the main
+        thread. The pool is not waited for here: the caller renders each
+        figure as soon as its future is done, so a tab takes as long as its
+        slowest plot rather than the sum of them. With figure_workers <= 1
+        the futures are resolved inline, one after another. Every plot goes
+        through the figure cache first.
+        """
+        # Both are resolved here so the workers never touch session state
+        cache = self.get_figure_cache()
+        fingerprint = self.get_figure_fingerprint()
+        if self.figure_workers <= 1:
+            futures = {}
+            for name in names:
+                futures[name] = Future()
+                try:
+                    futures[name].set_result(self.prepare_cached(cache, name, battery_id, fingerprint))
+                except Exception as exc:
+                    futures[name].set_exception(exc)
+            return futures
+        executor = ThreadPoolExecutor(max_workers=min(self.figure_workers, len(names)),
+                                      thread_name_prefix='figure')
+        futures = {name: executor.submit(self.prepare_cached, cache, name, battery_id, fingerprint)
+                   for name in names}
+        # Running tasks finish on their own; the threads exit once the queue drains
+        executor.shutdown(wait=False)
+        return futures
+    
+    def show_figure(self, fig, **kwargs):
+        """st.plotly_chart, with the figure's size and render time credited to the profiler"""
+        self.profiler.add_figure(fig)
+        with self.profiler.stage('st.plotly_chart'):
+            return st.plotly_chart(fig, **kwargs)
+    
+    def get_detail_cache(self):
+        """Return the per-session detailed-data cache, creating it on first use"""
+        if 'detail_cache' not in st.session_state:
+            st.session_state.detail_cache = DetailDataCache(self.detail_cache_mb * 1024 ** 2)
+        return st.session_state.detail_cache
+    
+    def get_live_telemetry(self):
+        """Spool reader and live metrics, kept in session state across reruns"""
+        if 'live_telemetry' not in st.session_state:
+            st.session_state.live_telemetry = {
+                'spool': TelemetrySpool(self.spool_dir),
+                'metrics': LiveBatteryMetrics(self.fleet_metrics),
+                'last_rows': 0,
+                'last_ms': 0.0,
+            }
+        return st.session_state.live_telemetry
+    
+    def poll_live_telemetry(self):
+        """Fold rows written to the spool since the last poll into the live metrics"""
+        live = self.get_live_telemetry()
+        started = time.perf_counter()
+        rows = live['spool'].poll()
+        touched = live['metrics'].append(rows)
+        live['last_rows'] = 0 if rows is None else len(rows)
+        live['last_ms'] = (time.perf_counter() - started) * 1000
+        return touched
+    
+    def render_live_panel(self, battery_id):
+        """Live SOC, fade, throughput and resistance for the battery, refreshed on an interval"""
+        self.poll_live_telemetry()
+        live = self.get_live_telemetry()
+        tables = live['metrics'].battery(battery_id)
+        discharge = tables['discharge']
+        impedance = tables['impedance']
+        for name, table in tables.items():
+            if len(table) > 0:
+                self.battery_data[name] = table
+        self.align_battery_resistance()
+        
+        st.subheader("📡 Live Telemetry")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("SOC", f"{discharge['SOC'].iloc[-1]:.1f}%" if len(discharge) > 0 else "N/A")
+        with col2:
+            st.metric("Capacity Fade", f"{discharge['Capacity_Fade'].iloc[-1]:.1f}%" if len(discharge) > 0 else "N/A")
+        with col3:
+            st.metric("Throughput", f"{discharge['Throughput'].iloc[-1]:.2f}Ah" if len(discharge) > 0 else "N/A")
+        with col4:
+            st.metric("Resistance Increase",
+                      f"{impedance['Resistance_Increase'].iloc[-1]:+.1f}%" if len(impedance) > 0 else "N/A")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(discharge) > 0:
+                self.show_figure(soc_dod_figure(discharge, battery_id), use_container_width=True,
+                                key="live_soc_dod")
+        with col2:
+            if len(impedance) > 0:
+                self.show_figure(resistance_increase_figure(impedance, battery_id), use_container_width=True,
+                                key="live_resistance_increase")
+        
+        spool = live['spool']
+        st.caption(f"{live['last_rows']} new rows processed in {live['last_ms']:.1f} ms | "
+                   f"{spool.rows_read} rows read from {spool.spool_dir} | "
+                   f"refreshing every {self.live_refresh_seconds:g}s")
+    
+    @profiled
+    def load_individual_csv_files(self, battery_id, test_type='discharge', columns=None,
+                                  uids=None, cycle_range=None, every=None, limit=None):
+        """Load individual CSV files for detailed analysis
+
+        Cycles converted by convert_nasa_to_parquet.py are read from the
+        columnar store; anything else falls back to the raw CSV. When columns
+        is given only those (plus test_id/uid/filename) are read. uids,
+        cycle_range, every and limit restrict the read to some cycles (see
+        select_cycles); only their files are opened. Results are memoized in
+        the per-session DetailDataCache and must not be modified.
+        """
         try:
             # Get filenames for this battery and test type
-            battery_meta = self.metadata[self.metadata['battery_id'] == battery_id]
-            test_meta = battery_meta[battery_meta['type'] == test_type]
+            test_meta = self.get_battery_metadata(battery_id, test_type)
+            selection = cycle_selection(uids, cycle_range, every, limit)
+            if selection is not None:
+                test_meta = select_cycles(test_meta, uids, cycle_range, every, limit)
             
             if len(test_meta) == 0:
                 return None
             
-            # Load individual CSV files
-            detailed_data = []
-            for _, row in test_meta.iterrows():
-                filename = row['filename']
-                filepath = f"{self.data_dir}/{filename}"
-                
-                try:
-                    # Load CSV file
-                    df = pd.read_csv(filepath)
-                    df['test_id'] = row['test_id']
-                    df['uid'] = row['uid']
-                    df['filename'] = filename
-                    detailed_data.append(df)
-                except Exception as e:
-                    st.warning(f"⚠️ Could not load {filename}: {e}")
-                    continue
-            
-            if detailed_data:
-                return pd.concat(detailed_data, ignore_index=True)
-            else:
-                return None
+            if columns is not None:
+                columns = [c for c in columns if c not in DETAIL_KEY_COLUMNS]
+            
+            # Serve from cache when the files are unchanged and the columns are covered
+            cache = self.get_detail_cache()
+            fingerprint = detail_files_fingerprint(self.data_dir, test_meta['filename'])
+            cached = cache.get(battery_id, test_type, fingerprint, columns, selection)
+            if cached is not None:
+                return cached
+            
+            # Widen the read to the columns already cached so plots asking for
+            # different columns grow one entry instead of replacing each other
+            if columns is not None:
+                cached_columns = cache.cached_columns(battery_id, test_type, fingerprint, selection)
+                columns = columns + sorted(c for c in cached_columns if c not in columns)
+            
+            detailed_data = self._read_detail_files(battery_id, test_type, test_meta, columns)
+            if detailed_data is not None:
+                cache.put(battery_id, test_type, fingerprint, detailed_data, columns, selection)
+            return detailed_data
                 
         except Exception as e:
             st.error(f"❌ Error loading individual files: {e}")
             return None
     
+    @profiled
+    def _read_detail_files(self, battery_id, test_type, test_meta, columns):
+        """Read and concatenate the cycle files listed in test_meta"""
+        if self.timeseries_store is not None:
+            # Packed arrays need no parsing; only the touched cycles get paged in
+            try:
+                detailed_data = self.timeseries_store.read(battery_id, test_type, test_meta['uid'], columns)
+                if detailed_data is not None:
+                    # Bytes paged in from the mapped arrays
+                    self.profiler.add_bytes(detailed_data.memory_usage(index=False).sum())
+                    return detailed_data
+            except Exception as e:
+                st.warning(f"⚠️ Time-series store unreadable for {battery_id}, reading files: {e}")
+        
+        cycles = list(test_meta[['test_id', 'uid', 'filename']].itertuples(index=False, name=None))
+        results = load_cycles(self.data_dir, cycles, columns, store_dir=self.columnar_dir,
+                              battery_id=battery_id, test_type=test_type,
+                              workers=self.io_workers, pool=self.io_pool)
+        if self.profiler.enabled:
+            self.profiler.add_file_bytes(
+                detail_source_path(self.data_dir, filename, self.columnar_dir, battery_id, test_type, uid)
+                for (_, uid, filename), (_, _, error) in zip(cycles, results) if error is None)
+        
+        # Warnings are emitted here, in file order, since workers cannot call st.*
+        detailed_data = []
+        for filename, df, error in results:
+            if error is not None:
+                st.warning(f"⚠️ Could not load {filename}: {error}")
+                continue
+            detailed_data.append(df)
+        
+        if detailed_data:
+            return concat_detail_frames(detailed_data)
+        else:
+            return None
+    
+    @profiled
+    def stream_detail_data(self, battery_id, test_type, columns, accumulators, every=None):
+        """Feed a battery's cycles chunk by chunk into streaming accumulators
+
+        Memory stays within stream_max_mb however long the logs are, and
+        nothing is cached. every=k only streams every k-th cycle. Returns
+        False when the battery has no such cycles.
+        """
+        test_meta = self.get_battery_metadata(battery_id, test_type)
+        if cycle_selection(every=every) is not None:
+            test_meta = select_cycles(test_meta, every=every)
+        if len(test_meta) == 0:
+            return False
+        
+        errors = []
+        cycles = test_meta[DETAIL_KEY_COLUMNS].itertuples(index=False, name=None)
+        for chunk in iter_detail_chunks(self.data_dir, cycles, columns, store_dir=self.columnar_dir,
+                                        battery_id=battery_id, test_type=test_type,
+                                        max_bytes=int(self.stream_max_mb * 1024 ** 2), errors=errors,
+                                        timeseries_store=self.timeseries_store):
+            # Decoded bytes; the chunk size on disk depends on the source format
+            self.profiler.add_bytes(chunk.memory_usage(index=False).sum())
+            self.profiler.add_rows(len(chunk))
+            for accumulator in accumulators:
+                accumulator.update(chunk)
+        
+        for filename, error in errors:
+            st.warning(f"⚠️ Could not load {filename}: {error}")
+        return True
+    
+    @profiled
     def plot_iv_curves(self, battery_id):
         """Plot I-V curves for different cycles"""
         with st.spinner(f"📊 Loading detailed discharge data for {battery_id}..."):
-            # Load detailed discharge data
-            detailed_data = self.load_individual_csv_files(battery_id, 'discharge')
+            # Only the cycles the figure draws are read, not the whole battery
+            detailed_data = self.load_individual_csv_files(
+                battery_id, 'discharge', columns=['Voltage_measured', 'Current_measured'], limit=IV_CURVE_CYCLES)
             
             if detailed_data is None or len(detailed_data) == 0:
                 st.warning("No detailed discharge data available for I-V analysis")
@@ -203,116 +707,53 @@ class InteractiveBatteryDashboard:
                 st.warning(f"Missing required columns: {missing_cols}")
                 return
             
-            # Get unique test cycles (limit to first 5 for clarity)
-            unique_tests = sorted(detailed_data['uid'].unique())[:5]
-            
-            fig = go.Figure()
-            
-            colors = ['blue', 'red', 'green', 'orange', 'purple']
-            
-            for i, test_id in enumerate(unique_tests):
-                test_data = detailed_data[detailed_data['uid'] == test_id].copy()
-                
-                # Clean data
-                test_data = test_data.dropna(subset=['Voltage_measured', 'Current_measured'])
-                test_data = test_data[test_data['Current_measured'] < 0]  # Only discharge current
-                
-                if len(test_data) > 10:  # Need enough points for meaningful curve
-                    fig.add_trace(go.Scatter(
-                        x=abs(test_data['Current_measured']),  # Use absolute value
-                        y=test_data['Voltage_measured'],
-                        mode='lines',
-                        name=f'Cycle {test_id}',
-                        line=dict(color=colors[i % len(colors)], width=2),
-                        hovertemplate='Current: %{x:.3f}A<br>Voltage: %{y:.3f}V<br>Cycle: ' + str(test_id)
-                    ))
-            
-            fig.update_layout(
-                title=f'I-V Curves (Voltage vs Current) - {battery_id}',
-                xaxis_title='Current (A)',
-                yaxis_title='Voltage (V)',
-                height=400,
-                showlegend=True
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            fig = iv_curves_figure(detailed_data, battery_id, self.max_points_per_trace)
+            self.show_figure(fig, use_container_width=True)
             
             # Analysis
             st.info("**ANALYSIS:** I-V curves show how voltage drops as current increases. Steeper curves indicate higher internal resistance and battery aging.")
     
-    def plot_real_energy_efficiency(self, battery_id):
-        """Plot real energy efficiency using detailed data"""
+    @profiled
+    def plot_real_energy_efficiency(self, battery_id, every=None):
+        """Plot real energy efficiency using detailed data (every k-th cycle with every=k)"""
         with st.spinner(f"⚡ Calculating real energy efficiency for {battery_id}..."):
-            # Load detailed discharge data
-            detailed_data = self.load_individual_csv_files(battery_id, 'discharge')
-            
-            if detailed_data is None or len(detailed_data) == 0:
-                st.warning("No detailed discharge data available for energy efficiency calculation")
-                return
-            
-            # Check required columns
-            required_cols = ['Voltage_measured', 'Current_measured', 'Voltage_load', 'Current_load', 'Time', 'uid']
-            missing_cols = [col for col in required_cols if col not in detailed_data.columns]
-            
-            if missing_cols:
-                st.warning(f"Missing required columns: {missing_cols}")
-                return
-            
-            # Calculate efficiency for each test
-            test_efficiencies = []
-            test_numbers = []
-            
-            for test_id in sorted(detailed_data['uid'].unique()):
-                test_data = detailed_data[detailed_data['uid'] == test_id].copy()
+            if self.stream_max_mb:
+                # Bounded memory: cycles are folded into running sums chunk by chunk
+                efficiency = StreamingEnergyEfficiency()
+                if not self.stream_detail_data(battery_id, 'discharge', ENERGY_EFFICIENCY_COLUMNS, [efficiency],
+                                               every):
+                    st.warning("No detailed discharge data available for energy efficiency calculation")
+                    return
+                efficiency_table = efficiency.result().dropna(subset=['efficiency'])
+            else:
+                # Load detailed discharge data
+                detailed_data = self.load_individual_csv_files(
+                    battery_id, 'discharge', columns=ENERGY_EFFICIENCY_COLUMNS, every=every)
                 
-                # Sort by time and calculate time differences
-                test_data = test_data.sort_values('Time').reset_index(drop=True)
-                test_data['dt'] = test_data['Time'].diff().fillna(0)
-                test_data = test_data[test_data['dt'] > 0].copy()
+                if detailed_data is None or len(detailed_data) == 0:
+                    st.warning("No detailed discharge data available for energy efficiency calculation")
+                    return
                 
-                if len(test_data) == 0:
-                    continue
+                # Check required columns
+                required_cols = ENERGY_EFFICIENCY_COLUMNS + ['uid']
+                missing_cols = [col for col in required_cols if col not in detailed_data.columns]
                 
-                # Calculate energies
-                energy_supplied = (test_data['Voltage_load'] * test_data['Current_load'] * test_data['dt']).sum()
-                energy_received = (test_data['Voltage_measured'] * abs(test_data['Current_measured']) * test_data['dt']).sum()
+                if missing_cols:
+                    st.warning(f"Missing required columns: {missing_cols}")
+                    return
                 
-                # Calculate efficiency
-                if energy_received > 0 and energy_supplied > 0:
-                    efficiency = (energy_supplied / energy_received) * 100
-                    if 0 <= efficiency <= 200:  # Reasonable range
-                        test_efficiencies.append(efficiency)
-                        test_numbers.append(test_id)
+                # Calculate efficiency for every test in one vectorized pass
+                efficiency_table = compute_energy_efficiency(detailed_data).dropna(subset=['efficiency'])
+            
+            test_efficiencies = efficiency_table['efficiency'].tolist()
             
             if not test_efficiencies:
                 st.warning("Could not calculate energy efficiency - no valid tests found")
                 return
             
             # Create plot
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=test_numbers,
-                y=test_efficiencies,
-                mode='lines+markers',
-                line=dict(color='purple', width=3),
-                marker=dict(size=8),
-                name='Real Energy Efficiency'
-            ))
-            
-            # Add 100% reference line
-            fig.add_hline(y=100, line_dash="dash", line_color="green", 
-                         annotation_text="100% Efficiency")
-            
-            fig.update_layout(
-                title=f'Real Energy Efficiency - {battery_id}',
-                xaxis_title='Test Cycle',
-                yaxis_title='Energy Efficiency (%)',
-                height=400,
-                showlegend=True
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            fig = real_energy_efficiency_figure(efficiency_table, battery_id, self.max_points_per_trace)
+            self.show_figure(fig, use_container_width=True)
             
             # Analysis with calculation explanation
             avg_efficiency = sum(test_efficiencies) / len(test_efficiencies)
@@ -344,77 +785,53 @@ class InteractiveBatteryDashboard:
                 - End-of-life: <80%
                 """)
     
-    def plot_thermal_analysis(self, battery_id):
-        """Plot thermal analysis with detailed temperature data"""
+    @profiled
+    def plot_thermal_analysis(self, battery_id, every=None):
+        """Plot thermal analysis with detailed temperature data (every k-th cycle with every=k)"""
         with st.spinner(f"🌡️ Analyzing thermal behavior for {battery_id}..."):
-            # Load detailed discharge data
-            detailed_data = self.load_individual_csv_files(battery_id, 'discharge')
-            
-            if detailed_data is None or len(detailed_data) == 0:
-                st.warning("No detailed discharge data available for thermal analysis")
-                return
-            
-            # Check for temperature data
-            if 'Temperature_measured' not in detailed_data.columns:
-                st.warning("No temperature data available in detailed files")
-                return
-            
-            # Clean temperature data
-            temp_data = detailed_data.dropna(subset=['Temperature_measured', 'Voltage_measured', 'Current_measured']).copy()
+            # Single-pass statistics engine, fed chunk by chunk or with the cached frame
+            thermal = StreamingThermalStats(self.max_points_per_trace)
+            if self.stream_max_mb:
+                # Bounded memory: the battery is never loaded as a whole
+                if not self.stream_detail_data(battery_id, 'discharge', THERMAL_COLUMNS, [thermal], every):
+                    st.warning("No detailed discharge data available for thermal analysis")
+                    return
+            else:
+                # Load detailed discharge data
+                detailed_data = self.load_individual_csv_files(battery_id, 'discharge', columns=THERMAL_COLUMNS,
+                                                               every=every)
+                
+                if detailed_data is None or len(detailed_data) == 0:
+                    st.warning("No detailed discharge data available for thermal analysis")
+                    return
+                
+                # Check for temperature data
+                if 'Temperature_measured' not in detailed_data.columns:
+                    st.warning("No temperature data available in detailed files")
+                    return
+                
+                # Rows without temperature/voltage/current are masked out, not copied
+                thermal.update(detailed_data)
             
-            if len(temp_data) == 0:
+            thermal_stats = thermal.result()
+            if thermal_stats['count'] == 0:
                 st.warning("No valid temperature data found")
                 return
             
+            avg_temp = thermal_stats['avg_temperature']
+            min_temp = thermal_stats['min_temperature']
+            max_temp = thermal_stats['max_temperature']
+            
             # Create two separate plots side by side
+            fig1, fig2 = thermal_figures(thermal_stats['sample'], battery_id, self.max_points_per_trace)
             col1, col2 = st.columns(2)
             
             with col1:
-                # Plot 1: Temperature vs Time
-                fig1 = go.Figure()
-                fig1.add_trace(
-                    go.Scatter(
-                        x=temp_data['Time'],
-                        y=temp_data['Temperature_measured'],
-                        mode='lines',
-                        name='Temperature',
-                        line=dict(color='red', width=2)
-                    )
-                )
-                fig1.update_layout(
-                    title=f'Temperature vs Time - {battery_id}',
-                    xaxis_title="Time (s)",
-                    yaxis_title="Temperature (°C)",
-                    height=400,
-                    showlegend=True
-                )
-                st.plotly_chart(fig1, use_container_width=True)
+                self.show_figure(fig1, use_container_width=True)
             
             with col2:
-                # Plot 2: Temperature vs Voltage
-                fig2 = go.Figure()
-                fig2.add_trace(
-                    go.Scatter(
-                        x=temp_data['Voltage_measured'],
-                        y=temp_data['Temperature_measured'],
-                        mode='markers',
-                        name='T vs V',
-                        marker=dict(color='blue', size=4, opacity=0.6)
-                    )
-                )
-                fig2.update_layout(
-                    title=f'Temperature vs Voltage - {battery_id}',
-                    xaxis_title="Voltage (V)",
-                    yaxis_title="Temperature (°C)",
-                    height=400,
-                    showlegend=True
-                )
-                st.plotly_chart(fig2, use_container_width=True)
+                self.show_figure(fig2, use_container_width=True)
             
-            # Calculate thermal statistics
-            avg_temp = temp_data['Temperature_measured'].mean()
-            min_temp = temp_data['Temperature_measured'].min()
-            max_temp = temp_data['Temperature_measured'].max()
             temp_range = max_temp - min_temp
             
             # Display statistics
@@ -428,6 +845,14 @@ class InteractiveBatteryDashboard:
             with col4:
                 st.metric("Max Temp", f"{max_temp:.1f}°C")
             
+            st.caption(f"Std dev: {thermal_stats['std_temperature']:.2f}°C | "
+                       f"P5 / median / P95: {thermal_stats['p05_temperature']:.1f} / "
+                       f"{thermal_stats['median_temperature']:.1f} / {thermal_stats['p95_temperature']:.1f}°C")
+            
+            # Per-cycle trend: does the battery run hotter as it ages?
+            fig = thermal_trend_figure(thermal_stats['cycles'], battery_id)
+            self.show_figure(fig, use_container_width=True)
+            
             # Simplified thermal analysis conclusions
             if temp_range < 5:
                 stability = "Excellent thermal stability"
@@ -440,318 +865,196 @@ class InteractiveBatteryDashboard:
             
             st.info(f"**THERMAL ANALYSIS:** {stability} (range: {temp_range:.1f}°C). Temperature monitoring helps identify thermal stress and aging patterns.")
         
-    def plot_capacity_degradation(self, battery_id):
-        """Plot capacity degradation with Plotly"""
+    @profiled
+    def prepare_capacity_degradation(self, battery_id):
+        """Capacity degradation figure and conclusion numbers (no Streamlit calls)"""
         if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+            return None
+        
+        discharge_data = self.battery_data['discharge']
+        first_30_rows = discharge_data.head(30)
+        peak_capacity = first_30_rows['Capacity'].max()
+        final_cap = discharge_data['Capacity'].iloc[-1]
+        return {
+            'fig': capacity_degradation_figure(discharge_data, battery_id),
+            'peak_capacity': peak_capacity,
+            'final_cap': final_cap,
+            'capacity_fade': ((peak_capacity - final_cap) / peak_capacity) * 100,
+            'cycles': len(discharge_data),
+        }
+    
+    @profiled
+    def plot_capacity_degradation(self, battery_id, future=None):
+        """Plot capacity degradation with Plotly"""
+        prepared = resolve_prepared(future, self.prepare_capacity_degradation, battery_id)
+        if prepared is None:
             st.warning("No discharge data available")
             return
-            
-        discharge_data = self.battery_data['discharge']
-        
-        fig = go.Figure()
-        
-        # Add measured capacity
-        fig.add_trace(go.Scatter(
-            x=discharge_data['EFC'],
-            y=discharge_data['Capacity'],
-            mode='lines+markers',
-            name='Measured Capacity',
-            line=dict(color='blue', width=3),
-            marker=dict(size=6)
-        ))
         
-        # Add trend line
-        try:
-            z = np.polyfit(discharge_data['EFC'], discharge_data['Capacity'], 2)
-            p = np.poly1d(z)
-            fig.add_trace(go.Scatter(
-                x=discharge_data['EFC'],
-                y=p(discharge_data['EFC']),
-                mode='lines',
-                name='Trend Line',
-                line=dict(color='red', width=2, dash='dash')
-            ))
-        except:
-            pass
-        
-        fig.update_layout(
-            title=f'Capacity Degradation - {battery_id}',
-            xaxis_title='Equivalent Full Cycles (EFC)',
-            yaxis_title='Capacity (Ah)',
-            height=400,
-            showlegend=True
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        first_30_rows = discharge_data.head(30)
-        peak_capacity = first_30_rows['Capacity'].max()
-        final_cap = discharge_data['Capacity'].iloc[-1]
-        capacity_fade = ((peak_capacity - final_cap) / peak_capacity) * 100
+        st.info(f"**CONCLUSION:** Battery shows capacity decline from peak {prepared['peak_capacity']:.3f}Ah to {prepared['final_cap']:.3f}Ah over {prepared['cycles']} cycles ({prepared['capacity_fade']:.1f}% degradation).")
+    
+    @profiled
+    def prepare_soc_dod_evolution(self, battery_id):
+        """SOC/DOD figure and conclusion numbers (no Streamlit calls)"""
+        if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+            return None
         
-        st.info(f"**CONCLUSION:** Battery shows capacity decline from peak {peak_capacity:.3f}Ah to {final_cap:.3f}Ah over {len(discharge_data)} cycles ({capacity_fade:.1f}% degradation).")
+        discharge_data = self.battery_data['discharge']
+        return {
+            'fig': soc_dod_figure(discharge_data, battery_id),
+            'initial_soc': discharge_data['SOC'].iloc[0],
+            'final_soc': discharge_data['SOC'].iloc[-1],
+            'final_dod': discharge_data['DOD'].iloc[-1],
+        }
     
-    def plot_soc_dod_evolution(self, battery_id):
+    @profiled
+    def plot_soc_dod_evolution(self, battery_id, future=None):
         """Plot SOC and DOD evolution"""
-        if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+        prepared = resolve_prepared(future, self.prepare_soc_dod_evolution, battery_id)
+        if prepared is None:
             st.warning("No discharge data available")
             return
-            
-        discharge_data = self.battery_data['discharge']
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=discharge_data['EFC'],
-            y=discharge_data['SOC'],
-            mode='lines+markers',
-            name='SOC (%)',
-            line=dict(color='green', width=3)
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=discharge_data['EFC'],
-            y=discharge_data['DOD'],
-            mode='lines+markers',
-            name='DOD (%)',
-            line=dict(color='orange', width=3)
-        ))
-        
-        fig.update_layout(
-            title=f'SOC & DOD Evolution - {battery_id}',
-            xaxis_title='Equivalent Full Cycles (EFC)',
-            yaxis_title='Percentage (%)',
-            height=400,
-            showlegend=True
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        initial_soc = discharge_data['SOC'].iloc[0]
-        final_soc = discharge_data['SOC'].iloc[-1]
-        final_dod = discharge_data['DOD'].iloc[-1]
-        st.info(f"**CONCLUSION:** SOC decreases from {initial_soc:.1f}% to {final_soc:.1f}% while DOD increases to {final_dod:.1f}%. This shows the battery is losing its ability to maintain charge over cycles.")
+        st.info(f"**CONCLUSION:** SOC decreases from {prepared['initial_soc']:.1f}% to {prepared['final_soc']:.1f}% while DOD increases to {prepared['final_dod']:.1f}%. This shows the battery is losing its ability to maintain charge over cycles.")
     
-    def plot_throughput_analysis(self, battery_id):
-        """Plot cumulative throughput"""
+    @profiled
+    def prepare_throughput_analysis(self, battery_id):
+        """Throughput figure and conclusion numbers (no Streamlit calls)"""
         if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+            return None
+        
+        discharge_data = self.battery_data['discharge']
+        total_throughput = discharge_data['Throughput'].iloc[-1]
+        return {
+            'fig': throughput_figure(discharge_data, battery_id),
+            'total_throughput': total_throughput,
+            'avg_throughput': total_throughput / len(discharge_data),
+            'cycles': len(discharge_data),
+        }
+    
+    @profiled
+    def plot_throughput_analysis(self, battery_id, future=None):
+        """Plot cumulative throughput"""
+        prepared = resolve_prepared(future, self.prepare_throughput_analysis, battery_id)
+        if prepared is None:
             st.warning("No discharge data available")
             return
-            
-        discharge_data = self.battery_data['discharge']
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=discharge_data['EFC'],
-            y=discharge_data['Throughput'],
-            mode='lines+markers',
-            line=dict(color='green', width=3),
-            marker=dict(size=6)
-        ))
-        
-        fig.update_layout(
-            title=f'Cumulative Throughput - {battery_id}',
-            xaxis_title='Equivalent Full Cycles (EFC)',
-            yaxis_title='Cumulative Throughput (Ah)',
-            height=400
-        )
         
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        total_throughput = discharge_data['Throughput'].iloc[-1]
-        avg_throughput = total_throughput / len(discharge_data)
-        st.info(f"**CONCLUSION:** Total energy delivered reaches {total_throughput:.2f}Ah over {len(discharge_data)} cycles. Average throughput per cycle: {avg_throughput:.3f}Ah.")
+        st.info(f"**CONCLUSION:** Total energy delivered reaches {prepared['total_throughput']:.2f}Ah over {prepared['cycles']} cycles. Average throughput per cycle: {prepared['avg_throughput']:.3f}Ah.")
     
-    def plot_impedance_parameters(self, battery_id):
-        """Plot impedance parameters"""
+    @profiled
+    def prepare_impedance_parameters(self, battery_id):
+        """Impedance parameter figure and conclusion numbers (no Streamlit calls)"""
         if 'impedance' not in self.battery_data or len(self.battery_data['impedance']) == 0:
+            return None
+        
+        impedance_data = self.battery_data['impedance']
+        initial_res = impedance_data['Total_Resistance'].iloc[0]
+        final_res = impedance_data['Total_Resistance'].iloc[-1]
+        return {
+            'fig': impedance_parameters_figure(impedance_data, battery_id),
+            'initial_res': initial_res,
+            'final_res': final_res,
+            'res_increase': ((final_res - initial_res) / initial_res) * 100,
+        }
+    
+    @profiled
+    def plot_impedance_parameters(self, battery_id, future=None):
+        """Plot impedance parameters"""
+        prepared = resolve_prepared(future, self.prepare_impedance_parameters, battery_id)
+        if prepared is None:
             st.warning("No impedance data available")
             return
-            
-        impedance_data = self.battery_data['impedance']
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=impedance_data.index,
-            y=impedance_data['Re'],
-            mode='lines+markers',
-            name='Re (Electrolyte)',
-            line=dict(color='blue', width=3)
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=impedance_data.index,
-            y=impedance_data['Rct'],
-            mode='lines+markers',
-            name='Rct (Charge Transfer)',
-            line=dict(color='red', width=3)
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=impedance_data.index,
-            y=impedance_data['Total_Resistance'],
-            mode='lines+markers',
-            name='Total',
-            line=dict(color='green', width=3)
-        ))
-        
-        fig.update_layout(
-            title=f'Impedance Parameters - {battery_id}',
-            xaxis_title='Impedance Measurements',
-            yaxis_title='Resistance (Ω)',
-            height=400,
-            showlegend=True
-        )
         
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        initial_res = impedance_data['Total_Resistance'].iloc[0]
-        final_res = impedance_data['Total_Resistance'].iloc[-1]
-        res_increase = ((final_res - initial_res) / initial_res) * 100
-        st.info(f"**CONCLUSION:** Total resistance increases from {initial_res:.3f}Ω to {final_res:.3f}Ω ({res_increase:+.1f}%). Both Re and Rct show trends indicating electrochemical aging.")
+        st.info(f"**CONCLUSION:** Total resistance increases from {prepared['initial_res']:.3f}Ω to {prepared['final_res']:.3f}Ω ({prepared['res_increase']:+.1f}%). Both Re and Rct show trends indicating electrochemical aging.")
     
-    def plot_resistance_increase(self, battery_id):
-        """Plot resistance increase over time"""
+    @profiled
+    def prepare_resistance_increase(self, battery_id):
+        """Resistance increase figure and conclusion numbers (no Streamlit calls)"""
         if 'impedance' not in self.battery_data or len(self.battery_data['impedance']) == 0:
+            return None
+        
+        impedance_data = self.battery_data['impedance']
+        return {
+            'fig': resistance_increase_figure(impedance_data, battery_id),
+            'max_increase': impedance_data['Resistance_Increase'].max(),
+        }
+    
+    @profiled
+    def plot_resistance_increase(self, battery_id, future=None):
+        """Plot resistance increase over time"""
+        prepared = resolve_prepared(future, self.prepare_resistance_increase, battery_id)
+        if prepared is None:
             st.warning("No impedance data available")
             return
-            
-        impedance_data = self.battery_data['impedance']
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=impedance_data.index,
-            y=impedance_data['Resistance_Increase'],
-            mode='lines+markers',
-            line=dict(color='red', width=3),
-            marker=dict(size=6)
-        ))
-        
-        fig.update_layout(
-            title=f'Cumulative Resistance Increase - {battery_id}',
-            xaxis_title='Impedance Measurements',
-            yaxis_title='Resistance Increase (%)',
-            height=400
-        )
         
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        max_increase = impedance_data['Resistance_Increase'].max()
-        st.info(f"**CONCLUSION:** Resistance increase reaches {max_increase:.1f}% over time. This trend suggests the battery is experiencing electrochemical aging.")
+        st.info(f"**CONCLUSION:** Resistance increase reaches {prepared['max_increase']:.1f}% over time. This trend suggests the battery is experiencing electrochemical aging.")
     
-    def plot_capacity_vs_resistance(self, battery_id):
-        """Plot capacity vs resistance correlation"""
+    @profiled
+    def prepare_capacity_vs_resistance(self, battery_id):
+        """Capacity vs resistance figure and its R² (no Streamlit calls)"""
         if ('discharge' not in self.battery_data or 'impedance' not in self.battery_data or 
             len(self.battery_data['discharge']) == 0 or len(self.battery_data['impedance']) == 0):
+            return None
+        
+        fig, r_squared = capacity_vs_resistance_figure(self.battery_data['discharge'], battery_id,
+                                                       self.battery_correlation)
+        return {'fig': fig, 'r_squared': r_squared}
+    
+    @profiled
+    def plot_capacity_vs_resistance(self, battery_id, future=None):
+        """Plot capacity vs resistance correlation"""
+        prepared = resolve_prepared(future, self.prepare_capacity_vs_resistance, battery_id)
+        if prepared is None:
             st.warning("Insufficient data for correlation")
             return
-            
-        discharge_data = self.battery_data['discharge']
-        impedance_data = self.battery_data['impedance']
-        
-        # Interpolate impedance values for discharge cycles
-        impedance_interp = np.interp(discharge_data['EFC'], 
-                                   range(len(impedance_data)), 
-                                   impedance_data['Total_Resistance'])
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=impedance_interp,
-            y=discharge_data['Capacity'],
-            mode='markers',
-            marker=dict(size=8, color='purple', opacity=0.7),
-            name='Capacity vs Resistance'
-        ))
         
-        # Add trend line
-        try:
-            z = np.polyfit(impedance_interp, discharge_data['Capacity'], 1)
-            p = np.poly1d(z)
-            fig.add_trace(go.Scatter(
-                x=impedance_interp,
-                y=p(impedance_interp),
-                mode='lines',
-                line=dict(color='red', width=2, dash='dash'),
-                name='Trend Line'
-            ))
-            
-            # Correlation coefficient
-            corr = np.corrcoef(impedance_interp, discharge_data['Capacity'])[0,1]
-            fig.add_annotation(
-                x=0.05, y=0.95,
-                xref='paper', yref='paper',
-                text=f'R² = {corr**2:.3f}',
-                showarrow=False,
-                bgcolor='white',
-                bordercolor='black',
-                borderwidth=1
-            )
-            
-            st.info(f"**CONCLUSION:** Correlation (R² = {corr**2:.3f}) between resistance and capacity. Higher resistance = lower capacity.")
-        except:
+        r_squared = prepared['r_squared']
+        if r_squared is not None:
+            st.info(f"**CONCLUSION:** Correlation (R² = {r_squared:.3f}) between resistance and capacity. Higher resistance = lower capacity.")
+        else:
             st.info("**CONCLUSION:** Correlation analysis shows relationship between resistance increase and capacity degradation.")
         
-        fig.update_layout(
-            title=f'Capacity vs Resistance - {battery_id}',
-            xaxis_title='Total Resistance (Ω)',
-            yaxis_title='Capacity (Ah)',
-            height=400,
-            showlegend=True
-        )
+        self.show_figure(prepared['fig'], use_container_width=True)
+    
+    @profiled
+    def prepare_energy_efficiency(self, battery_id):
+        """Capacity retention figure and final retention (no Streamlit calls)"""
+        if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+            return None
         
-        st.plotly_chart(fig, use_container_width=True)
+        fig, energy_efficiency, peak_capacity = capacity_retention_figure(self.battery_data['discharge'], battery_id,
+                                                                          self.get_degradation_profile())
+        return {'fig': fig, 'final_efficiency': energy_efficiency.iloc[-1], 'peak_capacity': peak_capacity}
     
-    def plot_energy_efficiency(self, battery_id):
+    @profiled
+    def plot_energy_efficiency(self, battery_id, future=None):
         """Plot energy efficiency (capacity retention)"""
-        if 'discharge' not in self.battery_data or len(self.battery_data['discharge']) == 0:
+        prepared = resolve_prepared(future, self.prepare_energy_efficiency, battery_id)
+        if prepared is None:
             st.warning("No discharge data available")
             return
-            
-        discharge_data = self.battery_data['discharge']
-        
-        # Use first 30 rows to find peak capacity (avoid calibration issues)
-        first_30_rows = discharge_data.head(30)
-        peak_capacity = first_30_rows['Capacity'].max()
         
-        # Calculate capacity retention using peak capacity as reference
-        energy_efficiency = (discharge_data['Capacity'] / peak_capacity) * 100
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=discharge_data['EFC'],
-            y=energy_efficiency,
-            mode='lines+markers',
-            line=dict(color='orange', width=3),
-            marker=dict(size=6),
-            name='Energy Efficiency'
-        ))
-        
-        # Add EOL threshold
-        fig.add_hline(y=70, line_dash="dash", line_color="red", 
-                     annotation_text="EOL Threshold (70%)")
-        
-        fig.update_layout(
-            title=f'Capacity Retention - {battery_id} (Peak: {peak_capacity:.2f} Ah)',
-            xaxis_title='Equivalent Full Cycles (EFC)',
-            yaxis_title='Capacity Retention (%)',
-            height=400,
-            showlegend=True
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        self.show_figure(prepared['fig'], use_container_width=True)
         
         # Add conclusion
-        final_efficiency = energy_efficiency.iloc[-1]
+        final_efficiency = prepared['final_efficiency']
+        peak_capacity = prepared['peak_capacity']
         if final_efficiency < 70:
             status = "END-OF-LIFE - Replace immediately"
             st.error(f"**CONCLUSION:** Capacity retention drops to {final_efficiency:.1f}% (from peak {peak_capacity:.2f} Ah). Status: {status}")
@@ -762,55 +1065,37 @@ class InteractiveBatteryDashboard:
             status = "Good performance - Continue monitoring"
             st.success(f"**CONCLUSION:** Capacity retention remains at {final_efficiency:.1f}% (from peak {peak_capacity:.2f} Ah). Status: {status}")
     
-    def plot_degradation_rate(self, battery_id):
-        """Plot degradation rate"""
+    @profiled
+    def prepare_degradation_rate(self, battery_id):
+        """Degradation rate figure and smoothed rates (no Streamlit calls)"""
         if ('discharge' not in self.battery_data or len(self.battery_data['discharge']) < 2):
+            return None
+        
+        profile = self.get_degradation_profile()
+        fig, degradation_rates = degradation_rate_figure(self.battery_data['discharge'], battery_id, profile)
+        if fig is None:
+            return None
+        # Only plain numbers go with the figure, so the payload can be cached as JSON
+        return {'fig': fig, 'avg_rate': profile['avg_rate'], 'recent_rate': profile['recent_rate'],
+                'knee_efc': profile['knee_efc'] if profile['knee_index'] is not None else None}
+    
+    @profiled
+    def plot_degradation_rate(self, battery_id, future=None):
+        """Plot degradation rate"""
+        prepared = resolve_prepared(future, self.prepare_degradation_rate, battery_id)
+        if prepared is None:
             st.warning("Insufficient data for degradation rate")
             return
-            
-        discharge_data = self.battery_data['discharge']
         
-        # Calculate degradation rate correctly
-        capacity_values = discharge_data['Capacity'].values
-        efc_values = discharge_data['EFC'].values
+        self.show_figure(prepared['fig'], use_container_width=True)
         
-        # Calculate percentage change between consecutive cycles
-        degradation_rates = []
-        efc_for_rates = []
-        
-        for i in range(1, len(capacity_values)):
-            rate = ((capacity_values[i-1] - capacity_values[i]) / capacity_values[i-1]) * 100
-            degradation_rates.append(rate)
-            efc_for_rates.append(efc_values[i])
-        
-        if len(degradation_rates) > 0:
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=efc_for_rates,
-                y=degradation_rates,
-                mode='lines+markers',
-                line=dict(color='red', width=3),
-                marker=dict(size=6)
-            ))
-            
-            fig.add_hline(y=0, line_dash="solid", line_color="black", opacity=0.5)
-            
-            fig.update_layout(
-                title=f'Per-Cycle Degradation Rate - {battery_id}',
-                xaxis_title='Equivalent Full Cycles (EFC)',
-                yaxis_title='Degradation Rate (%/cycle)',
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Add conclusion
-            avg_rate = np.mean(degradation_rates)
-            st.info(f"**CONCLUSION:** Average degradation rate: {avg_rate:.2f}% per cycle. Rate varies between cycles, indicating non-uniform aging.")
-        else:
-            st.warning("Insufficient data for degradation rate")
+        # Add conclusion
+        avg_rate = prepared['avg_rate']
+        recent_rate = prepared['recent_rate']
+        knee_text = (f" Knee point at EFC {prepared['knee_efc']}." if prepared['knee_efc'] is not None else "")
+        st.info(f"**CONCLUSION:** Average degradation rate: {avg_rate:.2f}% per cycle, currently {recent_rate:.2f}% per cycle (EWMA).{knee_text} Rate varies between cycles, indicating non-uniform aging.")
     
+    @profiled
     def generate_executive_summary(self, battery_id):
         """Generate executive summary for a specific battery"""
         st.subheader(f"🔋 EXECUTIVE SUMMARY - {battery_id}")
@@ -819,60 +1104,61 @@ class InteractiveBatteryDashboard:
             st.error(f"No discharge data available for {battery_id}")
             return
             
-        discharge_data = self.battery_data['discharge']
-        
-        # Key metrics
-        initial_capacity = discharge_data['Capacity'].iloc[0]
-        final_capacity = discharge_data['Capacity'].iloc[-1]
-        total_cycles = len(discharge_data)
-        capacity_fade = ((initial_capacity - final_capacity) / initial_capacity) * 100
+        rul = self.get_battery_rul(battery_id)
+        summary = compute_executive_summary(self.battery_data['discharge'], self.battery_data.get('impedance'),
+                                            profile=self.get_degradation_profile(), rul=rul,
+                                            correlation=self.battery_correlation)
+        capacity_fade = summary['capacity_fade']
         
         # Display metrics in columns
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Initial Capacity", f"{initial_capacity:.3f} Ah")
+            st.metric("Initial Capacity", f"{summary['initial_capacity']:.3f} Ah")
         with col2:
-            st.metric("Final Capacity", f"{final_capacity:.3f} Ah")
+            st.metric("Final Capacity", f"{summary['final_capacity']:.3f} Ah")
         with col3:
-            st.metric("Total Cycles", total_cycles)
+            st.metric("Total Cycles", summary['total_cycles'])
         with col4:
-            st.metric("Capacity Degradation", f"{capacity_fade:.2f}%")
+            st.metric("Capacity Degradation", f"{capacity_fade:.2f}%",
+                      help="Fade from the peak capacity of the first 30 cycles, as used for the RUL")
         
         # Aging analysis
         if 'impedance' in self.battery_data and len(self.battery_data['impedance']) > 0:
-            impedance_data = self.battery_data['impedance']
-            initial_resistance = impedance_data['Total_Resistance'].iloc[0]
-            final_resistance = impedance_data['Total_Resistance'].iloc[-1]
-            resistance_increase = ((final_resistance - initial_resistance) / initial_resistance) * 100
-            
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Initial Resistance", f"{initial_resistance:.3f} Ω")
+                st.metric("Initial Resistance", f"{summary['initial_resistance']:.3f} Ω")
             with col2:
-                st.metric("Final Resistance", f"{final_resistance:.3f} Ω")
+                st.metric("Final Resistance", f"{summary['final_resistance']:.3f} Ω")
             with col3:
-                st.metric("Resistance Increase", f"{resistance_increase:.2f}%")
+                st.metric("Resistance Increase", f"{summary['resistance_increase']:.2f}%")
+            with col4:
+                r_squared = summary['capacity_resistance_r2']
+                st.metric("Capacity–Resistance R²", f"{r_squared:.3f}" if np.isfinite(r_squared) else "n/a",
+                          help="Capacity against the resistance interpolated at each discharge cycle's test_id")
         
         # Throughput analysis
-        total_throughput = discharge_data['Throughput'].iloc[-1]
-        avg_throughput_per_cycle = total_throughput / total_cycles
-        
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total Throughput", f"{total_throughput:.2f} Ah")
+            st.metric("Total Throughput", f"{summary['total_throughput']:.2f} Ah")
         with col2:
-            st.metric("Avg Throughput/Cycle", f"{avg_throughput_per_cycle:.3f} Ah")
+            st.metric("Avg Throughput/Cycle", f"{summary['avg_throughput_per_cycle']:.3f} Ah")
         
         # RUL prediction
-        if capacity_fade > 0:
-            cycles_to_eol = (30 - capacity_fade) / (capacity_fade / total_cycles)
-            remaining_life = (cycles_to_eol/total_cycles)*100
-            
+        if np.isfinite(summary['cycles_to_eol']):
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Cycles to EOL (30%)", f"{cycles_to_eol:.1f}")
+                st.metric("Cycles to EOL (30%)", f"{summary['cycles_to_eol']:.1f}",
+                          help=f"Degradation model: {summary['rul_model']}")
             with col2:
-                st.metric("Remaining Life", f"{remaining_life:.1f}%")
+                st.metric("Remaining Life", f"{summary['remaining_life']:.1f}%")
+        
+        # Degradation trend
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Recent Degradation Rate (EWMA)", f"{summary['recent_degradation_rate']:.3f}%/cycle"
+                      if not np.isnan(summary['recent_degradation_rate']) else "N/A")
+        with col2:
+            st.metric("Knee Point", f"EFC {summary['knee_efc']}" if not np.isnan(summary['knee_efc']) else "None detected")
         
         # Recommendations
         st.subheader("💡 TECHNICAL RECOMMENDATIONS")
@@ -885,6 +1171,126 @@ class InteractiveBatteryDashboard:
         else:
             st.success("✅ Battery maintains good performance - Continue normal operation")
     
+    def render_advanced_analysis(self, battery_id):
+        """Render the Advanced Analysis tab, loading detailed data only on request"""
+        st.subheader("Advanced Analysis")
+        st.info("🔬 **Advanced Features** - These analyses use detailed CSV data and may take longer to load")
+        
+        # One toggle per battery so switching batteries never triggers detail I/O by itself
+        load_detail = st.toggle(
+            "Load detailed analysis",
+            key=f"load_detail_{battery_id}",
+            help="Reads the per-cycle files for I-V curves, real energy efficiency and thermal analysis"
+        )
+        if not load_detail:
+            st.caption("Detailed per-cycle data is not loaded until you switch this on.")
+            return
+        
+        # Overview mode: efficiency and thermal analyses read only every k-th cycle file
+        every = st.number_input("Sample every k-th cycle", min_value=1, max_value=100, value=1,
+                                key="detail_every",
+                                help="1 reads every cycle; k > 1 reads 1/k of the files for a quick overview")
+        n_cycles = len(self.get_battery_metadata(battery_id, 'discharge'))
+        if every > 1:
+            st.caption(f"Overview mode: {len(range(0, n_cycles, every))} of {n_cycles} discharge cycles read")
+        
+        # First row: I-V Curves and Real Energy Efficiency
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("📊 I-V Curves Analysis")
+            self.plot_iv_curves(battery_id)
+        
+        with col2:
+            st.subheader("⚡ Real Energy Efficiency")
+            self.plot_real_energy_efficiency(battery_id, every)
+        
+        # Second row: Thermal Analysis (full width)
+        st.subheader("🌡️ Thermal Analysis")
+        self.plot_thermal_analysis(battery_id, every)
+    
+    @profiled
+    def render_fleet_comparison(self):
+        """Render the fleet comparison view: overlaid aging curves and a ranking table"""
+        st.header("🚗 Fleet Comparison")
+        
+        if self.fleet_metrics is None:
+            with st.spinner("Computing fleet metrics..."):
+                self.build_fleet_metrics()
+        
+        ranking = compute_fleet_ranking(self.fleet_metrics, self.available_batteries)
+        ranking = ranking.sort_values('capacity_fade', ascending=False)
+        if len(ranking) == 0:
+            st.warning("No batteries available for comparison")
+            return
+        
+        # Default to the most degraded batteries so the overlay stays readable
+        selected = st.multiselect(
+            "Batteries to compare:",
+            list(ranking.index),
+            default=list(ranking.index[:10])
+        )
+        if not selected:
+            st.info("👆 Select at least one battery to compare")
+            return
+        
+        curves = compute_fleet_curves(self.fleet_metrics, selected)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            fig = fleet_overlay_figure(curves['capacity_fade'], 'EFC', 'Capacity_Fade', 'Capacity Fade',
+                                       'Equivalent Full Cycles (EFC)', 'Capacity Fade (%)')
+            self.show_figure(fig, use_container_width=True)
+        
+        with col2:
+            fig = fleet_overlay_figure(curves['resistance_increase'], 'Measurement', 'Resistance_Increase',
+                                       'Resistance Increase', 'Impedance Measurements', 'Resistance Increase (%)')
+            self.show_figure(fig, use_container_width=True)
+        
+        fig = fleet_overlay_figure(curves['degradation_rate'], 'EFC', 'Degradation_Rate', 'Degradation Rate per Cycle',
+                                   'Equivalent Full Cycles (EFC)', 'Degradation Rate (%)')
+        self.show_figure(fig, use_container_width=True)
+        
+        st.subheader("📋 Fleet Ranking")
+        st.dataframe(ranking.loc[selected].round(3), use_container_width=True)
+        
+        st.subheader("⚠️ Fleet Risk (Remaining Useful Life)")
+        start = time.perf_counter()
+        fleet_rul = self.get_fleet_rul()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        risk = fleet_rul[fleet_rul.index.isin(self.available_batteries)].sort_values('rul')
+        st.dataframe(risk.round(1), use_container_width=True)
+        st.caption(f"RUL for {len(risk)} batteries in {elapsed_ms:.1f} ms - cycles until 30% capacity fade from the "
+                   f"best of linear, exponential and piecewise fits (click a column to sort)")
+        if self.live_refresh_seconds:
+            st.warning("⚠️ Fitted on the metrics precomputed at load: rows spooled since are not included. "
+                       "A battery's Executive Summary refits its RUL with them.")
+        
+        st.subheader("🔍 Fleet Screen")
+        start = time.perf_counter()
+        screen = self.get_fleet_screen()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        flagged = screen[screen['flagged']].sort_values('score', ascending=False)
+        if len(flagged) > 0:
+            st.dataframe(flagged[['cycles', 'fade_rate', 'fade_scatter', 'resistance_slope',
+                                  'score', 'reason']].round(3), use_container_width=True)
+        else:
+            st.success("✅ No battery stands out from the fleet")
+        insufficient = list(screen.index[screen['insufficient_data']])
+        if insufficient:
+            st.info(f"ℹ️ Insufficient data, not screened (fewer than 5 discharge cycles): {', '.join(insufficient)}")
+        threshold = self.screen_threshold if self.screen_threshold is not None else SCREENING_THRESHOLD
+        if self.screen_applied:
+            excluded = "excluded from analysis"
+        elif self.screen_threshold is None:
+            excluded = "kept (screening off)"
+        else:
+            excluded = "kept (fleet metrics were not precomputed at load)"
+        st.caption(f"{len(screen) - len(insufficient)} batteries screened in {elapsed_ms:.1f} ms - {len(flagged)} "
+                   f"flagged and {excluded}: a feature more than {threshold} robust z-scores (median/MAD) worse "
+                   f"than the fleet")
+    
     def run_streamlit_dashboard(self):
         """Run the Streamlit dashboard"""
         st.set_page_config(
@@ -899,6 +1305,9 @@ class InteractiveBatteryDashboard:
             st.title("🔋 Battery Analysis Dashboard")
             st.markdown("---")
             
+            analysis_mode = st.radio("Analysis mode", ["Single Battery", "Fleet Comparison"], horizontal=True)
+            st.markdown("---")
+            
             # Battery selection
             st.subheader("Select Battery")
             if self.available_batteries:
@@ -923,6 +1332,52 @@ class InteractiveBatteryDashboard:
             st.info(f"Total Records: {len(self.metadata) if self.metadata is not None else 0}")
             st.info(f"Available Batteries: {len(self.available_batteries)}")
             
+            st.markdown("---")
+            st.markdown("**Detail Data Cache:**")
+            detail_cache = self.get_detail_cache()
+            cache_budget_mb = st.number_input(
+                "RAM budget (MB)",
+                min_value=64,
+                max_value=65536,
+                value=int(detail_cache.max_bytes // 1024 ** 2),
+                step=64
+            )
+            detail_cache.set_budget(cache_budget_mb * 1024 ** 2)
+            stream_mb = st.number_input(
+                "Streaming chunk budget (MB, 0 = off)",
+                min_value=0,
+                max_value=4096,
+                value=int(self.stream_max_mb or 0),
+                step=16,
+                help="Stream efficiency and thermal data in bounded chunks instead of loading whole batteries"
+            )
+            self.stream_max_mb = stream_mb or None
+            
+            st.markdown("---")
+            st.markdown("**Degradation Smoothing:**")
+            self.degradation_window = st.number_input("Rolling window (cycles)", min_value=1, max_value=100,
+                                                      value=self.degradation_window)
+            self.degradation_span = st.number_input("EWMA span (cycles)", min_value=1, max_value=100,
+                                                    value=self.degradation_span)
+            
+            if self.spool_dir:
+                st.markdown("---")
+                st.markdown("**Live Telemetry:**")
+                if st.checkbox("Watch spool directory", help=f"Tail new rows written to {self.spool_dir}"):
+                    self.live_refresh_seconds = st.slider("Refresh interval (s)", 0.25, 5.0, 0.5, 0.25)
+            # Filled in after the tabs render so the counts include this rerun
+            cache_stats_placeholder = st.empty()
+            figure_cache_placeholder = st.empty()
+            if st.checkbox("📦 Memory report", help="Footprint of the compact schema against float64/int64/strings"):
+                memory_report_placeholder = st.empty()
+            else:
+                memory_report_placeholder = None
+            
+            st.markdown("---")
+            st.checkbox("⏱️ Profile dashboard stages", key='profile_dashboard',
+                        help="Time every load and plot step with bytes read, rows and figure sizes")
+            profile_placeholder = st.empty()
+            
             st.markdown("---")
             st.markdown("**About:**")
             st.markdown("Interactive dashboard for NASA battery dataset analysis. Select a battery to view comprehensive performance metrics and aging analysis.")
@@ -932,12 +1387,24 @@ class InteractiveBatteryDashboard:
         st.markdown("Select a battery from the sidebar to begin analysis.")
         
         # Check if battery is analyzed
-        if hasattr(st.session_state, 'battery_analyzed') and st.session_state.battery_analyzed:
+        if analysis_mode == "Fleet Comparison":
+            self.render_fleet_comparison()
+        
+        elif hasattr(st.session_state, 'battery_analyzed') and st.session_state.battery_analyzed:
             current_battery = st.session_state.current_battery
             
+            # The dashboard object is rebuilt on every rerun, so restore the
+            # selected battery's metrics (a cheap lookup with fleet metrics)
+            if not self.battery_data:
+                self.calculate_battery_metrics(current_battery)
+            
             # Header with current battery info
             st.header(f"📊 Analysis Results for Battery: {current_battery}")
             
+            if self.live_refresh_seconds:
+                # Only this panel reruns on the interval, so new rows show up without a full page rerun
+                run_as_fragment(self.render_live_panel, current_battery, run_every=self.live_refresh_seconds)
+            
             # Create tabs for different analysis sections
             tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
                 "📈 Capacity Analysis", 
@@ -948,58 +1415,46 @@ class InteractiveBatteryDashboard:
                 "ℹ️ About"
             ])
             
+            # Build every figure of the first three tabs at once; each tab below only waits for its own
+            figures = self.prepare_figures(current_battery, [name for names in TAB_PLOTS.values() for name in names])
+            
             with tab1:
                 st.subheader("Capacity Degradation Analysis")
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    self.plot_capacity_degradation(current_battery)
+                    self.plot_capacity_degradation(current_battery, figures['capacity_degradation'])
                 
                 with col2:
-                    self.plot_soc_dod_evolution(current_battery)
+                    self.plot_soc_dod_evolution(current_battery, figures['soc_dod_evolution'])
                 
-                self.plot_throughput_analysis(current_battery)
+                self.plot_throughput_analysis(current_battery, figures['throughput_analysis'])
             
             with tab2:
                 st.subheader("Impedance Analysis")
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    self.plot_impedance_parameters(current_battery)
+                    self.plot_impedance_parameters(current_battery, figures['impedance_parameters'])
                 
                 with col2:
-                    self.plot_resistance_increase(current_battery)
+                    self.plot_resistance_increase(current_battery, figures['resistance_increase'])
                 
-                self.plot_capacity_vs_resistance(current_battery)
+                self.plot_capacity_vs_resistance(current_battery, figures['capacity_vs_resistance'])
             
             with tab3:
                 st.subheader("Performance Metrics")
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    self.plot_energy_efficiency(current_battery)
+                    self.plot_energy_efficiency(current_battery, figures['energy_efficiency'])
                 
                 with col2:
-                    self.plot_degradation_rate(current_battery)
+                    self.plot_degradation_rate(current_battery, figures['degradation_rate'])
             
             with tab4:
-                st.subheader("Advanced Analysis")
-                st.info("🔬 **Advanced Features** - These analyses use detailed CSV data and may take longer to load")
-                
-                # First row: I-V Curves and Real Energy Efficiency
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("📊 I-V Curves Analysis")
-                    self.plot_iv_curves(current_battery)
-                
-                with col2:
-                    st.subheader("⚡ Real Energy Efficiency")
-                    self.plot_real_energy_efficiency(current_battery)
-                
-                # Second row: Thermal Analysis (full width)
-                st.subheader("🌡️ Thermal Analysis")
-                self.plot_thermal_analysis(current_battery)
+                # Detailed CSV I/O only happens once the user asks for it
+                run_as_fragment(self.render_advanced_analysis, current_battery)
             
             with tab5:
                 self.generate_executive_summary(current_battery)
@@ -1052,17 +1507,82 @@ class InteractiveBatteryDashboard:
                     st.write("**Data Distribution by Type:**")
                     type_counts = self.metadata['type'].value_counts()
                     st.bar_chart(type_counts)
+        
+        cache_stats = detail_cache.stats()
+        cache_stats_placeholder.caption(
+            f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | "
+            f"Evictions: {cache_stats['evictions']}  \n"
+            f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1024 ** 2:.1f} / "
+            f"{cache_stats['max_bytes'] / 1024 ** 2:.0f} MB"
+        )
+        figure_stats = self.get_figure_cache().stats()
+        figure_cache_placeholder.caption(
+            f"Figure cache: {figure_stats['hits']} RAM / {figure_stats['disk_hits']} disk hits | "
+            f"{figure_stats['misses']} built | {figure_stats['entries']} figures, "
+            f"{figure_stats['bytes'] / 1024 ** 2:.2f} / {figure_stats['max_bytes'] / 1024 ** 2:.0f} MB"
+        )
+        
+        if memory_report_placeholder is not None:
+            self.render_memory_report(memory_report_placeholder)
+        
+        if self.profiler.enabled:
+            self.render_profile_panel(profile_placeholder)
+    
+    def render_memory_report(self, placeholder):
+        """Metadata and cached detail frames, compact schema against the wide dtypes they replaced"""
+        with placeholder.container():
+            if self.metadata is not None:
+                report = memory_report(self.metadata)
+                st.markdown("**Metadata**")
+                st.dataframe(report[['dtype_after', 'mb_before', 'mb_after', 'saved_pct']].round(3),
+                             use_container_width=True)
+            
+            rows = []
+            for (battery_id, test_type, selection), entry in self.get_detail_cache().entries.items():
+                total = memory_report(entry['data']).loc['total']
+                rows.append({'battery': battery_id, 'type': test_type,
+                             'cycles': 'all' if selection is None else entry['data']['uid'].nunique(),
+                             'rows': len(entry['data']),
+                             'mb_before': total['mb_before'], 'mb_after': total['mb_after'],
+                             'saved_pct': total['saved_pct']})
+            if rows:
+                st.markdown("**Cached detail frames**")
+                st.dataframe(pd.DataFrame(rows).round(2), use_container_width=True, hide_index=True)
+    
+    def render_profile_panel(self, placeholder):
+        """Stage breakdown of this run plus a JSON trace download"""
+        summary = self.profiler.summary()
+        with placeholder.container():
+            if len(summary) == 0:
+                st.caption("Profiling starts with the next rerun")
+                return
+            table = summary[['stage', 'calls', 'total_ms', 'bytes_read', 'rows', 'figure_bytes', 'figure_json_ms']]
+            st.dataframe(table.round(1), use_container_width=True, hide_index=True)
+            totals = self.profiler.totals()
+            st.caption(f"{totals['ms']:.0f} ms profiled | {totals['bytes_read'] / 1024 ** 2:.1f} MB read | "
+                       f"{totals['figures']} figures, {totals['figure_bytes'] / 1024:.0f} KB JSON  \n"
+                       f"Stage counts include their nested stages")
+            st.download_button("Export JSON trace", json.dumps(self.profiler.to_trace()),
+                               file_name="dashboard_trace.json", mime="application/json")
 
 if __name__ == "__main__":
     # Configure paths
     metadata_path = "cleaned_dataset_battery_NASA/metadata.csv"
     data_dir = "cleaned_dataset_battery_NASA/data"
+    columnar_dir = "cleaned_dataset_battery_NASA/columnar"
+    metrics_dir = "cleaned_dataset_battery_NASA/metrics"
+    timeseries_dir = "cleaned_dataset_battery_NASA/timeseries"
+    ingest_dir = "cleaned_dataset_battery_NASA/ingest"
+    spool_dir = "cleaned_dataset_battery_NASA/spool"
+    figure_cache_dir = "cleaned_dataset_battery_NASA/figures"
     
     # Create dashboard instance
-    dashboard = InteractiveBatteryDashboard(metadata_path, data_dir)
+    dashboard = InteractiveBatteryDashboard(metadata_path, data_dir, columnar_dir, metrics_dir=metrics_dir,
+                                            timeseries_dir=timeseries_dir, ingest_dir=ingest_dir,
+                                            spool_dir=spool_dir, figure_cache_dir=figure_cache_dir)
     
     # Load data first
-    if dashboard.load_and_clean_data():
+    if dashboard.load_and_clean_data(precompute_metrics=True):
         # Run the Streamlit dashboard
         dashboard.run_streamlit_dashboard()
     else:
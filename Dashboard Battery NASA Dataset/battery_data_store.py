@@ -0,0 +1,967 @@
+#!/usr/bin/env python3
+"""
+Battery Data Store - NASA Dataset
+Columnar (Parquet) store, memory-mapped time-series store and in-memory
+cache for the per-cycle CSV files used by the dashboard
+"""
+
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Columns added to every detailed frame so rows can be traced back to metadata
+DETAIL_KEY_COLUMNS = ['test_id', 'uid', 'filename']
+
+METADATA_COLUMNS = ['type', 'start_time', 'ambient_temperature',
+                    'battery_id', 'test_id', 'uid', 'filename',
+                    'Capacity', 'Re', 'Rct']
+
+# Numeric detail columns packed into the memory-mapped time-series store.
+# Time keeps float64 so long tests do not lose sub-second resolution
+TIMESERIES_DTYPES = {
+    'Voltage_measured': np.float32,
+    'Current_measured': np.float32,
+    'Temperature_measured': np.float32,
+    'Voltage_load': np.float32,
+    'Current_load': np.float32,
+    'Time': np.float64,
+}
+TIMESERIES_COLUMNS = list(TIMESERIES_DTYPES)
+
+# Compact in-memory schema applied at load time. Repeated string keys become
+# categoricals, measurements float32 and ids int32; detail Time stays float64
+# like in the time-series store. filename is unique per metadata row, so it
+# is only categorical in detail frames, where it repeats for every sample
+METADATA_CATEGORY_COLUMNS = ['type', 'battery_id']
+METADATA_FLOAT_COLUMNS = ['Capacity', 'Re', 'Rct']
+INTEGER_DTYPES = {'test_id': np.int32, 'uid': np.int32, 'ambient_temperature': np.int16}
+DETAIL_DTYPES = dict(TIMESERIES_DTYPES, Voltage_charge=np.float32, Current_charge=np.float32)
+
+
+def clean_metadata(metadata):
+    """Normalize column names, coerce types and drop rows without type/battery_id"""
+    # Handle different column formats
+    if len(metadata.columns) >= 10:
+        metadata.columns = METADATA_COLUMNS
+    else:
+        metadata.columns = list(metadata.columns[:10]) + ['extra'] * max(0, 10 - len(metadata.columns))
+
+    # Convert Capacity column
+    metadata['Capacity'] = pd.to_numeric(metadata['Capacity'], errors='coerce')
+
+    # Convert Re column (handle cases where it's split across columns)
+    if 'Re' in metadata.columns:
+        metadata['Re'] = pd.to_numeric(metadata['Re'], errors='coerce')
+    else:
+        metadata['Re'] = np.nan
+
+    # Convert Rct column
+    if 'Rct' in metadata.columns:
+        metadata['Rct'] = pd.to_numeric(metadata['Rct'], errors='coerce')
+    else:
+        metadata['Rct'] = np.nan
+
+    # Clean start_time - handle multiple formats
+    metadata['start_time'] = pd.to_datetime(metadata['start_time'], errors='coerce')
+
+    # Remove completely invalid rows but keep partial data
+    return metadata.dropna(subset=['type', 'battery_id'])
+
+
+def _downcast_integers(frame, columns):
+    """Cast integer-valued columns to their compact dtype when every value fits"""
+    for column in columns:
+        if column not in frame.columns:
+            continue
+        dtype = INTEGER_DTYPES[column]
+        values = pd.to_numeric(frame[column], errors='coerce')
+        limits = np.iinfo(dtype)
+        if values.notna().all() and (len(values) == 0 or limits.min <= values.min() <= values.max() <= limits.max):
+            frame[column] = values.astype(dtype)
+
+
+def compact_metadata(metadata):
+    """Apply the compact schema to cleaned metadata: categorical keys, float32 measurements, int32 ids"""
+    metadata = metadata.copy(deep=False)
+    for column in METADATA_CATEGORY_COLUMNS:
+        if not isinstance(metadata[column].dtype, pd.CategoricalDtype):
+            metadata[column] = metadata[column].astype('category')
+        else:
+            # Categories left over from concatenated or filtered frames
+            metadata[column] = metadata[column].cat.remove_unused_categories()
+    for column in METADATA_FLOAT_COLUMNS:
+        metadata[column] = metadata[column].astype(np.float32)
+    _downcast_integers(metadata, INTEGER_DTYPES)
+    return metadata
+
+
+def compact_detail_frame(df):
+    """Apply the compact schema to a detail frame: float32 sensors, int32 keys, categorical filename"""
+    for column, dtype in DETAIL_DTYPES.items():
+        if column in df.columns and pd.api.types.is_numeric_dtype(df[column]) and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    _downcast_integers(df, ['test_id', 'uid'])
+    if 'filename' in df.columns and not isinstance(df['filename'].dtype, pd.CategoricalDtype):
+        df['filename'] = df['filename'].astype('category')
+    return df
+
+
+def concat_detail_frames(frames):
+    """pd.concat for compact detail frames that keeps filename categorical
+
+    Plain concat turns categoricals with different categories back into
+    one string per row, so the filename codes are unioned separately.
+    """
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    if not all('filename' in frame.columns for frame in frames):
+        return pd.concat(frames, ignore_index=True)
+    combined = pd.concat([frame.drop(columns='filename') for frame in frames], ignore_index=True)
+    combined['filename'] = pd.api.types.union_categoricals(
+        [frame['filename'].astype('category') for frame in frames])
+    return combined
+
+
+def expand_compact_schema(frame):
+    """The frame in the dtypes the loaders produced before compaction (for memory reports)"""
+    expanded = {}
+    for column, dtype in frame.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            expanded[column] = frame[column].astype(dtype.categories.dtype)
+        elif pd.api.types.is_float_dtype(dtype):
+            expanded[column] = frame[column].astype(np.float64)
+        elif pd.api.types.is_integer_dtype(dtype):
+            expanded[column] = frame[column].astype(np.int64)
+        else:
+            expanded[column] = frame[column]
+    return pd.DataFrame(expanded, index=frame.index)
+
+
+def memory_report(after, before=None):
+    """Per-column memory of a compacted frame against its wide form, with a total row
+
+    before defaults to expand_compact_schema(after).
+    """
+    if before is None:
+        before = expand_compact_schema(after)
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'mb_before': before_bytes / 1024 ** 2,
+        'mb_after': after_bytes.reindex(before.columns) / 1024 ** 2,
+    })
+    report.loc['total'] = ['', '', report['mb_before'].sum(), report['mb_after'].sum()]
+    report['saved_pct'] = (1 - report['mb_after'] / report['mb_before']) * 100
+    report.index.name = 'column'
+    return report
+
+
+def select_available_batteries(metadata, excluded=()):
+    """Sorted battery ids present in metadata, minus the excluded ones (e.g. flagged by screen_fleet)"""
+    excluded = set(excluded)
+    all_batteries = sorted(metadata['battery_id'].unique())
+    return [b for b in all_batteries if b not in excluded]
+
+
+def partition_dir(store_dir, battery_id, test_type):
+    """Return the directory a store keeps one battery and test type in"""
+    return Path(store_dir) / f"battery_id={battery_id}" / f"type={test_type}"
+
+
+def columnar_file_path(store_dir, battery_id, test_type, uid):
+    """Return the Parquet file holding a single cycle"""
+    return partition_dir(store_dir, battery_id, test_type) / f"uid={uid}.parquet"
+
+
+def detail_source_path(data_dir, filename, store_dir=None, battery_id=None, test_type=None, uid=None):
+    """File read_detail_file reads for a cycle: its Parquet copy if converted, else the CSV"""
+    if store_dir is not None and uid is not None:
+        parquet_path = columnar_file_path(store_dir, battery_id, test_type, uid)
+        if parquet_path.exists():
+            return parquet_path
+    return Path(f"{data_dir}/{filename}")
+
+
+def read_detail_file(data_dir, filename, columns=None, store_dir=None,
+                     battery_id=None, test_type=None, uid=None):
+    """Read one cycle, preferring the columnar store over the raw CSV"""
+    filepath = detail_source_path(data_dir, filename, store_dir, battery_id, test_type, uid)
+    if filepath.suffix == '.parquet':
+        if columns is None:
+            return pd.read_parquet(filepath)
+        # Only ask Parquet for columns it actually has
+        import pyarrow.parquet as pq
+        available = set(pq.read_schema(filepath).names)
+        return pd.read_parquet(filepath, columns=[c for c in columns if c in available])
+
+    if columns is None:
+        return pd.read_csv(filepath)
+    wanted = set(columns)
+    return pd.read_csv(filepath, usecols=lambda c: c in wanted)
+
+
+def load_cycle(data_dir, cycle, columns=None, store_dir=None, battery_id=None, test_type=None):
+    """Load one cycle and tag it with its metadata keys
+
+    cycle is a (test_id, uid, filename) tuple. Returns (filename, df, error)
+    with exactly one of df/error set, so pool workers never raise.
+    """
+    test_id, uid, filename = cycle
+    try:
+        df = read_detail_file(data_dir, filename, columns, store_dir=store_dir,
+                              battery_id=battery_id, test_type=test_type, uid=uid)
+        df['test_id'] = test_id
+        df['uid'] = uid
+        df['filename'] = filename
+        return filename, compact_detail_frame(df), None
+    except Exception as e:
+        return filename, None, e
+
+
+def load_cycles(data_dir, cycles, columns=None, store_dir=None, battery_id=None,
+                test_type=None, workers=1, pool='thread'):
+    """Load many cycles, optionally with a thread or process pool
+
+    Results come back in the same order as cycles regardless of which worker
+    finishes first. Threads suit the mostly I/O-bound CSV/Parquet reads; a
+    process pool helps when parsing dominates on many-core machines.
+    """
+    cycles = list(cycles)
+    if workers <= 1 or len(cycles) <= 1:
+        return [load_cycle(data_dir, cycle, columns, store_dir, battery_id, test_type)
+                for cycle in cycles]
+
+    executor_class = ProcessPoolExecutor if pool == 'process' else ThreadPoolExecutor
+    n = len(cycles)
+    with executor_class(max_workers=min(workers, n)) as executor:
+        return list(executor.map(load_cycle, [data_dir] * n, cycles, [columns] * n,
+                                 [store_dir] * n, [battery_id] * n, [test_type] * n,
+                                 chunksize=max(1, n // (workers * 4))))
+
+
+def _iter_cycle_pieces(data_dir, filename, columns, chunk_rows, store_dir=None,
+                       battery_id=None, test_type=None, uid=None, timeseries_store=None):
+    """Yield one cycle in frames of at most chunk_rows rows"""
+    if timeseries_store is not None:
+        partition = timeseries_store.partition(battery_id, test_type)
+        if partition is not None and partition.covers(columns) and uid in partition.uid_offsets:
+            start, stop = partition.uid_offsets[uid]
+            for offset in range(start, stop, chunk_rows):
+                rows = slice(offset, min(offset + chunk_rows, stop))
+                yield pd.DataFrame({column: np.asarray(partition.arrays[column][rows]) for column in columns})
+            return
+
+    if store_dir is not None and uid is not None:
+        parquet_path = columnar_file_path(store_dir, battery_id, test_type, uid)
+        if parquet_path.exists():
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(parquet_path)
+            available = parquet_file.schema_arrow.names
+            read_columns = available if columns is None else [c for c in columns if c in available]
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=read_columns):
+                yield batch.to_pandas()
+            return
+
+    usecols = None if columns is None else (lambda c, wanted=set(columns): c in wanted)
+    with pd.read_csv(f"{data_dir}/{filename}", usecols=usecols, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def iter_detail_chunks(data_dir, cycles, columns=None, store_dir=None, battery_id=None, test_type=None,
+                       max_bytes=64 * 1024 ** 2, errors=None, timeseries_store=None):
+    """Stream cycles as frames whose size stays within max_bytes
+
+    Small cycles are batched together and oversized ones are split into row
+    chunks (in file order), so a whole battery never has to be in memory at
+    once. Every frame carries test_id/uid/filename and, when columns is
+    given, exactly those columns (NaN where a cycle lacks one). Cycles that
+    fail to read are appended to errors as (filename, error) and skipped.
+    """
+    # Half the budget per frame leaves room for the batch plus its concatenated copy
+    row_bytes = 8 * (len(columns) if columns is not None else 16) + 100
+    chunk_rows = max(1, max_bytes // 2 // row_bytes)
+
+    batch = []
+    batch_rows = 0
+    for test_id, uid, filename in cycles:
+        try:
+            for piece in _iter_cycle_pieces(data_dir, filename, columns, chunk_rows, store_dir,
+                                            battery_id, test_type, uid, timeseries_store):
+                if columns is not None:
+                    piece = piece.reindex(columns=columns)
+                piece['test_id'] = test_id
+                piece['uid'] = uid
+                piece['filename'] = filename
+                piece = compact_detail_frame(piece)
+                if batch and batch_rows + len(piece) > chunk_rows:
+                    yield concat_detail_frames(batch)
+                    batch = []
+                    batch_rows = 0
+                batch.append(piece)
+                batch_rows += len(piece)
+        except Exception as e:
+            if errors is not None:
+                errors.append((filename, e))
+    if batch:
+        yield concat_detail_frames(batch)
+
+
+def build_columnar_store(metadata, data_dir, store_dir, overwrite=False):
+    """Convert every per-cycle CSV listed in metadata into the Parquet store
+
+    Files already converted (and newer than their CSV) are skipped unless
+    overwrite is set. Returns (converted, skipped, failed) where failed is a
+    list of (filename, error) tuples.
+    """
+    converted = 0
+    skipped = 0
+    failed = []
+
+    for row in metadata[['battery_id', 'type', 'test_id', 'uid', 'filename']].itertuples(index=False):
+        csv_path = f"{data_dir}/{row.filename}"
+        target = columnar_file_path(store_dir, row.battery_id, row.type, row.uid)
+
+        try:
+            if (not overwrite and target.exists()
+                    and os.path.getmtime(target) >= os.path.getmtime(csv_path)):
+                skipped += 1
+                continue
+
+            df = pd.read_csv(csv_path)
+            df['test_id'] = row.test_id
+            df['uid'] = row.uid
+            df['filename'] = row.filename
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so a crash never leaves a half-written cycle
+            tmp_target = target.with_suffix('.parquet.tmp')
+            df.to_parquet(tmp_target, index=False)
+            os.replace(tmp_target, target)
+            converted += 1
+        except Exception as e:
+            failed.append((row.filename, e))
+
+    return converted, skipped, failed
+
+
+def _write_array(path, array):
+    """Save one .npy array atomically"""
+    tmp_path = path.with_suffix('.npy.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def build_timeseries_store(metadata, data_dir, store_dir, overwrite=False, columnar_dir=None):
+    """Pack the numeric detail columns of every battery/type into .npy arrays
+
+    Each partition gets one contiguous array per column in TIMESERIES_COLUMNS
+    (cycles back to back, NaN where a cycle lacks the column) plus
+    index.parquet with each uid's [start, stop) row range. Partitions newer
+    than all of their source files are skipped unless overwrite is set.
+    Returns (converted, skipped, failed) counted in partitions, with failed
+    listing (filename, error) for cycles that could not be read.
+    """
+    converted = 0
+    skipped = 0
+    failed = []
+
+    metadata = metadata[['battery_id', 'type', 'test_id', 'uid', 'filename']]
+    for (battery_id, test_type), group in metadata.groupby(['battery_id', 'type'], sort=False, observed=True):
+        partition = partition_dir(store_dir, battery_id, test_type)
+        index_path = partition / "index.parquet"
+
+        source_mtimes = [mtime for mtime in detail_files_fingerprint(data_dir, group['filename']) if mtime]
+        if (not overwrite and index_path.exists() and source_mtimes
+                and os.path.getmtime(index_path) >= max(source_mtimes)):
+            skipped += 1
+            continue
+
+        cycles = list(group[['test_id', 'uid', 'filename']].itertuples(index=False, name=None))
+        packed = []
+        for cycle, (filename, df, error) in zip(cycles, load_cycles(
+                data_dir, cycles, TIMESERIES_COLUMNS, store_dir=columnar_dir,
+                battery_id=battery_id, test_type=test_type)):
+            if error is not None:
+                failed.append((filename, error))
+            else:
+                packed.append((cycle, df))
+
+        columns = [c for c in TIMESERIES_COLUMNS if any(c in df.columns for _, df in packed)]
+        if not columns:
+            # Impedance cycles and unreadable partitions have nothing to pack
+            continue
+
+        lengths = np.array([len(df) for _, df in packed], dtype=np.int64)
+        stops = np.cumsum(lengths)
+        starts = stops - lengths
+        index = pd.DataFrame([cycle for cycle, _ in packed], columns=DETAIL_KEY_COLUMNS)
+        index['start'] = starts
+        index['stop'] = stops
+
+        partition.mkdir(parents=True, exist_ok=True)
+        for column in columns:
+            array = np.full(int(stops[-1]), np.nan, dtype=TIMESERIES_DTYPES[column])
+            for (_, df), start, stop in zip(packed, starts, stops):
+                if column in df.columns:
+                    array[start:stop] = pd.to_numeric(df[column], errors='coerce').to_numpy()
+            _write_array(partition / f"{column}.npy", array)
+
+        # The index is written last, so a partition without one is never read
+        tmp_index = index_path.with_suffix('.parquet.tmp')
+        index.to_parquet(tmp_index, index=False)
+        os.replace(tmp_index, index_path)
+        converted += 1
+
+    return converted, skipped, failed
+
+
+class TimeSeriesPartition:
+    """Memory-mapped detail arrays for one battery and test type
+
+    Column arrays are opened with np.load(mmap_mode='r'), so nothing is read
+    until a slice is touched and pages can be dropped by the OS at any time.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.index = pd.read_parquet(self.directory / "index.parquet")
+        self.uid_offsets = {uid: (int(start), int(stop)) for uid, start, stop
+                            in self.index[['uid', 'start', 'stop']].itertuples(index=False, name=None)}
+        self.arrays = {}
+        for column in TIMESERIES_COLUMNS:
+            path = self.directory / f"{column}.npy"
+            if path.exists():
+                self.arrays[column] = np.load(path, mmap_mode='r')
+
+    @property
+    def columns(self):
+        return list(self.arrays)
+
+    def covers(self, columns):
+        """Check whether every requested column is stored"""
+        return columns is not None and set(columns) <= set(self.arrays)
+
+    def frame(self, columns=None, uids=None):
+        """Build a detail frame (plus test_id/uid/filename) for the given uids
+
+        The rows of each cycle are one contiguous slice, so only the selected
+        cycles are paged in. uids default to every stored cycle, in order.
+        """
+        columns = self.columns if columns is None else columns
+        index = self.index
+        if uids is not None:
+            index = index.set_index('uid').reindex(list(uids)).dropna(subset=['start']).reset_index()
+        starts = index['start'].to_numpy(dtype=np.int64)
+        stops = index['stop'].to_numpy(dtype=np.int64)
+        lengths = stops - starts
+
+        # Contiguous runs of cycles (the common case) are sliced, not gathered
+        if len(index) > 0 and np.array_equal(starts[1:], stops[:-1]):
+            rows = slice(int(starts[0]), int(stops[-1]))
+        else:
+            rows = np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)]
+                                  or [np.array([], dtype=np.int64)])
+
+        data = {column: np.asarray(self.arrays[column][rows]) for column in columns}
+        cycle_codes = np.repeat(np.arange(len(index), dtype=np.int32), lengths)
+        for column in ['test_id', 'uid']:
+            data[column] = index[column].to_numpy()[cycle_codes]
+        # One category per cycle, so no per-sample filename strings are built
+        data['filename'] = pd.Categorical.from_codes(cycle_codes, categories=pd.Index(index['filename']))
+        return compact_detail_frame(pd.DataFrame(data))
+
+
+class TimeSeriesStore:
+    """Opens memory-mapped partitions on demand and keeps them open"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.partitions = {}
+
+    def has_partition(self, battery_id, test_type):
+        """Check whether a battery/type partition has been packed"""
+        return (partition_dir(self.store_dir, battery_id, test_type) / "index.parquet").exists()
+
+    def partition(self, battery_id, test_type):
+        """Return the open partition, or None if it was never packed"""
+        key = (battery_id, test_type)
+        if key not in self.partitions:
+            if not self.has_partition(battery_id, test_type):
+                return None
+            self.partitions[key] = TimeSeriesPartition(
+                partition_dir(self.store_dir, battery_id, test_type))
+        return self.partitions[key]
+
+    def read(self, battery_id, test_type, uids, columns):
+        """Return a detail frame for uids, or None when the store cannot serve it
+
+        Only explicit column lists of stored columns are served, and only when
+        every requested uid was packed; anything else falls back to the files.
+        """
+        partition = self.partition(battery_id, test_type)
+        if partition is None or not partition.covers(columns):
+            return None
+        uids = list(uids)
+        if not all(uid in partition.uid_offsets for uid in uids):
+            return None
+        return partition.frame(columns, uids)
+
+
+class MetadataIndex:
+    """Offset table for metadata sorted by (battery_id, type)
+
+    Built once in O(n); afterwards a battery or battery/type slice is a dict
+    lookup plus a positional iloc slice (no boolean mask over the whole
+    frame). The metadata passed in must already be sorted by battery_id and
+    type, see sort_metadata.
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        battery_ids = metadata['battery_id'].to_numpy()
+        test_types = metadata['type'].to_numpy()
+        self.battery_offsets = self._offsets(battery_ids)
+        self.type_offsets = self._offsets(battery_ids, test_types)
+
+    @staticmethod
+    def _offsets(*key_arrays):
+        """Map each run of equal consecutive keys to its (start, stop) positions"""
+        n = len(key_arrays[0])
+        if n == 0:
+            return {}
+        changed = np.zeros(n - 1, dtype=bool)
+        for keys in key_arrays:
+            changed |= keys[1:] != keys[:-1]
+        starts = np.flatnonzero(np.r_[True, changed])
+        stops = np.r_[starts[1:], n]
+        if len(key_arrays) == 1:
+            labels = key_arrays[0][starts]
+        else:
+            labels = list(zip(*(keys[starts] for keys in key_arrays)))
+        return {label: (int(start), int(stop)) for label, start, stop in zip(labels, starts, stops)}
+
+    def battery(self, battery_id):
+        """Return all metadata rows for one battery"""
+        start, stop = self.battery_offsets.get(battery_id, (0, 0))
+        return self.metadata.iloc[start:stop]
+
+    def battery_type(self, battery_id, test_type):
+        """Return the metadata rows for one battery and test type"""
+        start, stop = self.type_offsets.get((battery_id, test_type), (0, 0))
+        return self.metadata.iloc[start:stop]
+
+
+def sort_metadata(metadata):
+    """Sort metadata by (battery_id, type), keeping file order within each group"""
+    return metadata.sort_values(['battery_id', 'type'], kind='mergesort').reset_index(drop=True)
+
+
+def select_cycles(test_meta, uids=None, cycle_range=None, every=None, limit=None):
+    """Keep only the cycles a detail read needs (predicate pushdown on the cycle list)
+
+    Cycles are numbered 1, 2, ... in uid order within the battery and test
+    type. cycle_range=(first, last) is inclusive, every=k keeps cycles 1,
+    1+k, 1+2k, ... and limit keeps the first n cycles left after the other
+    predicates. The metadata rows are filtered before anything is read, so
+    the files and store partitions of unselected cycles are never touched.
+    """
+    if not test_meta['uid'].is_monotonic_increasing:
+        test_meta = test_meta.sort_values('uid', kind='mergesort')
+    numbers = np.arange(1, len(test_meta) + 1)
+    mask = np.ones(len(test_meta), dtype=bool)
+    if uids is not None:
+        mask &= test_meta['uid'].isin(list(uids)).to_numpy()
+    if cycle_range is not None:
+        first, last = cycle_range
+        mask &= (numbers >= first) & (numbers <= last)
+    if every is not None and every > 1:
+        mask &= (numbers - 1) % every == 0
+    if not mask.all():
+        test_meta = test_meta[mask]
+    if limit is not None:
+        test_meta = test_meta.head(limit)
+    return test_meta
+
+
+def cycle_selection(uids=None, cycle_range=None, every=None, limit=None):
+    """Hashable form of select_cycles' predicates (None when every cycle is selected)"""
+    if every is not None and every <= 1:
+        every = None
+    if uids is None and cycle_range is None and every is None and limit is None:
+        return None
+    return (None if uids is None else tuple(sorted(uids)),
+            None if cycle_range is None else tuple(cycle_range), every, limit)
+
+
+def detail_files_fingerprint(data_dir, filenames):
+    """Return a tuple of file mtimes used to detect changed cycle files"""
+    fingerprint = []
+    for filename in filenames:
+        try:
+            fingerprint.append(os.path.getmtime(f"{data_dir}/{filename}"))
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+class DetailDataCache:
+    """LRU cache of detailed cycle frames bounded by a RAM budget
+
+    Entries are keyed by (battery_id, test_type, selection), selection being
+    the cycle_selection a partial read was made with (None = every cycle), and
+    remember the file fingerprint and the columns they were loaded with. A
+    request is a hit when the fingerprint matches and the cached columns cover
+    the requested ones. Cached frames are shared, so callers must not modify
+    them in place.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, battery_id, test_type, fingerprint, columns=None, selection=None):
+        """Return the cached frame (restricted to columns) or None on a miss"""
+        key = (battery_id, test_type, selection)
+        entry = self.entries.get(key)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            self.misses += 1
+            return None
+
+        if columns is not None and entry['columns'] is not None:
+            if not set(columns) <= entry['columns']:
+                self.misses += 1
+                return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        df = entry['data']
+        if columns is None:
+            return df
+        return df[[c for c in df.columns if c in columns or c in DETAIL_KEY_COLUMNS]]
+
+    def cached_columns(self, battery_id, test_type, fingerprint, selection=None):
+        """Return the column set of a still-valid entry (None means all columns)"""
+        entry = self.entries.get((battery_id, test_type, selection))
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return set()
+        return entry['columns']
+
+    def put(self, battery_id, test_type, fingerprint, data, columns=None, selection=None):
+        """Store a frame and evict least-recently-used entries over budget"""
+        key = (battery_id, test_type, selection)
+        self._drop(key)
+
+        size = int(data.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            # Never worth evicting everything else for a single oversized battery
+            return
+
+        self.entries[key] = {
+            'fingerprint': fingerprint,
+            'columns': None if columns is None else set(columns),
+            'data': data,
+            'bytes': size,
+        }
+        self.total_bytes += size
+        self._evict()
+
+    def set_budget(self, max_bytes):
+        """Change the RAM budget, evicting immediately if it shrank"""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current memory usage"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry['bytes']
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry['bytes']
+            self.evictions += 1
+
+
+def save_tables(tables, directory):
+    """Persist a dict of DataFrames as <name>.parquet files in directory"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        target = directory / f"{name}.parquet"
+        tmp_target = target.with_suffix('.parquet.tmp')
+        table.to_parquet(tmp_target)
+        os.replace(tmp_target, target)
+
+
+def load_tables(directory, names, newer_than=None):
+    """Load tables saved by save_tables, or None if any is missing or stale
+
+    newer_than is a source file path; tables older than it are treated as
+    stale so they get rebuilt.
+    """
+    directory = Path(directory)
+    paths = [directory / f"{name}.parquet" for name in names]
+    if not all(path.exists() for path in paths):
+        return None
+    if newer_than is not None and os.path.exists(newer_than):
+        source_mtime = os.path.getmtime(newer_than)
+        if any(os.path.getmtime(path) < source_mtime for path in paths):
+            return None
+    return {name: pd.read_parquet(path) for name, path in zip(names, paths)}
+
+
+def table_fingerprint(table, columns=None):
+    """Content hash of a DataFrame (index included) used to invalidate tables derived from it"""
+    if columns is not None:
+        table = table[columns]
+    hashes = pd.util.hash_pandas_object(table, index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+def save_fingerprinted_table(table, directory, name, fingerprint):
+    """Persist a derived table as <name>-<fingerprint>.parquet, replacing older versions"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{name}-{fingerprint}.parquet"
+    tmp_target = target.with_suffix('.parquet.tmp')
+    table.to_parquet(tmp_target)
+    os.replace(tmp_target, target)
+    for old in directory.glob(f"{name}-*.parquet"):
+        if old != target:
+            old.unlink()
+
+
+def load_fingerprinted_table(directory, name, fingerprint):
+    """Load a table saved by save_fingerprinted_table, or None if it was built from other data"""
+    path = Path(directory) / f"{name}-{fingerprint}.parquet"
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+# Number of delta parts kept before the cleaned store is compacted into one
+MAX_INGEST_PARTS = 64
+# Bytes just before the last processed offset, used to detect a rewritten CSV
+INGEST_SIGNATURE_BYTES = 256
+# Last metadata assembled per store directory, keyed by its part files (name, mtime)
+_ingest_memo = {}
+
+
+def _read_ingest_state(store_dir):
+    try:
+        with open(Path(store_dir) / "ingest_state.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_ingest_state(store_dir, state):
+    store_dir.mkdir(parents=True, exist_ok=True)
+    tmp_state = store_dir / "ingest_state.json.tmp"
+    with open(tmp_state, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_state, store_dir / "ingest_state.json")
+
+
+def _ingest_signature(f, offset):
+    f.seek(max(0, offset - INGEST_SIGNATURE_BYTES))
+    return f.read(min(offset, INGEST_SIGNATURE_BYTES)).hex()
+
+
+def _parts_key(parts):
+    return tuple((part.name, part.stat().st_mtime_ns) for part in parts)
+
+
+def ingest_metadata(metadata_path, store_dir):
+    """Clean only the rows appended to metadata.csv since the last call
+
+    The cleaned rows are kept in store_dir as numbered Parquet parts, and
+    ingest_state.json remembers the byte offset already processed plus the
+    header and the bytes just before that offset. If the file was rewritten
+    rather than appended to (header or those bytes changed, or it shrank) the
+    store is rebuilt from scratch. A trailing line without a newline is left
+    for the next call while the file is still growing, since it may still be
+    being written; a full build, or a call that finds the file the same size
+    as the previous one, takes it as a row. When nothing was appended the
+    state file is left untouched and, within one process, the metadata
+    assembled by the previous call is reused instead of reading every part
+    again.
+
+    Returns (metadata, delta, baseline): the full cleaned metadata in file
+    order, the newly cleaned rows (None after a full rebuild) and the part
+    file that was newest before this call, so tables derived from the store
+    can be checked for freshness against it (None after a full rebuild). When
+    the parts were compacted the baseline is the compacted part, so derived
+    tables are rebuilt once.
+    """
+    store_dir = Path(store_dir)
+    parts_dir = store_dir / "metadata"
+    state = _read_ingest_state(store_dir)
+    parts = sorted(parts_dir.glob("part-*.parquet")) if parts_dir.is_dir() else []
+
+    with open(metadata_path, 'rb') as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        appended = (
+            state is not None and parts
+            and state['header'] == header.hex()
+            and state['offset'] <= size
+            and state['signature'] == _ingest_signature(f, state['offset'])
+        )
+        offset = state['offset'] if appended else len(header)
+        f.seek(offset)
+        chunk = f.read()
+    end = offset + len(chunk)
+
+    # Only consume complete lines while the file is growing
+    if appended and state.get('size') != end:
+        complete = chunk.rfind(b'\n') + 1
+    else:
+        complete = len(chunk)
+    chunk = chunk[:complete]
+
+    if appended and complete == 0:
+        # Nothing new since the last call (e.g. a dashboard rerun)
+        if state.get('size') != end:
+            # Only a partial line arrived; remember the size to take it once it stops growing
+            _write_ingest_state(store_dir, dict(state, size=end))
+        key = _parts_key(parts)
+        memo = _ingest_memo.get(store_dir.resolve())
+        if memo is not None and memo[0] == key:
+            metadata = memo[1]
+        else:
+            metadata = compact_metadata(pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True))
+            _ingest_memo[store_dir.resolve()] = (key, metadata)
+        return metadata, metadata.iloc[0:0], parts[-1]
+
+    if not appended:
+        for part in parts:
+            part.unlink()
+        parts = []
+    baseline = parts[-1] if parts else None
+
+    delta = None
+    if chunk.strip():
+        names = pd.read_csv(io.BytesIO(header), nrows=0).columns
+        delta = compact_metadata(clean_metadata(pd.read_csv(io.BytesIO(chunk), header=None, names=names)))
+
+    frames = [pd.read_parquet(part) for part in parts]
+    if delta is not None and len(delta) > 0:
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        next_part = int(parts[-1].stem.split('-')[1]) + 1 if parts else 0
+        target = parts_dir / f"part-{next_part:05d}.parquet"
+        tmp_target = target.with_suffix('.parquet.tmp')
+        delta.to_parquet(tmp_target, index=False)
+        os.replace(tmp_target, target)
+        parts.append(target)
+        frames.append(delta.reset_index(drop=True))
+
+    # Parts carry their own categories, so the concatenated frame is compacted again
+    metadata = compact_metadata(pd.concat(frames, ignore_index=True) if frames else clean_metadata(
+        pd.read_csv(io.BytesIO(header))))
+
+    if len(parts) > MAX_INGEST_PARTS:
+        # Compact into a single part; derived tables see it as new and rebuild once
+        target = parts_dir / f"part-{int(parts[-1].stem.split('-')[1]) + 1:05d}.parquet"
+        tmp_target = target.with_suffix('.parquet.tmp')
+        metadata.to_parquet(tmp_target, index=False)
+        os.replace(tmp_target, target)
+        for part in parts:
+            part.unlink()
+        baseline = target
+
+    new_offset = offset + complete
+    with open(metadata_path, 'rb') as f:
+        signature = _ingest_signature(f, new_offset)
+    _write_ingest_state(store_dir, {'header': header.hex(), 'offset': new_offset,
+                                    'signature': signature, 'size': end})
+    if parts_dir.is_dir():
+        _ingest_memo[store_dir.resolve()] = (_parts_key(sorted(parts_dir.glob("part-*.parquet"))), metadata)
+
+    if not appended:
+        return metadata, None, None
+    if delta is None:
+        delta = metadata.iloc[0:0]
+    return metadata, delta, baseline
+
+
+class TelemetrySpool:
+    """Tail the metadata-format CSV files that a test rig writes into a spool directory
+
+    Every *.csv file in spool_dir starts with the metadata.csv header and is
+    only ever appended to. poll() returns the cleaned rows completed since the
+    previous poll across all files; a trailing line without a newline is left
+    for the next poll. A file that shrank is read again from the start.
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = Path(spool_dir)
+        self.offsets = {}
+        self.headers = {}
+        self.rows_read = 0
+
+    def poll(self):
+        frames = []
+        if not self.spool_dir.is_dir():
+            return None
+        for path in sorted(self.spool_dir.glob("*.csv")):
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            offset = self.offsets.get(path.name)
+            if offset is not None and offset == size:
+                continue
+
+            with open(path, 'rb') as f:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    continue
+                if offset is None or offset > size or self.headers.get(path.name) != header:
+                    offset = len(header)
+                f.seek(offset)
+                chunk = f.read()
+
+            complete = chunk.rfind(b'\n') + 1
+            self.offsets[path.name] = offset + complete
+            self.headers[path.name] = header
+            if not chunk[:complete].strip():
+                continue
+            names = pd.read_csv(io.BytesIO(header), nrows=0).columns
+            frames.append(pd.read_csv(io.BytesIO(chunk[:complete]), header=None, names=names))
+
+        if not frames:
+            return None
+        rows = pd.concat(frames, ignore_index=True)
+        self.rows_read += len(rows)
+        return compact_metadata(clean_metadata(rows))
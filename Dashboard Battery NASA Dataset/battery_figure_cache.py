@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Battery Figure Cache - NASA Dataset
+Serialized Plotly figures (plus their conclusion numbers) per battery, plot,
+data fingerprint and code version, kept in RAM and on disk so repeat views
+skip data preparation and figure construction. Run as a script to pre-warm
+the disk cache for every battery
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+warnings.filterwarnings('ignore')
+
+FIGURE_CACHE_DIR = "cleaned_dataset_battery_NASA/figures"
+
+
+def source_version(paths):
+    """Hash of the given source files; any edit to them invalidates cached figures"""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def encode_payload(payload):
+    """JSON text of a prepared plot: the figure under 'fig' plus plain numbers"""
+    payload = dict(payload, fig=payload['fig'].to_plotly_json())
+    return pio.json.to_json_plotly(payload)
+
+
+def decode_payload(text):
+    """Inverse of encode_payload
+
+    The figure is rebuilt without Plotly's property validation: it was
+    validated when it was first built, and skipping it makes a cache hit
+    roughly 10x cheaper than building the figure again.
+    """
+    payload = json.loads(text)
+    payload['fig'] = go.Figure(payload['fig'], _validate=False)
+    return payload
+
+
+class FigureCache:
+    """Two-tier LRU cache of prepared plots bounded by a RAM and a disk budget
+
+    Entries are keyed by (battery_id, plot) and remember the data fingerprint
+    they were built from; the code version is part of every key, so figures
+    from an older version of the plotting code are never served. The RAM tier
+    holds the JSON text (its size is exact), the disk tier one file per
+    battery and plot under directory/<battery_id>/. Disk hits are promoted to
+    RAM and least-recently-used files are deleted once the disk budget is
+    exceeded. Safe to use from several figure worker threads.
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 ** 2, max_disk_bytes=512 * 1024 ** 2,
+                 code_version=''):
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.code_version = code_version
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.disk_files = None
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, battery_id, plot, fingerprint):
+        key = hashlib.sha1(f"{fingerprint}|{self.code_version}".encode()).hexdigest()[:16]
+        return self.directory / str(battery_id) / f"{plot}-{key}.json"
+
+    def get(self, battery_id, plot, fingerprint):
+        """Return the cached payload ({'fig': go.Figure, ...}) or None on a miss"""
+        key = (battery_id, plot)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry['fingerprint'] == (fingerprint, self.code_version):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return decode_payload(entry['text'])
+
+        text = self._read_disk(battery_id, plot, fingerprint)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._store(key, fingerprint, text)
+        return decode_payload(text)
+
+    def put(self, battery_id, plot, fingerprint, payload):
+        """Serialize a prepared plot into both tiers"""
+        text = encode_payload(payload)
+        self._store((battery_id, plot), fingerprint, text)
+        if self.directory is not None:
+            self._write_disk(battery_id, plot, fingerprint, text)
+
+    def _store(self, key, fingerprint, text):
+        with self._lock:
+            self._drop(key)
+            if len(text) > self.max_bytes:
+                return
+            self.entries[key] = {'fingerprint': (fingerprint, self.code_version), 'text': text,
+                                 'bytes': len(text)}
+            self.total_bytes += len(text)
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted['bytes']
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry['bytes']
+
+    def _read_disk(self, battery_id, plot, fingerprint):
+        if self.directory is None:
+            return None
+        path = self._path(battery_id, plot, fingerprint)
+        try:
+            text = path.read_text()
+        except OSError:
+            return None
+        # Touch the file so disk eviction sees it as recently used
+        os.utime(path)
+        with self._lock:
+            if self.disk_files is not None and path in self.disk_files:
+                self.disk_files.move_to_end(path)
+        return text
+
+    def _scan_disk(self):
+        """Index the files already on disk, oldest first (done once, on the first write)"""
+        files = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        self.disk_files = OrderedDict((path, size) for _, path, size in sorted(files))
+        self.disk_bytes = sum(self.disk_files.values())
+
+    def _write_disk(self, battery_id, plot, fingerprint, text):
+        path = self._path(battery_id, plot, fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(text)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self.disk_files is None:
+                self._scan_disk()
+            else:
+                self.disk_bytes -= self.disk_files.pop(path, 0)
+                self.disk_files[path] = len(text)
+                self.disk_bytes += len(text)
+            stale = [old for old in path.parent.glob(f"{plot}-*.json") if old != path]
+            for old in stale:
+                self._unlink(old)
+            while self.disk_bytes > self.max_disk_bytes and len(self.disk_files) > 1:
+                self._unlink(next(iter(self.disk_files)))
+                self.evictions += 1
+
+    def _unlink(self, path):
+        self.disk_bytes -= self.disk_files.pop(path, 0)
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def set_budget(self, max_bytes):
+        """Change the RAM budget, evicting immediately if it shrank"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted['bytes']
+                self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current RAM usage"""
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the dashboard figure cache for every battery")
+    parser.add_argument("--metadata", default="cleaned_dataset_battery_NASA/metadata.csv", help="path to metadata.csv")
+    parser.add_argument("--data-dir", default="cleaned_dataset_battery_NASA/data",
+                        help="directory with the per-cycle CSV files")
+    parser.add_argument("--columnar-dir", default="cleaned_dataset_battery_NASA/columnar",
+                        help="Parquet store from convert_nasa_to_parquet.py")
+    parser.add_argument("--metrics-dir", default="cleaned_dataset_battery_NASA/metrics",
+                        help="where the fleet metrics table is persisted")
+    parser.add_argument("--ingest-dir", default="cleaned_dataset_battery_NASA/ingest",
+                        help="cleaned metadata store for incremental ingestion")
+    parser.add_argument("--cache-dir", default=FIGURE_CACHE_DIR, help="figure cache directory")
+    parser.add_argument("--disk-mb", type=float, default=512, help="disk budget of the figure cache")
+    parser.add_argument("--batteries", nargs="*", help="only these battery ids")
+    args = parser.parse_args()
+
+    # Imported here: the dashboard module imports this one
+    from battery_dashboard_filter_battery_v2 import TAB_PLOTS, InteractiveBatteryDashboard
+
+    dashboard = InteractiveBatteryDashboard(args.metadata, args.data_dir, args.columnar_dir,
+                                            metrics_dir=args.metrics_dir, ingest_dir=args.ingest_dir,
+                                            figure_cache_dir=args.cache_dir, figure_cache_disk_mb=args.disk_mb)
+    if not dashboard.load_and_clean_data(precompute_metrics=True):
+        raise SystemExit("Failed to load metadata")
+
+    batteries = args.batteries or dashboard.available_batteries
+    names = [name for names in TAB_PLOTS.values() for name in names]
+    start = time.perf_counter()
+    warmed = 0
+    for battery_id in batteries:
+        if not dashboard.calculate_battery_metrics(battery_id):
+            print(f"⚠️ {battery_id}: no metrics")
+            continue
+        futures = dashboard.prepare_figures(battery_id, names)
+        warmed += sum(future.result() is not None for future in futures.values())
+
+    stats = dashboard.get_figure_cache().stats()
+    print(f"✅ {warmed} figures for {len(batteries)} batteries in {time.perf_counter() - start:.1f}s "
+          f"({stats['disk_hits']} already on disk, {stats['misses']} built) -> {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Battery Figures - NASA Dataset
+Plotly figure builders shared by the Streamlit dashboard and batch reports
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+from battery_analytics import compute_degradation_profile, compute_resistance_correlation, downsample_xy
+
+# I-V curves are drawn for this many leading discharge cycles (readers only load these)
+IV_CURVE_CYCLES = 5
+
+def capacity_degradation_figure(discharge_data, battery_id):
+    """Build the capacity degradation figure with a quadratic trend line"""
+    fig = go.Figure()
+
+    # Add measured capacity
+    fig.add_trace(go.Scatter(
+        x=discharge_data['EFC'],
+        y=discharge_data['Capacity'],
+        mode='lines+markers',
+        name='Measured Capacity',
+        line=dict(color='blue', width=3),
+        marker=dict(size=6)
+    ))
+
+    # Add trend line
+    try:
+        z = np.polyfit(discharge_data['EFC'], discharge_data['Capacity'], 2)
+        p = np.poly1d(z)
+        fig.add_trace(go.Scatter(
+            x=discharge_data['EFC'],
+            y=p(discharge_data['EFC']),
+            mode='lines',
+            name='Trend Line',
+            line=dict(color='red', width=2, dash='dash')
+        ))
+    except:
+        pass
+
+    fig.update_layout(
+        title=f'Capacity Degradation - {battery_id}',
+        xaxis_title='Equivalent Full Cycles (EFC)',
+        yaxis_title='Capacity (Ah)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def soc_dod_figure(discharge_data, battery_id):
+    """Build the SOC and DOD evolution figure"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=discharge_data['EFC'],
+        y=discharge_data['SOC'],
+        mode='lines+markers',
+        name='SOC (%)',
+        line=dict(color='green', width=3)
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=discharge_data['EFC'],
+        y=discharge_data['DOD'],
+        mode='lines+markers',
+        name='DOD (%)',
+        line=dict(color='orange', width=3)
+    ))
+
+    fig.update_layout(
+        title=f'SOC & DOD Evolution - {battery_id}',
+        xaxis_title='Equivalent Full Cycles (EFC)',
+        yaxis_title='Percentage (%)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def throughput_figure(discharge_data, battery_id):
+    """Build the cumulative throughput figure"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=discharge_data['EFC'],
+        y=discharge_data['Throughput'],
+        mode='lines+markers',
+        line=dict(color='green', width=3),
+        marker=dict(size=6)
+    ))
+
+    fig.update_layout(
+        title=f'Cumulative Throughput - {battery_id}',
+        xaxis_title='Equivalent Full Cycles (EFC)',
+        yaxis_title='Cumulative Throughput (Ah)',
+        height=400
+    )
+    return fig
+
+
+def impedance_parameters_figure(impedance_data, battery_id):
+    """Build the Re / Rct / total resistance figure"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=impedance_data.index,
+        y=impedance_data['Re'],
+        mode='lines+markers',
+        name='Re (Electrolyte)',
+        line=dict(color='blue', width=3)
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=impedance_data.index,
+        y=impedance_data['Rct'],
+        mode='lines+markers',
+        name='Rct (Charge Transfer)',
+        line=dict(color='red', width=3)
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=impedance_data.index,
+        y=impedance_data['Total_Resistance'],
+        mode='lines+markers',
+        name='Total',
+        line=dict(color='green', width=3)
+    ))
+
+    fig.update_layout(
+        title=f'Impedance Parameters - {battery_id}',
+        xaxis_title='Impedance Measurements',
+        yaxis_title='Resistance (Ω)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def resistance_increase_figure(impedance_data, battery_id):
+    """Build the cumulative resistance increase figure"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=impedance_data.index,
+        y=impedance_data['Resistance_Increase'],
+        mode='lines+markers',
+        line=dict(color='red', width=3),
+        marker=dict(size=6)
+    ))
+
+    fig.update_layout(
+        title=f'Cumulative Resistance Increase - {battery_id}',
+        xaxis_title='Impedance Measurements',
+        yaxis_title='Resistance Increase (%)',
+        height=400
+    )
+    return fig
+
+
+def capacity_vs_resistance_figure(aligned, battery_id, correlation=None):
+    """Build the capacity vs resistance scatter
+
+    aligned is the battery's discharge table with the resistance aligned to
+    each cycle (align_impedance_to_discharge); correlation is its row of
+    compute_resistance_correlation and is computed here when not passed in.
+    Returns (fig, r_squared); r_squared is None when no trend can be fitted.
+    """
+    aligned = aligned[aligned['Total_Resistance'].notna()]
+    if correlation is None:
+        table = compute_resistance_correlation(aligned.assign(battery_id=battery_id))
+        correlation = table.iloc[0] if len(table) > 0 else None
+    resistance = aligned['Total_Resistance']
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=resistance,
+        y=aligned['Capacity'],
+        mode='markers',
+        marker=dict(size=8, color='purple', opacity=0.7),
+        customdata=aligned['EFC'] if 'EFC' in aligned.columns else None,
+        hovertemplate='Resistance: %{x:.4f}Ω<br>Capacity: %{y:.3f}Ah<br>EFC: %{customdata}',
+        name='Capacity vs Resistance'
+    ))
+
+    # Add trend line
+    r_squared = None
+    if correlation is not None and np.isfinite(correlation['r_squared']):
+        r_squared = correlation['r_squared']
+        fig.add_trace(go.Scatter(
+            x=resistance,
+            y=correlation['intercept'] + correlation['slope'] * resistance,
+            mode='lines',
+            line=dict(color='red', width=2, dash='dash'),
+            name='Trend Line'
+        ))
+
+        fig.add_annotation(
+            x=0.05, y=0.95,
+            xref='paper', yref='paper',
+            text=f'R² = {r_squared:.3f}',
+            showarrow=False,
+            bgcolor='white',
+            bordercolor='black',
+            borderwidth=1
+        )
+
+    fig.update_layout(
+        title=f'Capacity vs Resistance - {battery_id}',
+        xaxis_title='Total Resistance at cycle (Ω)',
+        yaxis_title='Capacity (Ah)',
+        height=400,
+        showlegend=True
+    )
+    return fig, r_squared
+
+
+def capacity_retention_figure(discharge_data, battery_id, profile=None):
+    """Build the capacity retention figure with the 70% EOL threshold and knee point
+
+    Returns (fig, retention, peak_capacity).
+    """
+    if profile is None:
+        profile = compute_degradation_profile(discharge_data)
+    peak_capacity = profile['peak_capacity']
+    energy_efficiency = profile['retention']
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=discharge_data['EFC'],
+        y=energy_efficiency,
+        mode='lines+markers',
+        line=dict(color='orange', width=3),
+        marker=dict(size=6),
+        name='Energy Efficiency'
+    ))
+
+    # Add EOL threshold
+    fig.add_hline(y=70, line_dash="dash", line_color="red",
+                 annotation_text="EOL Threshold (70%)")
+
+    if profile['knee_index'] is not None:
+        fig.add_vline(x=profile['knee_efc'], line_dash="dot", line_color="gray",
+                      annotation_text=f"Knee (EFC {profile['knee_efc']})")
+
+    fig.update_layout(
+        title=f'Capacity Retention - {battery_id} (Peak: {peak_capacity:.2f} Ah)',
+        xaxis_title='Equivalent Full Cycles (EFC)',
+        yaxis_title='Capacity Retention (%)',
+        height=400,
+        showlegend=True
+    )
+    return fig, energy_efficiency, peak_capacity
+
+
+def degradation_rate_figure(discharge_data, battery_id, profile=None):
+    """Build the per-cycle degradation rate figure with rolling and EWMA trends
+
+    Returns (fig, degradation_rates); fig is None with fewer than two cycles.
+    """
+    if profile is None:
+        profile = compute_degradation_profile(discharge_data)
+    efc_for_rates = profile['rate_efc']
+    degradation_rates = profile['rates']
+    if len(degradation_rates) == 0:
+        return None, degradation_rates
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=efc_for_rates,
+        y=degradation_rates,
+        mode='lines+markers',
+        line=dict(color='red', width=1),
+        marker=dict(size=4),
+        opacity=0.5,
+        name='Per-cycle rate'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=efc_for_rates,
+        y=profile['rolling_rate'],
+        mode='lines',
+        line=dict(color='darkred', width=3),
+        name=f"Rolling mean ({profile['window']} cycles)"
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=efc_for_rates,
+        y=profile['ewma_rate'],
+        mode='lines',
+        line=dict(color='blue', width=2, dash='dash'),
+        name=f"EWMA (span {profile['span']})"
+    ))
+
+    fig.add_hline(y=0, line_dash="solid", line_color="black", opacity=0.5)
+
+    if profile['knee_index'] is not None:
+        fig.add_vline(x=profile['knee_efc'], line_dash="dot", line_color="gray", annotation_text="Knee")
+
+    fig.update_layout(
+        title=f'Per-Cycle Degradation Rate - {battery_id}',
+        xaxis_title='Equivalent Full Cycles (EFC)',
+        yaxis_title='Degradation Rate (%/cycle)',
+        height=400
+    )
+    return fig, degradation_rates
+
+
+def iv_curves_figure(detailed_data, battery_id, max_points=None, max_cycles=IV_CURVE_CYCLES):
+    """Build I-V curves for the first max_cycles discharge cycles"""
+    # Get unique test cycles (limit to the first few for clarity)
+    unique_tests = sorted(detailed_data['uid'].unique())[:max_cycles]
+
+    fig = go.Figure()
+
+    colors = ['blue', 'red', 'green', 'orange', 'purple']
+
+    for i, test_id in enumerate(unique_tests):
+        test_data = detailed_data[detailed_data['uid'] == test_id]
+
+        # Clean data
+        test_data = test_data.dropna(subset=['Voltage_measured', 'Current_measured'])
+        test_data = test_data[test_data['Current_measured'] < 0]  # Only discharge current
+
+        if len(test_data) > 10:  # Need enough points for meaningful curve
+            # Use absolute current and keep the curve shape with fewer points
+            current, voltage = downsample_xy(abs(test_data['Current_measured']),
+                                             test_data['Voltage_measured'],
+                                             max_points)
+            fig.add_trace(go.Scatter(
+                x=current,
+                y=voltage,
+                mode='lines',
+                name=f'Cycle {test_id}',
+                line=dict(color=colors[i % len(colors)], width=2),
+                hovertemplate='Current: %{x:.3f}A<br>Voltage: %{y:.3f}V<br>Cycle: ' + str(test_id)
+            ))
+
+    fig.update_layout(
+        title=f'I-V Curves (Voltage vs Current) - {battery_id}',
+        xaxis_title='Current (A)',
+        yaxis_title='Voltage (V)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def real_energy_efficiency_figure(efficiency_table, battery_id, max_points=None):
+    """Build the per-cycle real energy efficiency figure from a valid-cycle table"""
+    fig = go.Figure()
+
+    plot_numbers, plot_efficiencies = downsample_xy(efficiency_table['uid'], efficiency_table['efficiency'],
+                                                    max_points)
+    fig.add_trace(go.Scatter(
+        x=plot_numbers,
+        y=plot_efficiencies,
+        mode='lines+markers',
+        line=dict(color='purple', width=3),
+        marker=dict(size=8),
+        name='Real Energy Efficiency'
+    ))
+
+    # Add 100% reference line
+    fig.add_hline(y=100, line_dash="dash", line_color="green",
+                 annotation_text="100% Efficiency")
+
+    fig.update_layout(
+        title=f'Real Energy Efficiency - {battery_id}',
+        xaxis_title='Test Cycle',
+        yaxis_title='Energy Efficiency (%)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def thermal_figures(temp_data, battery_id, max_points=None):
+    """Build the Temperature vs Time and Temperature vs Voltage figures"""
+    # Plot 1: Temperature vs Time (LTTB keeps the line shape)
+    fig1 = go.Figure()
+    time_values, time_temps = downsample_xy(temp_data['Time'], temp_data['Temperature_measured'], max_points)
+    fig1.add_trace(
+        go.Scatter(
+            x=time_values,
+            y=time_temps,
+            mode='lines',
+            name='Temperature',
+            line=dict(color='red', width=2)
+        )
+    )
+    fig1.update_layout(
+        title=f'Temperature vs Time - {battery_id}',
+        xaxis_title="Time (s)",
+        yaxis_title="Temperature (°C)",
+        height=400,
+        showlegend=True
+    )
+
+    # Plot 2: Temperature vs Voltage (min/max buckets keep the scatter envelope)
+    fig2 = go.Figure()
+    voltage_values, voltage_temps = downsample_xy(temp_data['Voltage_measured'], temp_data['Temperature_measured'],
+                                                  max_points, method='minmax')
+    fig2.add_trace(
+        go.Scatter(
+            x=voltage_values,
+            y=voltage_temps,
+            mode='markers',
+            name='T vs V',
+            marker=dict(color='blue', size=4, opacity=0.6)
+        )
+    )
+    fig2.update_layout(
+        title=f'Temperature vs Voltage - {battery_id}',
+        xaxis_title="Voltage (V)",
+        yaxis_title="Temperature (°C)",
+        height=400,
+        showlegend=True
+    )
+    return fig1, fig2
+
+
+def thermal_trend_figure(cycle_stats, battery_id):
+    """Build the per-cycle temperature trend (mean with min-max band)"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=cycle_stats['uid'],
+        y=cycle_stats['max_temperature'],
+        mode='lines',
+        line=dict(color='rgba(255, 0, 0, 0.3)', width=1),
+        name='Max'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=cycle_stats['uid'],
+        y=cycle_stats['min_temperature'],
+        mode='lines',
+        line=dict(color='rgba(0, 0, 255, 0.3)', width=1),
+        fill='tonexty',
+        fillcolor='rgba(255, 165, 0, 0.15)',
+        name='Min'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=cycle_stats['uid'],
+        y=cycle_stats['mean_temperature'],
+        mode='lines+markers',
+        line=dict(color='orange', width=3),
+        marker=dict(size=5),
+        name='Mean'
+    ))
+
+    fig.update_layout(
+        title=f'Per-Cycle Thermal Trend - {battery_id}',
+        xaxis_title='Test Cycle',
+        yaxis_title='Temperature (°C)',
+        height=400,
+        showlegend=True
+    )
+    return fig
+
+
+def fleet_overlay_figure(curves, x, y, title, xaxis_title, yaxis_title):
+    """Overlay one line per battery from a long-form curves frame"""
+    fig = go.Figure()
+
+    for battery_id, group in curves.groupby('battery_id', sort=True, observed=True):
+        fig.add_trace(go.Scatter(
+            x=group[x],
+            y=group[y],
+            mode='lines',
+            name=battery_id,
+            hovertemplate=f'{battery_id}<br>{xaxis_title}: %{{x}}<br>{yaxis_title}: %{{y:.2f}}'
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        height=500,
+        showlegend=True
+    )
+    return fig
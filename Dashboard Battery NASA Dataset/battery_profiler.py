@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Battery Profiler - NASA Dataset
+Per-stage timing instrumentation for the dashboard: wall time, bytes read,
+rows processed and figure JSON size, exportable as a Chrome/Perfetto trace
+"""
+
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+COUNTERS = ['bytes_read', 'rows', 'figures', 'figure_bytes', 'figure_points', 'figure_json_ms']
+
+
+class DashboardProfiler:
+    """Record nested stages and the work done inside them
+
+    Counters added while stages are open are credited to every open stage,
+    so each stage's numbers include its nested stages (a plot includes the
+    file reads it triggered). Open stages are tracked per thread, so stages
+    run in worker threads nest only within their own thread and show up as
+    separate lanes in the trace. A disabled profiler records nothing and
+    adds no overhead beyond one attribute check.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def _open(self):
+        """Stages currently open in the calling thread"""
+        if not hasattr(self._local, 'open'):
+            self._local.open = []
+        return self._local.open
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Time the enclosed block; yields the stage record (None when disabled)"""
+        if not self.enabled:
+            yield None
+            return
+        open_stages = self._open
+        record = {'name': name, 'labels': labels, 'depth': len(open_stages),
+                  'thread': threading.current_thread().name, 'start': time.perf_counter() - self.origin}
+        record.update({counter: 0 for counter in COUNTERS})
+        open_stages.append(record)
+        try:
+            yield record
+        finally:
+            open_stages.pop()
+            record['seconds'] = time.perf_counter() - self.origin - record['start']
+            with self._lock:
+                self.records.append(record)
+
+    def add(self, counter, amount):
+        for record in self._open:
+            record[counter] += amount
+
+    def add_bytes(self, amount):
+        if self.enabled:
+            self.add('bytes_read', int(amount))
+
+    def add_file_bytes(self, paths):
+        """Credit the on-disk size of the files just read"""
+        if self.enabled:
+            self.add('bytes_read', sum(os.path.getsize(path) for path in paths if os.path.exists(path)))
+
+    def add_rows(self, rows):
+        if self.enabled:
+            self.add('rows', int(rows))
+
+    def add_figure(self, fig):
+        """Credit one figure with its serialized JSON size and point count
+
+        The figure is serialized once more just for measuring, so this only
+        runs when profiling is on.
+        """
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        size = len(fig.to_json())
+        self.add('figure_json_ms', (time.perf_counter() - start) * 1000)
+        self.add('figures', 1)
+        self.add('figure_bytes', size)
+        self.add('figure_points', sum(len(trace.x) for trace in fig.data if getattr(trace, 'x', None) is not None))
+
+    def summary(self):
+        """One row per stage name: calls, total/max wall time and summed counters"""
+        if not self.records:
+            return pd.DataFrame(columns=['stage', 'calls', 'total_ms', 'max_ms'] + COUNTERS)
+        records = pd.DataFrame(self.records)
+        records['ms'] = records['seconds'] * 1000
+        grouped = records.groupby('name', sort=False)
+        summary = grouped[COUNTERS].sum()
+        summary.insert(0, 'max_ms', grouped['ms'].max())
+        summary.insert(0, 'total_ms', grouped['ms'].sum())
+        summary.insert(0, 'calls', grouped.size())
+        summary.index.name = 'stage'
+        return summary.sort_values('total_ms', ascending=False).reset_index()
+
+    def totals(self):
+        """Counters summed over the outermost stages only, so nothing is counted twice
+
+        Wall time is the union of those stages' intervals, so stages that ran
+        concurrently in worker threads are not added up.
+        """
+        outer = sorted((record for record in self.records if record['depth'] == 0), key=lambda r: r['start'])
+        totals = {counter: sum(record[counter] for record in outer) for counter in COUNTERS}
+        wall, covered_until = 0.0, 0.0
+        for record in outer:
+            end = record['start'] + record['seconds']
+            if end > covered_until:
+                wall += end - max(record['start'], covered_until)
+                covered_until = end
+        totals['ms'] = wall * 1000
+        return totals
+
+    def to_trace(self):
+        """Chrome trace event format (load in chrome://tracing or ui.perfetto.dev)"""
+        events = []
+        thread_ids = {}
+        for record in sorted(self.records, key=lambda r: r['start']):
+            args = dict(record['labels'])
+            args.update({counter: record[counter] for counter in COUNTERS})
+            events.append({
+                'name': record['name'],
+                'cat': 'dashboard',
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['seconds'] * 1e6,
+                'pid': os.getpid(),
+                'tid': thread_ids.setdefault(record['thread'], len(thread_ids)),
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def profiled(method):
+    """Run a dashboard method inside a profiler stage named after it
+
+    The first positional argument (the battery id for per-battery methods)
+    is kept as a label, and a returned DataFrame counts as rows processed
+    unless nested stages already counted the rows that produced it.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        labels = {'battery_id': args[0]} if args and isinstance(args[0], str) else {}
+        with profiler.stage(method.__name__, **labels) as record:
+            result = method(self, *args, **kwargs)
+            if isinstance(result, pd.DataFrame) and record['rows'] == 0:
+                profiler.add_rows(len(result))
+        return result
+    return wrapper
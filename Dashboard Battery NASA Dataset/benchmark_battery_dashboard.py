@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Battery Dashboard Benchmark - NASA Dataset
+Generates a synthetic NASA-shaped dataset at a configurable scale and times
+each data path of the dashboard, tracking peak memory, with a JSON report
+"""
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from battery_analytics import ENERGY_EFFICIENCY_COLUMNS, StreamingThermalStats, compute_energy_efficiency
+from battery_dashboard_filter_battery_v2 import InteractiveBatteryDashboard
+from battery_data_store import ingest_metadata, memory_report
+from battery_figures import (capacity_degradation_figure, capacity_retention_figure, capacity_vs_resistance_figure,
+                             degradation_rate_figure, impedance_parameters_figure, iv_curves_figure,
+                             real_energy_efficiency_figure, resistance_increase_figure, soc_dod_figure,
+                             thermal_figures, thermal_trend_figure, throughput_figure)
+warnings.filterwarnings('ignore')
+
+# The dashboard runs in Streamlit "bare mode" here; silence its context warnings
+for logger_name in list(logging.root.manager.loggerDict):
+    if logger_name.startswith('streamlit'):
+        logging.getLogger(logger_name).setLevel(logging.ERROR)
+
+
+def generate_synthetic_dataset(root, n_batteries=10, cycles_per_battery=50, samples_per_cycle=300,
+                               detail_batteries=None, seed=0):
+    """Write metadata.csv and per-cycle CSVs shaped like the NASA dataset
+
+    Every battery gets cycles_per_battery charge/discharge/impedance triples in
+    metadata.csv. Per-cycle files are only written for the first
+    detail_batteries batteries (all by default) so fleet-scale metadata can be
+    benchmarked without writing millions of files.
+    """
+    rng = np.random.default_rng(seed)
+    root = Path(root)
+    data_dir = root / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    detail_batteries = n_batteries if detail_batteries is None else detail_batteries
+
+    n_tests = cycles_per_battery * 3
+    battery_ids = np.repeat([f"B{i + 1:05d}" for i in range(n_batteries)], n_tests)
+    test_ids = np.tile(np.arange(n_tests), n_batteries)
+    uids = np.arange(1, n_batteries * n_tests + 1)
+    types = np.tile(np.array(['charge', 'discharge', 'impedance']), n_batteries * cycles_per_battery)
+    cycle = test_ids // 3
+
+    # Capacity fades roughly linearly per battery, resistance grows
+    fade_rate = np.repeat(rng.uniform(0.0005, 0.004, n_batteries), n_tests)
+    capacity = 2.0 * (1 - fade_rate * cycle) + rng.normal(0, 0.01, len(uids))
+    re = 0.05 * (1 + fade_rate * cycle) + rng.normal(0, 0.001, len(uids))
+    rct = 0.08 * (1 + 2 * fade_rate * cycle) + rng.normal(0, 0.002, len(uids))
+
+    metadata = pd.DataFrame({
+        'type': types,
+        'start_time': [f"[2010. 7. 21. 15. 0. {c % 60}.]" for c in cycle],
+        'ambient_temperature': 24,
+        'battery_id': battery_ids,
+        'test_id': test_ids,
+        'uid': uids,
+        'filename': [f"{uid:05d}.csv" for uid in uids],
+        'Capacity': np.where(types == 'discharge', capacity, np.nan),
+        'Re': np.where(types == 'impedance', re, np.nan),
+        'Rct': np.where(types == 'impedance', rct, np.nan),
+    })
+    metadata.to_csv(root / "metadata.csv", index=False)
+
+    n = samples_per_cycle
+    detail_meta = metadata[metadata['battery_id'].isin(metadata['battery_id'].unique()[:detail_batteries])]
+    for row in detail_meta.itertuples(index=False):
+        time_values = np.cumsum(rng.uniform(5, 15, n))
+        if row.type == 'discharge':
+            df = pd.DataFrame({
+                'Voltage_measured': np.linspace(4.2, 2.7, n) + rng.normal(0, 0.01, n),
+                'Current_measured': -2 + rng.normal(0, 0.01, n),
+                'Temperature_measured': 24 + np.linspace(0, 10, n) + rng.normal(0, 0.2, n),
+                'Current_load': 2 + rng.normal(0, 0.01, n),
+                'Voltage_load': np.linspace(3.0, 2.0, n),
+                'Time': time_values,
+            })
+        elif row.type == 'charge':
+            df = pd.DataFrame({
+                'Voltage_measured': np.linspace(3.5, 4.2, n),
+                'Current_measured': 1.5 + rng.normal(0, 0.01, n),
+                'Temperature_measured': 24 + rng.normal(0, 0.5, n),
+                'Current_charge': np.full(n, 1.5),
+                'Voltage_charge': np.full(n, 4.2),
+                'Time': time_values,
+            })
+        else:
+            df = pd.DataFrame({
+                'Sense_current': ['(1+1j)'] * n,
+                'Battery_current': ['(1+0j)'] * n,
+                'Current_ratio': ['(1+0j)'] * n,
+                'Battery_impedance': ['(0.1+0j)'] * n,
+            })
+        df.to_csv(data_dir / row.filename, index=False)
+
+    return root / "metadata.csv", data_dir
+
+
+class StageTimer:
+    """Collect wall time and peak traced memory for named stages"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def measure(self, name, func, *args, **kwargs):
+        """Run func, record its timing and return its result"""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        stage = {'name': name, 'seconds': elapsed}
+        if self.trace_memory:
+            stage['peak_mb'] = (tracemalloc.get_traced_memory()[1] - baseline) / 1024 ** 2
+        if isinstance(result, pd.DataFrame):
+            stage['rows'] = len(result)
+        self.stages.append(stage)
+        return result
+
+
+def build_all_figures(dashboard, battery_id, detailed_data):
+    """Build every dashboard figure for one battery and serialize it to JSON"""
+    discharge = dashboard.battery_data.get('discharge')
+    impedance = dashboard.battery_data.get('impedance')
+    figures = []
+    if discharge is not None:
+        figures += [capacity_degradation_figure(discharge, battery_id), soc_dod_figure(discharge, battery_id),
+                    throughput_figure(discharge, battery_id)]
+        profile = dashboard.get_degradation_profile()
+        figures.append(capacity_retention_figure(discharge, battery_id, profile)[0])
+        rate_fig = degradation_rate_figure(discharge, battery_id, profile)[0]
+        if rate_fig is not None:
+            figures.append(rate_fig)
+    if impedance is not None:
+        figures += [impedance_parameters_figure(impedance, battery_id),
+                    resistance_increase_figure(impedance, battery_id)]
+        if discharge is not None:
+            # calculate_battery_metrics already aligned the resistance to each discharge cycle
+            figures.append(capacity_vs_resistance_figure(discharge, battery_id, dashboard.battery_correlation)[0])
+    if detailed_data is not None:
+        max_points = dashboard.max_points_per_trace
+        figures.append(iv_curves_figure(detailed_data, battery_id, max_points))
+        efficiency_table = compute_energy_efficiency(detailed_data).dropna(subset=['efficiency'])
+        if len(efficiency_table) > 0:
+            figures.append(real_energy_efficiency_figure(efficiency_table, battery_id, max_points))
+        thermal = StreamingThermalStats(max_points)
+        thermal.update(detailed_data)
+        thermal_stats = thermal.result()
+        figures += list(thermal_figures(thermal_stats['sample'], battery_id, max_points))
+        figures.append(thermal_trend_figure(thermal_stats['cycles'], battery_id))
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+def run_benchmark(n_batteries, cycles_per_battery, samples_per_cycle, detail_batteries, sample_batteries,
+                  workdir, trace_memory=True, io_workers=None, seed=0):
+    """Generate a dataset, time every stage and return the report dict"""
+    report = {
+        'params': {
+            'n_batteries': n_batteries,
+            'cycles_per_battery': cycles_per_battery,
+            'samples_per_cycle': samples_per_cycle,
+            'detail_batteries': detail_batteries,
+            'sample_batteries': sample_batteries,
+            'io_workers': io_workers,
+        },
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+    }
+
+    start = time.perf_counter()
+    metadata_path, data_dir = generate_synthetic_dataset(workdir, n_batteries, cycles_per_battery,
+                                                         samples_per_cycle, detail_batteries, seed)
+    report['generate_seconds'] = time.perf_counter() - start
+
+    if trace_memory:
+        tracemalloc.start()
+    timer = StageTimer(trace_memory)
+
+    dashboard = InteractiveBatteryDashboard(str(metadata_path), str(data_dir), io_workers=io_workers)
+    timer.measure('load_and_clean_data', dashboard.load_and_clean_data)
+    timer.measure('build_fleet_metrics', dashboard.build_fleet_metrics)
+
+    # Incremental ingest: the first call cleans everything, a warm call finds no delta
+    ingest_dir = Path(workdir) / "ingest"
+    timer.measure('ingest_metadata[full]', ingest_metadata, metadata_path, ingest_dir)
+    timer.measure('ingest_metadata[no_delta]', ingest_metadata, metadata_path, ingest_dir)
+
+    batteries = dashboard.available_batteries[:sample_batteries]
+    detail_ids = set(dashboard.available_batteries[:detail_batteries])
+
+    # Footprint of the compact schema against the float64/int64/string frames it replaces
+    report['memory'] = {'metadata': memory_report(dashboard.metadata).loc['total', ['mb_before', 'mb_after']].to_dict()}
+
+    fleet_metrics = dashboard.fleet_metrics
+    for battery_id in batteries:
+        dashboard.fleet_metrics = None
+        timer.measure('calculate_battery_metrics[recompute]', dashboard.calculate_battery_metrics, battery_id)
+        dashboard.fleet_metrics = fleet_metrics
+        timer.measure('calculate_battery_metrics[fleet_lookup]', dashboard.calculate_battery_metrics, battery_id)
+
+        detailed_data = None
+        if battery_id in detail_ids:
+            columns = sorted(set(ENERGY_EFFICIENCY_COLUMNS + ['Temperature_measured']))
+            dashboard.get_detail_cache().clear()
+            detailed_data = timer.measure('load_individual_csv_files[cold]', dashboard.load_individual_csv_files,
+                                          battery_id, 'discharge', columns=columns)
+            timer.measure('load_individual_csv_files[cached]', dashboard.load_individual_csv_files,
+                          battery_id, 'discharge', columns=columns)
+            if detailed_data is not None:
+                timer.measure('compute_energy_efficiency', compute_energy_efficiency, detailed_data)
+                report['memory'].setdefault('detail_per_battery', []).append(
+                    memory_report(detailed_data).loc['total', ['mb_before', 'mb_after']].to_dict())
+
+        figure_bytes = timer.measure('figure_preparation', build_all_figures, dashboard, battery_id, detailed_data)
+        timer.stages[-1]['figure_json_bytes'] = figure_bytes
+
+    if trace_memory:
+        tracemalloc.stop()
+
+    report['stages'] = timer.stages
+    report['summary'] = summarize_stages(timer.stages)
+    return report
+
+
+def summarize_stages(stages):
+    """Aggregate repeated stages into count/mean/max (seconds and peak memory)"""
+    frame = pd.DataFrame(stages)
+    aggregations = {'seconds': ['count', 'mean', 'max']}
+    if 'peak_mb' in frame.columns:
+        aggregations['peak_mb'] = ['max']
+    summary = frame.groupby('name', sort=False).agg(aggregations)
+    summary.columns = ['_'.join(column) for column in summary.columns]
+    return summary.reset_index().to_dict(orient='records')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the battery dashboard data paths on synthetic data")
+    parser.add_argument("--batteries", type=int, default=10, help="number of synthetic batteries (10 to 10000)")
+    parser.add_argument("--cycles", type=int, default=50, help="charge/discharge/impedance triples per battery")
+    parser.add_argument("--samples", type=int, default=300, help="samples per per-cycle CSV")
+    parser.add_argument("--detail-batteries", type=int, default=3,
+                        help="batteries that get per-cycle CSV files (metadata covers all)")
+    parser.add_argument("--sample-batteries", type=int, default=3, help="batteries timed individually")
+    parser.add_argument("--io-workers", type=int, default=None, help="worker pool size for detail loading")
+    parser.add_argument("--workdir", default=None, help="where to write the dataset (default: temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated dataset")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (lower overhead)")
+    parser.add_argument("--report", default="benchmark_report.json", help="JSON report path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🔋 Battery Dashboard Benchmark")
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="battery_bench_"))
+    try:
+        report = run_benchmark(args.batteries, args.cycles, args.samples, args.detail_batteries,
+                               args.sample_batteries, workdir, trace_memory=not args.no_memory,
+                               io_workers=args.io_workers, seed=args.seed)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    Path(args.report).write_text(json.dumps(report, indent=2, default=float))
+
+    print(f"📦 Dataset generated in {report['generate_seconds']:.1f}s")
+    memory = report['memory']['metadata']
+    print(f"   metadata footprint {memory['mb_before']:.1f} MB -> {memory['mb_after']:.1f} MB")
+    for memory in report['memory'].get('detail_per_battery', [])[:1]:
+        print(f"   detail frame per battery {memory['mb_before']:.1f} MB -> {memory['mb_after']:.1f} MB")
+    for stage in report['summary']:
+        line = f"   {stage['name']:<42} mean {stage['seconds_mean'] * 1000:9.1f} ms"
+        if 'peak_mb_max' in stage:
+            line += f"   peak {stage['peak_mb_max']:8.1f} MB"
+        print(line)
+    print(f"✅ Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
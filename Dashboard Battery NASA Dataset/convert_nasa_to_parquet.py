@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+NASA Battery Dataset - Columnar Converter
+Converts the per-cycle CSV files into a Parquet store partitioned by
+battery_id/type/uid so the dashboard can read only the columns it needs.
+With --timeseries the numeric detail columns are also packed into
+memory-mapped .npy arrays per battery/type
+"""
+
+import sys
+import pandas as pd
+from pathlib import Path
+
+from battery_data_store import build_columnar_store, build_timeseries_store
+
+METADATA_PATH = "cleaned_dataset_battery_NASA/metadata.csv"
+DATA_DIR = "cleaned_dataset_battery_NASA/data"
+STORE_DIR = "cleaned_dataset_battery_NASA/columnar"
+TIMESERIES_DIR = "cleaned_dataset_battery_NASA/timeseries"
+
+
+def main():
+    print("🔋 NASA Battery Dataset - Columnar Converter")
+
+    if not Path(METADATA_PATH).exists():
+        print("❌ metadata.csv not found - run download_nasa_data.py first")
+        return
+
+    overwrite = "--overwrite" in sys.argv[1:]
+    timeseries = "--timeseries" in sys.argv[1:]
+
+    metadata = pd.read_csv(METADATA_PATH, usecols=['type', 'battery_id', 'test_id', 'uid', 'filename'])
+    metadata = metadata.dropna(subset=['type', 'battery_id', 'filename'])
+
+    print(f"📦 Converting {len(metadata)} cycle files to {STORE_DIR}...")
+    converted, skipped, failed = build_columnar_store(metadata, DATA_DIR, STORE_DIR, overwrite=overwrite)
+
+    print(f"✅ Converted: {converted}, already up to date: {skipped}")
+    if failed:
+        print(f"⚠️ {len(failed)} files could not be converted (the dashboard will keep reading their CSVs):")
+        for filename, error in failed[:10]:
+            print(f"   {filename}: {error}")
+
+    if timeseries:
+        print(f"📦 Packing time-series arrays to {TIMESERIES_DIR}...")
+        converted, skipped, failed = build_timeseries_store(metadata, DATA_DIR, TIMESERIES_DIR,
+                                                            overwrite=overwrite, columnar_dir=STORE_DIR)
+        print(f"✅ Partitions packed: {converted}, already up to date: {skipped}")
+        if failed:
+            print(f"⚠️ {len(failed)} cycles could not be packed (the dashboard will read their files):")
+            for filename, error in failed[:10]:
+                print(f"   {filename}: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The dashboard modules are flat scripts next to this folder, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,91 @@
+"""LTTB and min/max downsampling against straightforward per-bucket loops"""
+
+import numpy as np
+import pytest
+
+from battery_analytics import downsample_xy, lttb_indices, minmax_indices
+
+
+def reference_lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets as published (Steinarsson 2013), one bucket at a time"""
+    n = len(y)
+    every = (n - 2) / (n_out - 2)
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_stop = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = np.mean(x[avg_start:avg_stop])
+        avg_y = np.mean(y[avg_start:avg_stop])
+
+        best_area, best = -1.0, None
+        for j in range(int(np.floor(i * every)) + 1, int(np.floor((i + 1) * every)) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) * 0.5
+            if area > best_area:
+                best_area, best = area, j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def reference_minmax(y, n_out):
+    """Indices of the first minimum and last maximum of every bucket"""
+    n = len(y)
+    n_buckets = n_out // 2
+    picks = set()
+    for bucket in range(n_buckets):
+        rows = np.array([i for i in range(n) if i * n_buckets // n == bucket])
+        if len(rows) == 0:
+            continue
+        values = y[rows]
+        picks.add(rows[np.flatnonzero(values == values.min())[0]])
+        picks.add(rows[np.flatnonzero(values == values.max())[-1]])
+    return np.array(sorted(picks))
+
+
+def make_trace(seed, n):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.1, 2.0, n))
+    y = np.sin(x / 15) + rng.normal(0, 0.2, n)
+    y[rng.integers(0, n, 5)] += 3
+    return x, y
+
+
+@pytest.mark.parametrize('n, n_out', [(1000, 100), (1000, 3), (997, 250), (50, 49), (5000, 2000)])
+def test_lttb_matches_reference(n, n_out):
+    x, y = make_trace(n, n)
+    np.testing.assert_array_equal(lttb_indices(x, y, n_out), reference_lttb(x, y, n_out))
+
+
+@pytest.mark.parametrize('n, n_out', [(1000, 100), (1000, 2), (997, 251), (50, 49)])
+def test_minmax_matches_reference(n, n_out):
+    _, y = make_trace(n + 1, n)
+    np.testing.assert_array_equal(minmax_indices(y, n_out), reference_minmax(y, n_out))
+
+
+def test_minmax_keeps_duplicates_extremes_in_order():
+    y = np.array([1.0, 0.0, 0.0, 2.0, 2.0, 1.0, 5.0, 5.0])
+    np.testing.assert_array_equal(minmax_indices(y, 4), reference_minmax(y, 4))
+
+
+def test_short_traces_are_returned_whole():
+    x, y = make_trace(0, 10)
+    np.testing.assert_array_equal(lttb_indices(x, y, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, y, 2), np.arange(10))
+    np.testing.assert_array_equal(minmax_indices(y, 1), np.arange(10))
+    out_x, out_y = downsample_xy(x, y, 20)
+    np.testing.assert_array_equal(out_x, x)
+    np.testing.assert_array_equal(out_y, y)
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_keeps_extremes_within_budget(method):
+    x, y = make_trace(3, 20000)
+    out_x, out_y = downsample_xy(x, y, 500, method=method)
+    assert len(out_y) <= 500
+    assert np.all(np.diff(out_x) > 0)
+    if method == 'minmax':
+        assert out_y.max() == y.max() and out_y.min() == y.min()
+    else:
+        assert out_x[0] == x[0] and out_x[-1] == x[-1]
@@ -0,0 +1,124 @@
+"""Vectorized and streaming energy efficiency against the original per-cycle loop"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import StreamingEnergyEfficiency, compute_energy_efficiency
+
+
+def reference_efficiency(detailed_data):
+    """The per-uid loop the dashboard used before compute_energy_efficiency, as {uid: efficiency}"""
+    efficiencies = {}
+    for uid in sorted(detailed_data['uid'].unique()):
+        test_data = detailed_data[detailed_data['uid'] == uid].copy()
+        # Stable sort, so duplicate timestamps keep their file order
+        test_data = test_data.sort_values('Time', kind='mergesort').reset_index(drop=True)
+        test_data['dt'] = test_data['Time'].diff().fillna(0)
+        test_data = test_data[test_data['dt'] > 0].copy()
+        if len(test_data) == 0:
+            continue
+        energy_supplied = (test_data['Voltage_load'] * test_data['Current_load'] * test_data['dt']).sum()
+        energy_received = (test_data['Voltage_measured'] * abs(test_data['Current_measured']) * test_data['dt']).sum()
+        if energy_received > 0 and energy_supplied > 0:
+            efficiency = (energy_supplied / energy_received) * 100
+            if 0 <= efficiency <= 200:
+                efficiencies[uid] = efficiency
+    return efficiencies
+
+
+def make_cycles(seed, n_cycles=40, max_samples=60):
+    """Detail rows in file order: per cycle increasing Time with repeated stamps and NaN measurements"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for uid in range(1, n_cycles + 1):
+        n = int(rng.integers(1, max_samples))
+        time = np.cumsum(rng.choice([0.0, 1.0, 2.5], size=n, p=[0.2, 0.6, 0.2]))
+        frame = pd.DataFrame({
+            'uid': uid,
+            'test_id': uid * 2,
+            'Time': time,
+            'Voltage_measured': rng.uniform(3.0, 4.2, n),
+            'Current_measured': rng.uniform(-2.0, 0.5, n),
+            'Voltage_load': rng.uniform(2.0, 4.0, n),
+            # Some cycles load negative energy, so they fail the positivity check
+            'Current_load': rng.uniform(-0.5, 2.0, n) * (1 if uid % 7 else -1),
+        })
+        for column in ['Voltage_measured', 'Current_load']:
+            frame.loc[rng.random(n) < 0.1, column] = np.nan
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def as_dict(efficiency_table):
+    valid = efficiency_table.dropna(subset=['efficiency'])
+    return dict(zip(valid['uid'].tolist(), valid['efficiency'].tolist()))
+
+
+def assert_same(result, expected):
+    assert sorted(result) == sorted(expected)
+    for uid, efficiency in expected.items():
+        assert result[uid] == pytest.approx(efficiency, rel=1e-9)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_reference_loop_on_unsorted_rows(seed):
+    detailed_data = make_cycles(seed)
+    # Shuffle the rows and put a NaN Time in, which the loop sorts last
+    detailed_data = detailed_data.sample(frac=1, random_state=seed).reset_index(drop=True)
+    detailed_data.loc[detailed_data.index[::50], 'Time'] = np.nan
+
+    expected = reference_efficiency(detailed_data)
+    assert expected, "test data should produce some valid cycles"
+    assert_same(as_dict(compute_energy_efficiency(detailed_data)), expected)
+
+
+def test_duplicate_timestamps_keep_file_order():
+    detailed_data = pd.DataFrame({
+        'uid': [1, 1, 1, 1],
+        'test_id': [2, 2, 2, 2],
+        'Time': [0.0, 1.0, 1.0, 2.0],
+        'Voltage_measured': [4.0, 4.0, 3.0, 3.5],
+        'Current_measured': [-1.0, -1.0, -2.0, -1.0],
+        'Voltage_load': [3.0, 3.0, 1.0, 3.0],
+        'Current_load': [1.0, 1.0, 2.0, 1.0],
+    })
+    result = compute_energy_efficiency(detailed_data)
+    # Only the first row stamped 1.0 has a positive time step
+    assert result['energy_supplied'].iloc[0] == pytest.approx(3.0 + 3.0)
+    assert result['energy_received'].iloc[0] == pytest.approx(4.0 + 3.5)
+    assert_same(as_dict(result), reference_efficiency(detailed_data))
+
+
+def test_cycle_without_time_steps_has_no_efficiency():
+    detailed_data = make_cycles(3, n_cycles=3)
+    detailed_data.loc[detailed_data['uid'] == 2, 'Time'] = 5.0
+    result = compute_energy_efficiency(detailed_data).set_index('uid')
+    assert np.isnan(result.loc[2, 'efficiency'])
+    assert 2 not in reference_efficiency(detailed_data)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 64, 10 ** 6])
+def test_streaming_matches_whole_frame(chunk_rows):
+    # Small chunks split nearly every cycle; keep the frame small so one update per row stays quick
+    detailed_data = make_cycles(4, n_cycles=12, max_samples=30)
+    streaming = StreamingEnergyEfficiency()
+    for start in range(0, len(detailed_data), chunk_rows):
+        streaming.update(detailed_data.iloc[start:start + chunk_rows])
+
+    expected = reference_efficiency(detailed_data)
+    assert expected, "test data should produce some valid cycles"
+    assert_same(as_dict(streaming.result()), expected)
+    whole = compute_energy_efficiency(detailed_data)
+    pd.testing.assert_frame_equal(streaming.result()[whole.columns].reset_index(drop=True), whole,
+                                  check_dtype=False, rtol=1e-9)
+
+
+def test_streaming_result_can_be_taken_midway():
+    detailed_data = make_cycles(5)
+    half = len(detailed_data) // 2
+    streaming = StreamingEnergyEfficiency()
+    streaming.update(detailed_data.iloc[:half])
+    streaming.result()
+    streaming.update(detailed_data.iloc[half:])
+    assert_same(as_dict(streaming.result()), reference_efficiency(detailed_data))
@@ -0,0 +1,85 @@
+"""Fleet comparison curves and ranking against a per-battery loop"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import compute_fleet_curves, compute_fleet_metrics, compute_fleet_ranking
+
+
+def make_metadata(seed, n_batteries=6):
+    """Interleaved discharge/impedance rows in shuffled order, with NaN readings and a battery without impedance"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for b in range(n_batteries):
+        battery_id = f"B{b:04d}"
+        n_cycles = int(rng.integers(8, 60))
+        rate = rng.uniform(0.05, 0.6)
+        for test_id in range(n_cycles):
+            capacity = 2.0 * (1 - rate / 100 * test_id) + rng.normal(0, 0.01)
+            rows.append(('discharge', battery_id, test_id * 2, capacity if rng.random() > 0.05 else np.nan,
+                         np.nan, np.nan))
+            if b != 2 and test_id % 4 == 0:
+                rows.append(('impedance', battery_id, test_id * 2 + 1, np.nan,
+                             0.05 + 0.0005 * test_id + rng.normal(0, 0.001), 0.1 + 0.002 * test_id))
+    metadata = pd.DataFrame(rows, columns=['type', 'battery_id', 'test_id', 'Capacity', 'Re', 'Rct'])
+    return metadata.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def reference_battery(metadata, battery_id):
+    """Per-battery discharge/impedance metrics as the dashboard computed them one battery at a time"""
+    battery = metadata[metadata['battery_id'] == battery_id].sort_values('test_id')
+    discharge = battery[(battery['type'] == 'discharge') & battery['Capacity'].notna()].reset_index(drop=True)
+    peak_capacity = discharge['Capacity'].iloc[:30].max()
+    discharge['EFC'] = range(len(discharge))
+    discharge['Capacity_Fade'] = (peak_capacity - discharge['Capacity']) / peak_capacity * 100
+
+    impedance = battery[(battery['type'] == 'impedance') & battery['Re'].notna()].reset_index(drop=True)
+    impedance['Total_Resistance'] = impedance['Re'] + impedance['Rct']
+    initial = impedance['Total_Resistance'].iloc[0] if len(impedance) else np.nan
+    impedance['Resistance_Increase'] = (impedance['Total_Resistance'] - initial) / initial * 100
+    return discharge, impedance
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_curves_match_per_battery_loop(seed):
+    metadata = make_metadata(seed)
+    selected = ['B0001', 'B0002', 'B0004']
+    curves = compute_fleet_curves(compute_fleet_metrics(metadata), selected)
+
+    for battery_id in selected:
+        discharge, impedance = reference_battery(metadata, battery_id)
+        fade = curves['capacity_fade'][curves['capacity_fade']['battery_id'] == battery_id]
+        np.testing.assert_array_equal(fade['EFC'], discharge['EFC'])
+        np.testing.assert_allclose(fade['Capacity_Fade'], discharge['Capacity_Fade'])
+
+        capacity = discharge['Capacity'].to_numpy()
+        rate = curves['degradation_rate'][curves['degradation_rate']['battery_id'] == battery_id]
+        np.testing.assert_array_equal(rate['EFC'], discharge['EFC'].iloc[1:])
+        np.testing.assert_allclose(rate['Degradation_Rate'], (capacity[:-1] - capacity[1:]) / capacity[:-1] * 100)
+
+        resistance = curves['resistance_increase'][curves['resistance_increase']['battery_id'] == battery_id]
+        np.testing.assert_array_equal(resistance['Measurement'], np.arange(len(impedance)))
+        np.testing.assert_allclose(resistance['Resistance_Increase'], impedance['Resistance_Increase'])
+
+    assert set(curves['capacity_fade']['battery_id']) == set(selected)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_ranking_matches_per_battery_loop(seed):
+    metadata = make_metadata(seed)
+    ranking = compute_fleet_ranking(compute_fleet_metrics(metadata))
+
+    assert list(ranking.index) == sorted(metadata['battery_id'].unique())
+    for battery_id, row in ranking.iterrows():
+        discharge, impedance = reference_battery(metadata, battery_id)
+        capacity = discharge['Capacity'].to_numpy()
+        assert row['cycles'] == len(discharge)
+        assert row['capacity_fade'] == pytest.approx(discharge['Capacity_Fade'].iloc[-1])
+        assert row['fade_per_cycle'] == pytest.approx(np.polyfit(discharge['EFC'], discharge['Capacity_Fade'], 1)[0])
+        assert row['avg_degradation_rate'] == pytest.approx(np.mean((capacity[:-1] - capacity[1:]) / capacity[:-1] * 100))
+        if len(impedance):
+            assert row['final_resistance_increase'] == pytest.approx(impedance['Resistance_Increase'].iloc[-1])
+            assert row['max_resistance_increase'] == pytest.approx(impedance['Resistance_Increase'].max())
+        else:
+            assert np.isnan(row['final_resistance_increase'])
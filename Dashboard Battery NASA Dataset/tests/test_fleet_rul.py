@@ -0,0 +1,108 @@
+"""Batched fleet RUL fits against per-battery np.polyfit"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import RUL_MODELS, compute_fleet_rul, find_knee
+
+EOL_FADE = 30
+
+
+def make_discharge(seed):
+    """Fade curves of several shapes, indexed by battery_id like the fleet discharge table"""
+    rng = np.random.default_rng(seed)
+    shapes = {
+        'B0001': lambda efc: 0.08 * efc,
+        'B0002': lambda efc: 100 - 100 * np.exp(-0.002 * efc),
+        'B0003': lambda efc: 0.02 * efc + np.where(efc > 90, 0.4 * (efc - 90), 0),
+        'B0004': lambda efc: 0.35 * efc,
+        'B0005': lambda efc: 0.05 * efc,
+    }
+    lengths = {'B0001': 150, 'B0002': 120, 'B0003': 130, 'B0004': 110, 'B0005': 4}
+    frames = []
+    for battery_id, shape in shapes.items():
+        efc = np.arange(lengths[battery_id])
+        frames.append(pd.DataFrame({
+            'battery_id': battery_id,
+            'EFC': efc,
+            'Capacity_Fade': shape(efc) + rng.normal(0, 0.3, len(efc)),
+        }))
+    return pd.concat(frames, ignore_index=True).set_index('battery_id')
+
+
+def cycles_left(x_last, eol_x):
+    return max(eol_x - x_last, 0) if np.isfinite(eol_x) else np.nan
+
+
+def reference_rul(efc, fade, window=5, min_segment=10):
+    """RUL of one battery fitted with np.polyfit: per-model RUL, knee and AIC-best model"""
+    n = len(efc)
+    x_last = efc[-1]
+
+    slope, intercept = np.polyfit(efc, fade, 1)
+    linear_sse = np.sum((fade - (intercept + slope * efc)) ** 2)
+    linear = cycles_left(x_last, (EOL_FADE - intercept) / slope if slope > 0 else np.nan)
+
+    k, log_a = np.polyfit(efc, np.log(100 - fade), 1)
+    exponential_sse = np.sum((fade - (100 - np.exp(log_a + k * efc))) ** 2)
+    exponential = cycles_left(x_last, (np.log(100 - EOL_FADE) - log_a) / k if k < 0 else np.nan)
+
+    smoothed = pd.Series(fade).rolling(window, min_periods=1, center=True).mean().to_numpy()
+    knee = find_knee(efc, smoothed)
+    after = efc >= efc[knee]
+    knee_efc = np.nan
+    piecewise_sse, piecewise_slope, piecewise_intercept = linear_sse, slope, intercept
+    if after.sum() >= min_segment and (~after).sum() >= min_segment:
+        knee_efc = efc[knee]
+        piecewise_slope, piecewise_intercept = np.polyfit(efc[after], fade[after], 1)
+        before_slope, before_intercept = np.polyfit(efc[~after], fade[~after], 1)
+        predicted = np.where(after, piecewise_intercept + piecewise_slope * efc,
+                             before_intercept + before_slope * efc)
+        piecewise_sse = np.sum((fade - predicted) ** 2)
+    piecewise = cycles_left(x_last, (EOL_FADE - piecewise_intercept) / piecewise_slope
+                            if piecewise_slope > 0 else np.nan)
+
+    ruls = {'linear': linear, 'exponential': exponential, 'piecewise': piecewise}
+    aics = {
+        'linear': n * np.log(linear_sse / n) + 4,
+        'exponential': n * np.log(exponential_sse / n) + 4,
+        'piecewise': n * np.log(piecewise_sse / n) + 10,
+    }
+    best = min((model for model in RUL_MODELS if np.isfinite(ruls[model])), key=aics.get)
+    rul = 0.0 if fade[-1] >= EOL_FADE else ruls[best]
+    return {**{f'{model}_rul': ruls[model] for model in RUL_MODELS},
+            'knee_efc': knee_efc, 'best_model': best, 'rul': rul}
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_per_battery_polyfit(seed):
+    discharge = make_discharge(seed)
+    rul = compute_fleet_rul(discharge, eol_fade=EOL_FADE)
+
+    # Batteries below min_cycles are left out
+    assert list(rul.index) == ['B0001', 'B0002', 'B0003', 'B0004']
+    for battery_id, row in rul.iterrows():
+        battery = discharge.loc[battery_id]
+        expected = reference_rul(battery['EFC'].to_numpy(dtype=float), battery['Capacity_Fade'].to_numpy())
+        assert row['cycles'] == len(battery)
+        for column in ['linear_rul', 'exponential_rul', 'piecewise_rul', 'knee_efc', 'rul']:
+            assert row[column] == pytest.approx(expected[column], rel=1e-6, abs=1e-6, nan_ok=True), column
+        assert row['best_model'] == expected['best_model']
+
+
+def test_known_shapes():
+    rul = compute_fleet_rul(make_discharge(0), eol_fade=EOL_FADE)
+    # The accelerating battery has a knee near EFC 90 and is extrapolated on its fast segment
+    assert 80 <= rul.loc['B0003', 'knee_efc'] <= 100
+    assert rul.loc['B0003', 'best_model'] == 'piecewise'
+    # A straight line has no knee to speak of
+    assert rul.loc['B0001', 'best_model'] == 'linear'
+    # Past the threshold already
+    assert rul.loc['B0004', 'rul'] == 0 and rul.loc['B0004', 'risk'] == 'EOL reached'
+
+
+def test_row_order_does_not_matter():
+    discharge = make_discharge(1)
+    shuffled = discharge.sample(frac=1, random_state=0)
+    pd.testing.assert_frame_equal(compute_fleet_rul(shuffled).sort_index(), compute_fleet_rul(discharge).sort_index())
@@ -0,0 +1,85 @@
+"""Robust fleet screen against the modified z-score computed by hand"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import SCREENING_FEATURES, screen_fleet
+
+
+def make_features(n=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'cycles': np.full(n, 100),
+        'fade_rate': rng.normal(0.15, 0.02, n),
+        'fade_scatter': rng.normal(0.5, 0.05, n),
+        'resistance_slope': rng.normal(0.05, 0.01, n),
+    }, index=pd.Index([f"B{i:04d}" for i in range(n)], name='battery_id'))
+
+
+def test_matches_modified_z_score():
+    features = make_features()
+    features.loc['B0003', 'fade_rate'] = 0.6
+    screen = screen_fleet(features)
+
+    for feature in SCREENING_FEATURES:
+        values = features[feature].to_numpy()
+        median = np.median(values)
+        mad = np.median(np.abs(values - median))
+        np.testing.assert_allclose(screen[f'{feature}_z'], 0.6745 * (values - median) / mad)
+    assert list(screen.index[screen['flagged']]) == ['B0003']
+    assert screen.loc['B0003', 'reason'].startswith('fade_rate z=+')
+
+
+def test_only_the_bad_tail_is_flagged():
+    features = make_features()
+    features.loc['B0004', 'fade_rate'] = -0.3
+    screen = screen_fleet(features)
+    assert screen.loc['B0004', 'fade_rate_z'] < -3.5
+    assert not screen['flagged'].any()
+
+
+def test_near_identical_fleet_does_not_blow_up_rounding_noise():
+    features = make_features()
+    # More than half the fleet shares the median, so MAD is 0 and the fallback spread is tiny
+    features['fade_rate'] = 0.15
+    features.loc['B0001', 'fade_rate'] = 0.15 + 1e-6
+    screen = screen_fleet(features)
+    assert abs(screen.loc['B0001', 'fade_rate_z']) < 1e-2
+    assert not screen['flagged'].any()
+
+    # A real departure from the shared value is still flagged
+    features.loc['B0002', 'fade_rate'] = 0.6
+    screen = screen_fleet(features)
+    assert list(screen.index[screen['flagged']]) == ['B0002']
+
+
+def test_feature_without_spread_is_not_scored():
+    features = make_features()
+    features['resistance_slope'] = 0.0
+    screen = screen_fleet(features)
+    assert screen['resistance_slope_z'].isna().all()
+    assert screen['score'].notna().all()
+
+
+@pytest.mark.parametrize('cycles', [0, 4])
+def test_short_batteries_are_insufficient_data_not_outliers(cycles):
+    features = make_features()
+    features.loc['B0005', 'cycles'] = cycles
+    # Wild features from a handful of cycles must not count against it, nor shift the reference
+    features.loc['B0005', SCREENING_FEATURES] = 50.0
+    screen = screen_fleet(features)
+
+    assert screen.loc['B0005', 'insufficient_data']
+    assert not screen.loc['B0005', 'flagged']
+    assert np.isnan(screen.loc['B0005', 'score'])
+    assert screen.loc['B0005', 'reason'] == f"only {cycles} discharge cycles"
+    assert not screen.drop('B0005')[['flagged', 'insufficient_data']].any().any()
+    pd.testing.assert_series_equal(screen.drop('B0005')['fade_rate_z'],
+                                   screen_fleet(features.drop('B0005'))['fade_rate_z'])
+
+
+def test_small_fleet_is_not_scored():
+    screen = screen_fleet(make_features(n=4))
+    assert screen['score'].isna().all()
+    assert not screen['flagged'].any()
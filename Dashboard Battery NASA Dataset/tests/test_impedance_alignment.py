@@ -0,0 +1,83 @@
+"""Fleet-wide impedance alignment against np.interp per battery"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import ALIGNED_RESISTANCE_COLUMNS, align_impedance_to_discharge, compute_resistance_correlation
+
+
+def make_tables(seed, n_batteries=5):
+    """Discharge and impedance rows with interleaved test_ids; one battery has no impedance tests"""
+    rng = np.random.default_rng(seed)
+    discharge, impedance = [], []
+    for b in range(n_batteries):
+        battery_id = f"B{b:04d}"
+        test_ids = np.sort(rng.choice(np.arange(400), size=120, replace=False))
+        is_impedance = rng.random(len(test_ids)) < 0.2
+        if b == 3:
+            is_impedance[:] = False
+        for test_id in test_ids[~is_impedance]:
+            discharge.append((battery_id, test_id, 2.0 - 0.001 * test_id + rng.normal(0, 0.01)))
+        for test_id in test_ids[is_impedance]:
+            resistance = 0.15 + 0.0002 * test_id + rng.normal(0, 0.002)
+            impedance.append((battery_id, test_id, resistance, (resistance / 0.15 - 1) * 100))
+    discharge = pd.DataFrame(discharge, columns=['battery_id', 'test_id', 'Capacity']).set_index('battery_id')
+    impedance = pd.DataFrame(impedance, columns=['battery_id', 'test_id', 'Total_Resistance', 'Resistance_Increase'])
+    return discharge, impedance.set_index('battery_id')
+
+
+def reference_alignment(discharge, impedance):
+    """Per battery: np.interp on test_id (flat outside the tests) and the distance to the nearest test"""
+    expected = {column: [] for column in ALIGNED_RESISTANCE_COLUMNS + ['resistance_gap']}
+    for battery_id, test_id in zip(discharge.index, discharge['test_id']):
+        tests = impedance[impedance.index == battery_id].sort_values('test_id')
+        if len(tests) == 0:
+            for values in expected.values():
+                values.append(np.nan)
+            continue
+        for column in ALIGNED_RESISTANCE_COLUMNS:
+            expected[column].append(np.interp(test_id, tests['test_id'], tests[column]))
+        expected['resistance_gap'].append(np.abs(tests['test_id'] - test_id).min())
+    return pd.DataFrame(expected, index=discharge.index)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_np_interp(seed):
+    discharge, impedance = make_tables(seed)
+    # Row order of either table must not matter
+    discharge = discharge.sample(frac=1, random_state=seed)
+    impedance = impedance.sample(frac=1, random_state=seed + 1)
+    aligned = align_impedance_to_discharge(discharge, impedance)
+
+    pd.testing.assert_frame_equal(aligned[discharge.columns], discharge)
+    expected = reference_alignment(discharge, impedance)
+    for column in expected.columns:
+        np.testing.assert_allclose(aligned[column], expected[column], rtol=1e-12, err_msg=column)
+    assert aligned.loc['B0003', 'Total_Resistance'].isna().all()
+
+
+def test_battery_id_as_column_and_missing_keys():
+    discharge, impedance = make_tables(3)
+    discharge = discharge.reset_index()
+    discharge.loc[5, 'test_id'] = np.nan
+    aligned = align_impedance_to_discharge(discharge, impedance.reset_index())
+
+    assert aligned.loc[5, ALIGNED_RESISTANCE_COLUMNS + ['resistance_gap']].isna().all()
+    kept = discharge.drop(index=5).set_index('battery_id')
+    expected = reference_alignment(kept, impedance)
+    np.testing.assert_allclose(aligned.drop(index=5)['Total_Resistance'], expected['Total_Resistance'], rtol=1e-12)
+
+
+def test_resistance_correlation_matches_np_corrcoef():
+    discharge, impedance = make_tables(4)
+    aligned = align_impedance_to_discharge(discharge, impedance)
+    correlation = compute_resistance_correlation(aligned)
+
+    assert 'B0003' not in correlation.index
+    for battery_id, row in correlation.iterrows():
+        battery = aligned.loc[battery_id]
+        slope, intercept = np.polyfit(battery['Total_Resistance'], battery['Capacity'], 1)
+        assert row['slope'] == pytest.approx(slope)
+        assert row['intercept'] == pytest.approx(intercept)
+        assert row['r_squared'] == pytest.approx(np.corrcoef(battery['Total_Resistance'], battery['Capacity'])[0, 1] ** 2)
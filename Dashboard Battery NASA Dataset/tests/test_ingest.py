@@ -0,0 +1,156 @@
+"""Incremental metadata ingest against cleaning the whole CSV"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import battery_data_store
+from battery_data_store import MAX_INGEST_PARTS, clean_metadata, compact_metadata, ingest_metadata, load_tables, save_tables
+
+HEADER = "type,start_time,ambient_temperature,battery_id,test_id,uid,filename,Capacity,Re,Rct\n"
+
+
+def rows(start, stop):
+    """Metadata lines for uids start..stop-1, alternating discharge and impedance"""
+    lines = []
+    for uid in range(start, stop):
+        battery = f"B{uid % 3 + 5:04d}"
+        if uid % 2:
+            lines.append(f"discharge,2010-07-21 15:{uid // 60 % 60:02d}:{uid % 60:02d},24,{battery},"
+                         f"{uid},{uid},{uid:05d}.csv,{2.0 - uid * 0.001},,\n")
+        else:
+            lines.append(f"impedance,2010-07-21 15:{uid // 60 % 60:02d}:{uid % 60:02d},24,{battery},"
+                         f"{uid},{uid},{uid:05d}.csv,,0.05,0.08\n")
+    return "".join(lines)
+
+
+def write(path, text, mode='w'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def assert_matches_csv(metadata, path):
+    expected = compact_metadata(clean_metadata(pd.read_csv(path)))
+    pd.testing.assert_frame_equal(metadata.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_categorical=False, check_dtype=False)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "metadata.csv", tmp_path / "ingest"
+
+
+def test_append_cleans_only_new_rows(paths):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 21))
+    metadata, delta, baseline = ingest_metadata(csv, store)
+    assert delta is None and baseline is None and len(metadata) == 20
+
+    first_part = sorted((store / "metadata").glob("part-*.parquet"))[-1]
+    write(csv, rows(21, 31), 'a')
+    metadata, delta, baseline = ingest_metadata(csv, store)
+    assert delta['uid'].tolist() == list(range(21, 31))
+    assert baseline == first_part
+    assert_matches_csv(metadata, csv)
+
+
+@pytest.mark.parametrize('change', ['rewrite', 'shrink'])
+def test_rewritten_or_shrunk_file_is_rebuilt(paths, change):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 21))
+    ingest_metadata(csv, store)
+    if change == 'rewrite':
+        # Same size, different bytes just before the processed offset
+        write(csv, HEADER + rows(1, 20) + rows(20, 21).replace("24,", "25,"))
+    else:
+        write(csv, HEADER + rows(1, 11))
+
+    metadata, delta, baseline = ingest_metadata(csv, store)
+    assert delta is None and baseline is None
+    assert len(list((store / "metadata").glob("part-*.parquet"))) == 1
+    assert_matches_csv(metadata, csv)
+
+
+def test_full_build_takes_unterminated_last_line(paths):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 11).rstrip("\n"))
+    metadata, delta, _ = ingest_metadata(csv, store)
+    assert metadata['uid'].tolist() == list(range(1, 11))
+    assert_matches_csv(metadata, csv)
+
+
+def test_partial_line_waits_until_file_stops_growing(paths):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 11))
+    ingest_metadata(csv, store)
+
+    write(csv, rows(11, 13) + rows(13, 14).rstrip("\n"), 'a')
+    _, delta, _ = ingest_metadata(csv, store)
+    assert delta['uid'].tolist() == [11, 12]
+
+    # Nothing written since: the unterminated line is complete after all
+    metadata, delta, _ = ingest_metadata(csv, store)
+    assert delta['uid'].tolist() == [13]
+    assert_matches_csv(metadata, csv)
+
+    write(csv, "\n" + rows(14, 15), 'a')
+    metadata, delta, _ = ingest_metadata(csv, store)
+    assert delta['uid'].tolist() == [14]
+    assert_matches_csv(metadata, csv)
+
+
+def test_partial_line_alone_is_taken_on_the_next_unchanged_call(paths):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 11))
+    ingest_metadata(csv, store)
+
+    write(csv, rows(11, 12)[:-1], 'a')
+    _, delta, _ = ingest_metadata(csv, store)
+    assert len(delta) == 0
+    _, delta, _ = ingest_metadata(csv, store)
+    assert delta['uid'].tolist() == [11]
+
+
+def test_compaction_returns_a_baseline_that_exists(paths, tmp_path):
+    csv, store = paths
+    metrics_dir = tmp_path / "metrics"
+    write(csv, HEADER + rows(1, 2))
+    ingest_metadata(csv, store)
+
+    for uid in range(2, MAX_INGEST_PARTS + 2):
+        # Derived tables saved after every ingest are fresh against the next baseline
+        save_tables({'discharge': pd.DataFrame({'uid': [uid]})}, metrics_dir)
+        write(csv, rows(uid, uid + 1), 'a')
+        metadata, delta, baseline = ingest_metadata(csv, store)
+        assert baseline.exists()
+        parts = sorted((store / "metadata").glob("part-*.parquet"))
+        if len(parts) > 1:
+            assert load_tables(metrics_dir, ['discharge'], newer_than=baseline) is not None
+
+    # The last append pushed the store past MAX_INGEST_PARTS and it was compacted
+    assert parts == [baseline]
+    os.utime(metrics_dir / "discharge.parquet", ns=(0, 0))
+    assert load_tables(metrics_dir, ['discharge'], newer_than=baseline) is None
+    assert_matches_csv(metadata, csv)
+    assert_matches_csv(pd.read_parquet(baseline), csv)
+
+
+def test_rerun_without_changes_reuses_memo(paths):
+    csv, store = paths
+    write(csv, HEADER + rows(1, 21))
+    ingest_metadata(csv, store)
+    write(csv, rows(21, 26), 'a')
+    metadata, _, baseline = ingest_metadata(csv, store)
+    state_mtime = os.stat(store / "ingest_state.json").st_mtime_ns
+
+    again, delta, again_baseline = ingest_metadata(csv, store)
+    assert again is metadata and len(delta) == 0
+    assert again_baseline == sorted((store / "metadata").glob("part-*.parquet"))[-1]
+    assert os.stat(store / "ingest_state.json").st_mtime_ns == state_mtime
+
+    # A new process reads the parts back
+    battery_data_store._ingest_memo.clear()
+    fresh, delta, _ = ingest_metadata(csv, store)
+    assert fresh is not metadata and len(delta) == 0
+    assert_matches_csv(fresh, csv)
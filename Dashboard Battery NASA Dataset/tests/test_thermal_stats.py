@@ -0,0 +1,92 @@
+"""Streaming thermal statistics against pandas on the whole frame"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_analytics import StreamingThermalStats
+
+
+def make_detail(seed, n_cycles=15, max_samples=200):
+    """Detail rows for several cycles with NaN temperature, voltage and current readings"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for uid in range(1, n_cycles + 1):
+        n = int(rng.integers(1, max_samples))
+        frame = pd.DataFrame({
+            'uid': uid,
+            'test_id': uid * 2,
+            'Time': np.arange(n, dtype=float) * 2.5,
+            'Temperature_measured': 24 + 10 * np.sin(np.arange(n) / 20) + rng.normal(0, 0.5, n) + uid,
+            'Voltage_measured': rng.uniform(3.0, 4.2, n),
+            'Current_measured': rng.uniform(-2.0, 0.0, n),
+        })
+        for column in ['Temperature_measured', 'Voltage_measured', 'Current_measured']:
+            frame.loc[rng.random(n) < 0.05, column] = np.nan
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def valid_rows(detail):
+    return detail.dropna(subset=['Temperature_measured', 'Voltage_measured', 'Current_measured'])
+
+
+def stream(detail, chunk_rows, max_points=2000):
+    stats = StreamingThermalStats(max_points)
+    for start in range(0, len(detail), chunk_rows):
+        stats.update(detail.iloc[start:start + chunk_rows])
+    return stats.result()
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 13, 500, 10 ** 6])
+def test_matches_pandas(chunk_rows):
+    detail = make_detail(0, n_cycles=6, max_samples=60) if chunk_rows == 1 else make_detail(1)
+    temperature = valid_rows(detail)['Temperature_measured']
+    result = stream(detail, chunk_rows)
+
+    assert result['count'] == len(temperature)
+    assert result['avg_temperature'] == pytest.approx(temperature.mean(), rel=1e-12)
+    assert result['std_temperature'] == pytest.approx(temperature.std(ddof=0), rel=1e-9)
+    assert result['min_temperature'] == temperature.min()
+    assert result['max_temperature'] == temperature.max()
+    # Quantiles come from a histogram, so they are only good to about one bin
+    resolution = StreamingThermalStats.HISTOGRAM_RESOLUTION
+    for q, key in [(0.05, 'p05_temperature'), (0.5, 'median_temperature'), (0.95, 'p95_temperature')]:
+        assert abs(result[key] - temperature.quantile(q)) <= 2 * resolution
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 10 ** 6])
+def test_cycle_table_matches_pandas_groupby(chunk_rows):
+    detail = make_detail(2)
+    valid = valid_rows(detail)
+    by_cycle = valid.groupby('uid')['Temperature_measured']
+    cycles = stream(detail, chunk_rows)['cycles'].set_index('uid')
+
+    np.testing.assert_array_equal(cycles.index, by_cycle.mean().index)
+    np.testing.assert_array_equal(cycles['test_id'], valid.groupby('uid')['test_id'].first())
+    np.testing.assert_array_equal(cycles['samples'], by_cycle.count())
+    np.testing.assert_allclose(cycles['mean_temperature'], by_cycle.mean(), rtol=1e-12)
+    np.testing.assert_allclose(cycles['std_temperature'], by_cycle.std(ddof=0), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(cycles['min_temperature'], by_cycle.min())
+    np.testing.assert_array_equal(cycles['max_temperature'], by_cycle.max())
+
+
+def test_sample_is_bounded_and_keeps_extremes():
+    detail = make_detail(3, n_cycles=40, max_samples=2000)
+    temperature = valid_rows(detail)['Temperature_measured']
+    sample = stream(detail, 3000, max_points=200)['sample']
+    assert len(sample) <= 4 * 200 + 2 * 200
+    assert sample['Temperature_measured'].max() == temperature.max()
+    assert sample['Temperature_measured'].min() == temperature.min()
+
+    everything = stream(detail, 3000, max_points=None)['sample']
+    assert len(everything) == len(temperature)
+
+
+def test_no_valid_rows():
+    detail = make_detail(4, n_cycles=2)
+    detail['Voltage_measured'] = np.nan
+    result = stream(detail, 50)
+    assert result['count'] == 0
+    assert np.isnan(result['avg_temperature']) and np.isnan(result['median_temperature'])
+    assert len(result['cycles']) == 0 and len(result['sample']) == 0